@@ -0,0 +1,156 @@
+"""
+Shared helpers for resumable chunked uploads.
+Clients send a file as a series of chunks, each at the offset the server has
+confirmed so far; partial data lives in a local working file until the upload
+is finalized and handed to the model's storage. A retry after a dropped
+connection only resends the bytes the server has not acknowledged.
+
+Each chunk is staged in its own file while the body streams in and only then
+appended to the working file under the session lock, so a slow client never
+holds a database lock.
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+
+
+CHUNK_READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """Raised when a chunk cannot be accepted; carries the offset the client should resume from."""
+
+    def __init__(self, message, offset):
+        self.offset = offset
+        super().__init__(message)
+
+
+class UploadSessionGone(Exception):
+    """Raised when an upload session was finalized (or expired) by another request meanwhile."""
+
+
+def get_upload_dir():
+    """Get (and create) the directory holding partial uploads."""
+    upload_dir = getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'wishare_chunked_uploads'
+    )
+    os.makedirs(upload_dir, exist_ok=True)
+    return upload_dir
+
+
+def get_max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 5 * 1024 * 1024)
+
+
+def get_part_path(upload_id):
+    """Get the working file for an upload session."""
+    return os.path.join(get_upload_dir(), f'{upload_id}.part')
+
+
+def get_offset_from_request(request):
+    """
+    Read the chunk offset from the Upload-Offset header or ?offset= query parameter.
+    Returns None when missing or invalid.
+    """
+    value = request.headers.get('Upload-Offset', request.GET.get('offset'))
+    try:
+        offset = int(value)
+    except (TypeError, ValueError):
+        return None
+    return offset if offset >= 0 else None
+
+
+def stage_chunk(upload_id, offset, received_size, total_size, stream):
+    """
+    Read one chunk from stream into a staging file next to the upload's working file.
+    This is the slow part of a chunk request and runs without the session lock;
+    append_chunk() then adds the staged bytes under the lock.
+
+    Args:
+        upload_id: Upload session id
+        offset: Offset the client says the chunk starts at
+        received_size: Bytes the server held when the request arrived
+        total_size: Declared size of the whole file
+        stream: File-like object to read the chunk from (e.g. the raw request)
+
+    Returns:
+        Path of the staging file (the caller removes it)
+
+    Raises:
+        ChunkError: If the offset does not match or the chunk is too large
+    """
+    if offset != received_size:
+        raise ChunkError(f'Expected chunk at offset {received_size}.', received_size)
+
+    limit = min(get_max_chunk_size(), total_size - received_size)
+    fd, path = tempfile.mkstemp(prefix=f'{upload_id}.', suffix='.chunk', dir=get_upload_dir())
+    written = 0
+
+    with os.fdopen(fd, 'wb') as staged:
+        while True:
+            data = stream.read(CHUNK_READ_SIZE)
+            if not data:
+                break
+            written += len(data)
+            if written > limit:
+                staged.close()
+                os.remove(path)
+                raise ChunkError(
+                    f'Chunk exceeds the maximum of {limit} bytes for this upload.', received_size
+                )
+            staged.write(data)
+
+    return path
+
+
+def append_chunk(upload_id, offset, received_size, staged_path):
+    """
+    Append a staged chunk to an upload's working file. Call with the session row locked.
+
+    Args:
+        upload_id: Upload session id
+        offset: Offset the chunk starts at
+        received_size: Bytes the server holds now (re-read under the lock)
+        staged_path: File written by stage_chunk()
+
+    Returns:
+        New received size
+
+    Raises:
+        ChunkError: If another request appended a chunk since this one was staged
+    """
+    if offset != received_size:
+        raise ChunkError(f'Expected chunk at offset {received_size}.', received_size)
+
+    path = get_part_path(upload_id)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part, open(staged_path, 'rb') as staged:
+        # Drop any bytes left over from a chunk that failed part way
+        part.truncate(received_size)
+        part.seek(received_size)
+        shutil.copyfileobj(staged, part, CHUNK_READ_SIZE)
+        return part.tell()
+
+
+def discard_staged_chunk(staged_path):
+    """Remove a staging file, if it is still there."""
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+
+def open_assembled_file(upload_id, filename):
+    """Open a finished upload as a File ready to be saved to a FileField."""
+    return File(open(get_part_path(upload_id), 'rb'), name=filename)
+
+
+def discard_upload(upload_id):
+    """Remove an upload's working file, if any."""
+    try:
+        os.remove(get_part_path(upload_id))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,271 @@
+"""
+File delivery for authorized downloads.
+After a view has checked permissions it hands the file to deliver_file(), which:
+
+- answers conditional requests (If-None-Match / If-Modified-Since) with 304
+  using a strong ETag built from the file's stored content hash;
+- serves byte ranges (single ranges and multipart/byteranges), so media
+  scrubbing and resumed downloads only transfer what is asked for;
+- optionally hands the transfer to the front web server, so the Python worker
+  is free again at once (the web server then applies Range itself):
+
+    'nginx'     X-Accel-Redirect to an internal location serving MEDIA_ROOT:
+                    location /protected-media/ {
+                        internal;
+                        alias /path/to/backend/media/;
+                    }
+    'sendfile'  X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+    'django'    Streamed by Django itself (default; used for development)
+
+Files in storages without a local path are always streamed by Django.
+"""
+
+import hashlib
+import re
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+
+DELIVERY_BACKENDS = ('django', 'nginx', 'sendfile')
+HASH_READ_SIZE = 64 * 1024
+RANGE_READ_SIZE = 64 * 1024
+MAX_RANGES = 16
+RANGE_PATTERN = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+FIRST_RANGE_PATTERN = re.compile(r'^\s*bytes\s*=\s*0+\s*-', re.IGNORECASE)
+
+
+def get_delivery_backend():
+    backend = getattr(settings, 'FILE_DELIVERY_BACKEND', 'django')
+    return backend if backend in DELIVERY_BACKENDS else 'django'
+
+
+def get_internal_url(name):
+    """Get the internal nginx location for a storage name."""
+    prefix = getattr(settings, 'FILE_DELIVERY_INTERNAL_PREFIX', '/protected-media/')
+    return prefix.rstrip('/') + '/' + quote(name.replace('\\', '/'))
+
+
+def compute_content_hash(file):
+    """
+    Get the SHA-256 hex digest of a file's contents.
+    The file is read in chunks and left positioned at the start.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_READ_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def get_upload_hash(field_file):
+    """
+    Get the SHA-256 of a newly assigned file: the hash recorded while it was uploaded
+    (StreamingUploadHandler, verified chunked uploads), or computed now.
+    """
+    return getattr(field_file.file, 'content_hash', None) or compute_content_hash(field_file)
+
+
+def make_etag(content_hash):
+    """Get the strong ETag for a content hash, or None when there is no hash."""
+    return f'"{content_hash}"' if content_hash else None
+
+
+def _local_path(field_file):
+    """Get the file's absolute path, or None when its storage is not on the local filesystem."""
+    try:
+        return field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        return None
+
+
+def parse_range_header(header, size):
+    """
+    Parse a 'bytes=' Range header against a file size.
+
+    Returns:
+        List of (start, end) inclusive byte ranges; [] when no range can be satisfied;
+        None when the header should be ignored and the whole file sent
+    """
+    if not header or not header.strip().lower().startswith('bytes='):
+        return None
+    specs = header.split('=', 1)[1].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = RANGE_PATTERN.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length == 0:
+                continue
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+            if start >= size:
+                continue
+        ranges.append((start, end))
+    return ranges
+
+
+def _if_range_allows(request, etag, last_modified):
+    """A Range request with If-Range only gets a partial response while the validator still matches."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return etag is not None and if_range == etag
+    modified = parse_http_date_safe(if_range)
+    return last_modified is not None and modified is not None and int(last_modified) == modified
+
+
+def _iter_range(file, start, end):
+    """Yield the bytes from start to end (inclusive) of an open file."""
+    file.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        data = file.read(min(RANGE_READ_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+def _stream_ranges(file, ranges, single_type=None, boundary=None, size=None):
+    """Yield one range, or every range as multipart/byteranges parts; closes the file when done."""
+    try:
+        if boundary is None:
+            start, end = ranges[0]
+            yield from _iter_range(file, start, end)
+            return
+        for start, end in ranges:
+            yield (
+                f'\r\n--{boundary}\r\nContent-Type: {single_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).encode('ascii')
+            yield from _iter_range(file, start, end)
+        yield f'\r\n--{boundary}--\r\n'.encode('ascii')
+    finally:
+        file.close()
+
+
+def _range_response(field_file, ranges, content_type, size):
+    """Build a 206 response for the satisfiable ranges of a file."""
+    file = field_file.open('rb')
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(_stream_ranges(file, ranges), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        return response
+
+    boundary = uuid.uuid4().hex
+    body_length = len(f'\r\n--{boundary}--\r\n')
+    for start, end in ranges:
+        body_length += len(
+            f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ) + end - start + 1
+    response = StreamingHttpResponse(
+        _stream_ranges(file, ranges, content_type, boundary, size),
+        status=206,
+        content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = str(body_length)
+    return response
+
+
+def deliver_file(request, field_file, filename, content_type, as_attachment=True, content_hash=None, last_modified=None):
+    """
+    Build the response that sends a stored file to the client.
+
+    Args:
+        request: The download request (for conditional and Range headers)
+        field_file: FieldFile (e.g. resource.file) to send
+        filename: Name the client should save the file as
+        content_type: MIME type of the file
+        as_attachment: Ask the browser to download rather than display the file
+        content_hash: Stored SHA-256 of the file, used as its strong ETag (none for files stored before hashing)
+        last_modified: datetime the file last changed, for Last-Modified
+
+    Returns:
+        304/412 for satisfied preconditions, 206/416 for Range requests served by Django,
+        otherwise a full response (offload headers or a streaming FileResponse)
+
+    Raises:
+        FileNotFoundError: If the file is missing from storage
+    """
+    etag = make_etag(content_hash)
+    # HTTP dates have whole seconds; a fractional value would never match an echoed Last-Modified
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+
+    validators = HttpResponse()
+    if etag:
+        validators['ETag'] = etag
+    if last_modified is not None:
+        validators['Last-Modified'] = http_date(last_modified)
+    validators['Accept-Ranges'] = 'bytes'
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified, response=validators)
+    if conditional is not validators:
+        return conditional
+
+    backend = get_delivery_backend()
+    path = _local_path(field_file) if backend != 'django' else None
+
+    if path is not None:
+        if not field_file.storage.exists(field_file.name):
+            raise FileNotFoundError(field_file.name)
+        response = HttpResponse(content_type=content_type)
+        if backend == 'nginx':
+            response['X-Accel-Redirect'] = get_internal_url(field_file.name)
+        else:
+            response['X-Sendfile'] = path
+    else:
+        size = field_file.size
+        ranges = None
+        if request.method == 'GET' and _if_range_allows(request, etag, last_modified):
+            ranges = parse_range_header(request.headers.get('Range'), size)
+        if ranges == []:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if ranges:
+            response = _range_response(field_file, ranges, content_type, size)
+        else:
+            response = FileResponse(field_file.open('rb'), content_type=content_type)
+
+    for header in ('ETag', 'Last-Modified', 'Accept-Ranges'):
+        if validators.has_header(header):
+            response[header] = validators[header]
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    return response
+
+
+def counts_as_download(request, response):
+    """
+    Tell whether a delivered response starts a download: a full body, or a range beginning
+    at byte 0. Later ranges of resumed or scrubbed transfers, 304s and 416s do not count.
+    Offloaded responses are always 200 here because the web server applies Range itself,
+    so their Range header is read from the request.
+    """
+    if response.status_code == 206:
+        return response.get('Content-Range', '').startswith('bytes 0-')
+    if response.status_code != 200:
+        return False
+    if response.has_header('X-Accel-Redirect') or response.has_header('X-Sendfile'):
+        range_header = request.headers.get('Range')
+        return not range_header or bool(FIRST_RANGE_PATTERN.match(range_header))
+    return True
@@ -0,0 +1,476 @@
+"""
+Streaming media probe for uploads.
+Files are fed to a MediaProbe chunk by chunk as they arrive; it keeps only the
+first and last few kilobytes (plus the MP4 'moov' box, wherever it sits) and
+from those sniffs the real MIME type from magic bytes and reads duration and
+pixel dimensions from the container headers. No file is read twice and no
+external tools are needed.
+
+Supported: PNG, JPEG, GIF, WebP, PDF, ZIP/Office, MP4/M4A/MOV, WebM/Matroska,
+Ogg (Vorbis/Opus), MP3, WAV, FLAC, and Windows/ELF/Mach-O executables
+(so they can be refused). Anything else is reported as text/plain or
+application/octet-stream without duration or dimensions.
+"""
+
+import struct
+
+
+HEAD_SIZE = 64 * 1024
+TAIL_SIZE = 64 * 1024
+MAX_MOOV_SIZE = 8 * 1024 * 1024
+PROBE_READ_SIZE = 64 * 1024
+
+MEDIA_TYPES = ('image/', 'audio/', 'video/')
+MACH_O_MAGIC = (b'\xfe\xed\xfa\xce', b'\xfe\xed\xfa\xcf', b'\xce\xfa\xed\xfe', b'\xcf\xfa\xed\xfe')
+
+
+class _AtomWalker:
+    """
+    Follows top-level ISO BMFF (MP4) boxes across chunks, skipping media data
+    and capturing the 'moov' box so its headers can be parsed at the end.
+    """
+
+    def __init__(self):
+        self.next_box = 0
+        self.header = bytearray()
+        self.header_need = 8
+        self.moov = None
+        self.moov_end = 0
+        self.done = False
+
+    def feed(self, data, offset):
+        pos = 0
+        while pos < len(data) and not self.done:
+            position = offset + pos
+            if self.moov is not None and len(self.moov) < self.moov_end:
+                take = data[pos:pos + self.moov_end - len(self.moov)]
+                self.moov += take
+                pos += len(take)
+                if len(self.moov) == self.moov_end:
+                    self.done = True
+                continue
+            if position < self.next_box:
+                pos += min(self.next_box - position, len(data) - pos)
+                continue
+
+            take = data[pos:pos + self.header_need - len(self.header)]
+            self.header += take
+            pos += len(take)
+            if len(self.header) < self.header_need:
+                continue
+
+            size, box_type = struct.unpack('>I4s', self.header[:8])
+            if size == 1 and self.header_need == 8:
+                # 64-bit box size follows the type
+                self.header_need = 16
+                continue
+            header_len = self.header_need
+            if size == 1:
+                size = struct.unpack('>Q', self.header[8:16])[0]
+            if size < header_len or not all(32 <= byte < 127 for byte in box_type):
+                # Not (or no longer) an MP4 box structure
+                self.done = True
+                break
+
+            if box_type == b'moov' and size <= MAX_MOOV_SIZE:
+                self.moov = bytearray(self.header)
+                self.moov_end = size
+            self.next_box += size
+            self.header = bytearray()
+            self.header_need = 8
+
+
+def _iter_boxes(data, start, end):
+    """Yield (type, payload_start, payload_end) for the ISO BMFF boxes in data[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[pos:pos + 8])
+        header_len = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header_len = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_len or pos + size > end:
+            return
+        yield box_type, pos + header_len, pos + size
+        pos += size
+
+
+def _parse_moov(moov):
+    """Read (duration, width, height) from a captured moov box."""
+    duration = width = height = None
+    for box_type, start, end in _iter_boxes(moov, 0, len(moov)):
+        if box_type != b'moov':
+            continue
+        for child, child_start, child_end in _iter_boxes(moov, start, end):
+            if child == b'mvhd' and child_end - child_start >= 20:
+                if moov[child_start] == 1 and child_end - child_start >= 32:
+                    timescale, length = struct.unpack('>IQ', moov[child_start + 20:child_start + 32])
+                else:
+                    timescale, length = struct.unpack('>II', moov[child_start + 12:child_start + 20])
+                if timescale:
+                    duration = length / timescale
+            elif child == b'trak' and width is None:
+                for track_box, track_start, track_end in _iter_boxes(moov, child_start, child_end):
+                    if track_box == b'tkhd' and track_end - track_start >= 84:
+                        track_width, track_height = struct.unpack('>II', moov[track_end - 8:track_end])
+                        if track_width and track_height:
+                            width, height = track_width >> 16, track_height >> 16
+    return duration, width, height
+
+
+def _read_vint(data, pos, keep_marker=False):
+    """Read an EBML variable-length integer; returns (value, length) or (None, 0)."""
+    if pos >= len(data):
+        return None, 0
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or pos + length > len(data):
+        return None, 0
+    value = first if keep_marker else first & (mask - 1)
+    all_ones = value == mask - 1
+    for byte in data[pos + 1:pos + length]:
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    if all_ones and not keep_marker:
+        return -1, length  # unknown size
+    return value, length
+
+
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TRACKS = 0x1654AE6B
+EBML_TRACK_ENTRY = 0xAE
+EBML_VIDEO = 0xE0
+EBML_CLUSTER = 0x1F43B675
+EBML_CONTAINERS = {EBML_SEGMENT, EBML_INFO, EBML_TRACKS, EBML_TRACK_ENTRY, EBML_VIDEO}
+
+
+def _parse_matroska(head, tail):
+    """Read (mime type, duration, width, height) from WebM/Matroska headers."""
+    values = {}
+    doc_type = b'webm'
+    pos = 0
+    while pos < len(head):
+        element_id, id_len = _read_vint(head, pos, keep_marker=True)
+        size, size_len = _read_vint(head, pos + id_len)
+        if element_id is None or size is None:
+            break
+        pos += id_len + size_len
+        if element_id == EBML_CLUSTER:
+            break
+        if element_id in EBML_CONTAINERS or size == -1:
+            continue
+        payload = head[pos:pos + size]
+        if element_id == 0x4282:
+            doc_type = bytes(payload)
+        elif element_id in (0x2AD7B1, 0xB0, 0xBA) and element_id not in values:
+            values[element_id] = int.from_bytes(payload, 'big')
+        elif element_id == 0x4489 and size in (4, 8):
+            values[element_id] = struct.unpack('>f' if size == 4 else '>d', payload)[0]
+        pos += size
+
+    scale = values.get(0x2AD7B1, 1000000)
+    duration = None
+    if values.get(0x4489):
+        duration = values[0x4489] * scale / 1e9
+    else:
+        # Recorders that stream WebM (e.g. browser MediaRecorder) leave Duration out;
+        # fall back to the timecode of the last cluster in the file
+        index = tail.rfind(b'\x1f\x43\xb6\x75')
+        if index >= 0:
+            size, size_len = _read_vint(tail, index + 4)
+            timecode_pos = index + 4 + size_len
+            if size is not None and tail[timecode_pos:timecode_pos + 1] == b'\xe7':
+                length, length_len = _read_vint(tail, timecode_pos + 1)
+                if length and length > 0:
+                    start = timecode_pos + 1 + length_len
+                    duration = int.from_bytes(tail[start:start + length], 'big') * scale / 1e9
+
+    width, height = values.get(0xB0), values.get(0xBA)
+    if doc_type == b'webm':
+        mime_type = 'video/webm' if width else 'audio/webm'
+    else:
+        mime_type = 'video/x-matroska' if width else 'audio/x-matroska'
+    return mime_type, duration, width, height
+
+
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+
+
+def _parse_mp3(head, size):
+    """Read the duration of an MP3 from its first frame (Xing/Info header or constant bitrate)."""
+    pos = 0
+    if head[:3] == b'ID3' and len(head) >= 10:
+        tag_size = 0
+        for byte in head[6:10]:
+            tag_size = (tag_size << 7) | (byte & 0x7F)
+        pos = 10 + tag_size
+    if pos + 4 > len(head) or head[pos] != 0xFF or head[pos + 1] & 0xE0 != 0xE0:
+        return None
+
+    version_bits = (head[pos + 1] >> 3) & 0x03
+    layer_bits = (head[pos + 1] >> 1) & 0x03
+    if version_bits == 1 or layer_bits != 1:
+        return None  # reserved version, or not Layer III
+    version = {3: 1, 2: 2, 0: 2.5}[version_bits]
+    bitrate_index = head[pos + 2] >> 4
+    rate_index = (head[pos + 2] >> 2) & 0x03
+    if bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    samples_per_frame = 1152 if version == 1 else 576
+
+    frame = head[pos:pos + 200]
+    for marker in (b'Xing', b'Info'):
+        index = frame.find(marker)
+        if index >= 0 and len(frame) >= index + 12 and frame[index + 7] & 0x01:
+            frames = struct.unpack('>I', frame[index + 8:index + 12])[0]
+            return frames * samples_per_frame / sample_rate
+    return (size - pos) * 8 / bitrate
+
+
+def _parse_riff(head, size):
+    """Read (mime type, duration, width, height) from a WAV or WebP file."""
+    form = head[8:12]
+    pos = 12
+    byte_rate = None
+    while pos + 8 <= len(head):
+        chunk_id = head[pos:pos + 4]
+        chunk_size = struct.unpack('<I', head[pos + 4:pos + 8])[0]
+        payload = head[pos + 8:pos + 8 + min(chunk_size, 64)]
+        if form == b'WAVE':
+            if chunk_id == b'fmt ' and len(payload) >= 12:
+                byte_rate = struct.unpack('<I', payload[8:12])[0]
+            elif chunk_id == b'data':
+                data_size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else size - pos - 8
+                duration = data_size / byte_rate if byte_rate else None
+                return 'audio/wav', duration, None, None
+        elif form == b'WEBP':
+            if chunk_id == b'VP8 ' and len(payload) >= 10 and payload[3:6] == b'\x9d\x01\x2a':
+                width, height = struct.unpack('<HH', payload[6:10])
+                return 'image/webp', None, width & 0x3FFF, height & 0x3FFF
+            if chunk_id == b'VP8L' and len(payload) >= 5 and payload[0] == 0x2F:
+                bits = struct.unpack('<I', payload[1:5])[0]
+                return 'image/webp', None, (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk_id == b'VP8X' and len(payload) >= 10:
+                width = int.from_bytes(payload[4:7], 'little') + 1
+                height = int.from_bytes(payload[7:10], 'little') + 1
+                return 'image/webp', None, width, height
+        pos += 8 + chunk_size + (chunk_size & 1)
+    if form == b'WEBP':
+        return 'image/webp', None, None, None
+    if form == b'WAVE':
+        return 'audio/wav', None, None, None
+    return 'application/octet-stream', None, None, None
+
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _parse_jpeg(head):
+    """Read (width, height) from the first JPEG start-of-frame segment."""
+    pos = 2
+    while pos + 9 < len(head):
+        if head[pos] != 0xFF:
+            return None, None
+        marker = head[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', head[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + struct.unpack('>H', head[pos + 2:pos + 4])[0]
+    return None, None
+
+
+def _parse_ogg(head, tail):
+    """Read the duration of an Ogg Vorbis or Opus stream from its first and last pages."""
+    if len(head) < 28:
+        return None
+    payload = head[27 + head[26]:]
+    if payload[:8] == b'OpusHead' and len(payload) >= 12:
+        sample_rate = 48000
+        pre_skip = struct.unpack('<H', payload[10:12])[0]
+    elif payload[:7] == b'\x01vorbis' and len(payload) >= 16:
+        sample_rate = struct.unpack('<I', payload[12:16])[0]
+        pre_skip = 0
+    else:
+        return None
+    index = tail.rfind(b'OggS')
+    if index < 0 or index + 14 > len(tail) or not sample_rate:
+        return None
+    granule = struct.unpack('<q', tail[index + 6:index + 14])[0]
+    return max(granule - pre_skip, 0) / sample_rate
+
+
+def _sniff_zip(head):
+    """Tell Office Open XML documents apart from plain zip archives by their member names."""
+    if b'word/' in head:
+        return 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    if b'ppt/' in head:
+        return 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+    if b'xl/' in head:
+        return 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    return 'application/zip'
+
+
+class MediaProbe:
+    """
+    Incremental probe fed with an upload's chunks in order.
+
+    Usage:
+        probe = MediaProbe()
+        for chunk in chunks:
+            probe.feed(chunk)
+        probe.result()  # {'mime_type': ..., 'duration': ..., 'width': ..., 'height': ...}
+    """
+
+    def __init__(self):
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.size = 0
+        self.atoms = _AtomWalker()
+
+    def feed(self, data):
+        """Take the next chunk of the file."""
+        if len(self.head) < HEAD_SIZE:
+            self.head += data[:HEAD_SIZE - len(self.head)]
+        if len(data) >= TAIL_SIZE:
+            self.tail = bytearray(data[-TAIL_SIZE:])
+        else:
+            self.tail += data
+            del self.tail[:-TAIL_SIZE]
+        if not self.atoms.done:
+            self.atoms.feed(data, self.size)
+        self.size += len(data)
+
+    def result(self):
+        """
+        Get what the probe found.
+
+        Returns:
+            Dict with mime_type, duration (seconds, float) and width/height (pixels);
+            values that do not apply or could not be read are None
+        """
+        head = bytes(self.head)
+        mime_type, duration, width, height = 'application/octet-stream', None, None, None
+
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and len(head) >= 24:
+            mime_type = 'image/png'
+            width, height = struct.unpack('>II', head[16:24])
+        elif head.startswith(b'\xff\xd8\xff'):
+            mime_type = 'image/jpeg'
+            width, height = _parse_jpeg(head)
+        elif head[:6] in (b'GIF87a', b'GIF89a') and len(head) >= 10:
+            mime_type = 'image/gif'
+            width, height = struct.unpack('<HH', head[6:10])
+        elif head.startswith(b'RIFF') and len(head) >= 12:
+            mime_type, duration, width, height = _parse_riff(head, self.size)
+        elif head.startswith(b'%PDF-'):
+            mime_type = 'application/pdf'
+        elif head.startswith(b'PK\x03\x04'):
+            mime_type = _sniff_zip(head)
+        elif head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+            mime_type = 'application/vnd.ms-office'
+        elif head[4:8] == b'ftyp':
+            brand = head[8:12]
+            duration, width, height = _parse_moov(self.atoms.moov or b'')
+            if brand == b'qt  ':
+                mime_type = 'video/quicktime'
+            elif brand.startswith(b'3g'):
+                mime_type = 'video/3gpp' if width else 'audio/3gpp'
+            else:
+                mime_type = 'video/mp4' if width else 'audio/mp4'
+        elif head.startswith(b'\x1a\x45\xdf\xa3'):
+            mime_type, duration, width, height = _parse_matroska(head, bytes(self.tail))
+        elif head.startswith(b'OggS'):
+            mime_type = 'audio/ogg'
+            duration = _parse_ogg(head, bytes(self.tail))
+        elif head.startswith(b'fLaC') and len(head) >= 26:
+            mime_type = 'audio/flac'
+            info = int.from_bytes(head[18:26], 'big')
+            sample_rate = info >> 44
+            total_samples = info & 0xFFFFFFFFF
+            duration = total_samples / sample_rate if sample_rate and total_samples else None
+        elif head.startswith(b'MZ') and b'\x00' in head[:64]:
+            mime_type = 'application/x-msdownload'
+        elif head.startswith(b'\x7fELF'):
+            mime_type = 'application/x-executable'
+        elif head[:4] in MACH_O_MAGIC:
+            mime_type = 'application/x-mach-binary'
+        elif head.startswith(b'ID3') or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+            duration = _parse_mp3(head, self.size)
+            if duration is not None or head.startswith(b'ID3'):
+                mime_type = 'audio/mpeg'
+        elif head and b'\x00' not in head:
+            try:
+                head.decode('utf-8')
+                mime_type = 'text/plain'
+            except UnicodeDecodeError as e:
+                # The head may end part way through a multi-byte character
+                if e.start >= len(head) - 3:
+                    mime_type = 'text/plain'
+
+        return {
+            'mime_type': mime_type,
+            'duration': round(duration, 3) if duration else None,
+            'width': width or None,
+            'height': height or None,
+        }
+
+
+def probe_file(file):
+    """Probe a stored or uploaded file by reading it once in chunks; the position is restored to the start."""
+    probe = MediaProbe()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(PROBE_READ_SIZE), b''):
+        probe.feed(chunk)
+    file.seek(0)
+    return probe.result()
+
+
+def sniff_mime_type(file):
+    """Sniff a file's MIME type from its first bytes only; the position is restored to the start."""
+    probe = MediaProbe()
+    file.seek(0)
+    probe.feed(file.read(PROBE_READ_SIZE))
+    file.seek(0)
+    return probe.result()['mime_type']
+
+
+def get_upload_probe(request, field_name):
+    """
+    Get the probe result for an uploaded file field.
+    Uses the result StreamingUploadHandler recorded on the upload while it streamed in,
+    and probes the file directly if the handler was not installed.
+    """
+    upload = request.FILES[field_name]
+    return getattr(upload, 'media_probe', None) or probe_file(upload)
+
+
+def media_file_type(mime_type, default='document'):
+    """Classify a sniffed MIME type as the 'media' or 'document' file type used by chat attachments."""
+    if not mime_type or mime_type == 'application/octet-stream':
+        return default
+    return 'media' if mime_type.startswith(MEDIA_TYPES) else 'document'
+
+
+def probed_duration(probe, default=0):
+    """Get a probed duration in whole seconds, or default when the probe found none."""
+    if probe and probe.get('duration') is not None:
+        return int(round(probe['duration']))
+    return default
@@ -63,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.upload_middleware.FileUploadMiddleware',  # 413/415 responses for refused uploads
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -231,11 +232,17 @@ FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 # Temporary file upload directory
 FILE_UPLOAD_TEMP_DIR = None  # Use system default
 
-# File upload handlers - optimize for performance
+# File upload handler - one pass per chunk: size limit, type sniffing, SHA-256, media probe,
+# progress, then memory (requests up to FILE_UPLOAD_MAX_MEMORY_SIZE) or a temporary file
 FILE_UPLOAD_HANDLERS = [
-    'django.core.files.uploadhandler.MemoryFileUploadHandler',
-    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
-    'resources.upload_handlers.OptimizedFileUploadHandler',
+    'resources.upload_handlers.StreamingUploadHandler',
+]
+
+# Uploads whose magic bytes identify one of these types are refused with 415
+UPLOAD_BLOCKED_MIME_TYPES = [
+    'application/x-msdownload',
+    'application/x-executable',
+    'application/x-mach-binary',
 ]
 
 # Maximum upload size (50MB)
@@ -244,6 +251,31 @@ MAX_UPLOAD_SIZE = 50 * 1024 * 1024
 # Upload timeout (in seconds)
 UPLOAD_TIMEOUT = 300  # 5 minutes
 
+# Live upload progress (core.upload_progress)
+UPLOAD_PROGRESS_MIN_INTERVAL = 0.25  # seconds between progress updates for one upload
+UPLOAD_PROGRESS_TIMEOUT = 3600  # seconds progress stays pollable after the last update
+
+# Image thumbnails, rendered after upload in a process pool and stored as WebP next to the original
+THUMBNAIL_SIZES = {'small': 160, 'medium': 480}  # size name -> longest edge in pixels
+THUMBNAIL_WORKERS = 2  # rendering processes; 0 renders in the background thread itself
+THUMBNAILS_ASYNC = True  # render after the response; False renders inline on commit (tests)
+
+# Download delivery: 'django' streams files from Python; 'nginx' (X-Accel-Redirect) and
+# 'sendfile' (X-Sendfile) hand the transfer to the front web server after the permission check
+FILE_DELIVERY_BACKEND = 'django'
+FILE_DELIVERY_INTERNAL_PREFIX = '/protected-media/'  # nginx 'internal' location aliased to MEDIA_ROOT
+
+# Resource download/view counters are buffered per process and written in bulk
+RESOURCE_COUNTER_FLUSH_INTERVAL = 10  # seconds between counter flushes
+RESOURCE_COUNTER_MAX_PENDING = 1000  # flush early once this many resource/day buckets are buffered
+RESOURCE_STATS_CACHE_TIMEOUT = 60  # seconds admin resource stats are cached (saves and deletes refresh them sooner)
+RESOURCE_LIST_CACHE_TIMEOUT = 300  # seconds resource list/search pages are cached (saves and deletes retire them sooner)
+
+# Resumable chunked uploads
+CHUNKED_UPLOAD_DIR = None  # Working directory for partial uploads (system temp dir when None)
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 5 * 1024 * 1024  # 5MB per chunk
+RESOURCE_UPLOAD_SESSION_EXPIRY_HOURS = 24  # abandoned resource uploads are removed by clean_resource_uploads
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React development server
@@ -289,3 +321,40 @@ CHANNEL_LAYERS = {
 #         },
 #     },
 # }
+
+# Cache Configuration
+# Using local-memory cache for development (per process, no Redis required)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'wishare-default',
+    },
+}
+
+# Redis cache configuration (shared across worker processes; enable alongside the Redis channel layer)
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#         'LOCATION': 'redis://127.0.0.1:6379/1',
+#     },
+# }
+
+# Chat Settings
+CHAT_MEMBERSHIP_CACHE_TIMEOUT = 30  # seconds a resolved room membership is cached
+CHAT_ARCHIVE_AFTER_DAYS = 180  # default age at which room messages move to the cold archive
+CHAT_TEARDOWN_ASYNC = True  # delete ended rooms in a background thread (run inline when False)
+CHAT_TEARDOWN_BATCH_SIZE = 500  # rows deleted per transaction while tearing down a room
+CHAT_PRESENCE_TTL = 60  # seconds a room connection stays online without a heartbeat
+CHAT_TYPING_MIN_INTERVAL = 2  # minimum seconds between fanned-out typing events per user
+CHAT_MENTION_INDEX_CACHE_TIMEOUT = 300  # seconds a room's @mention username index is cached
+# Buckets live in the default cache: with LocMemCache above the limit applies per worker process;
+# switch CACHES to Redis for one limit across all workers
+CHAT_FLOOD_CONTROL = {  # token buckets per user and room: burst capacity, tokens regained per second
+    'message': {'capacity': 10, 'refill_rate': 0.5},
+    'reaction': {'capacity': 20, 'refill_rate': 2.0},
+}
+CHAT_EXPORT_CHUNK_SIZE = 2000  # rows fetched per database round trip when streaming a transcript export
+CHAT_UPLOAD_SESSION_EXPIRY_HOURS = 24  # abandoned resumable uploads are removed by clean_chat_uploads
+CHAT_ACTIVITY_WINDOW_MINUTES = 60  # message window aggregated by refresh_room_activity
+CHAT_ACTIVITY_HALF_LIFE_HOURS = 6  # hours for a room's recency bonus to halve after its last message
+CHAT_ACTIVE_NOW_MINUTES = 15  # rooms with a message this recent are listed under sort=active_now
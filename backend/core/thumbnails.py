@@ -0,0 +1,246 @@
+"""
+Thumbnail derivatives for uploaded images.
+After an image is saved, its thumbnails are rendered in the background: the
+file is read once, Pillow resizes it in a process pool (so decoding large
+photos never holds up request threads or the GIL), and each size is stored
+next to the original with a content version in its name:
+
+    profile_photos/ada.jpg  →  profile_photos/ada.small.3fa9c1d2e4b5.webp
+
+A new upload gets new names, so thumbnails can be cached indefinitely. The
+stored names are kept in a JSON field on the model ({size: name}); serializers
+turn them into URLs with thumbnail_urls(). Files Pillow cannot open (video,
+audio, documents) get no thumbnails; clients draw a placeholder for their
+preview_type() instead.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+RENDER_TIMEOUT = 60
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_thumbnail_sizes():
+    return getattr(settings, 'THUMBNAIL_SIZES', {'small': 160, 'medium': 480})
+
+
+def render_thumbnails(data, sizes):
+    """
+    Resize an image to fit each bounding box. Runs in a worker process.
+
+    Args:
+        data: Bytes of the original image
+        sizes: Dict of size name -> longest edge in pixels
+
+    Returns:
+        Dict of size name -> WebP bytes; empty if the data is not an image Pillow can read
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Let JPEG decode at reduced scale; animated images use their first frame
+            image.draft('RGB', (max(sizes.values()),) * 2)
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+            rendered = {}
+            for name, edge in sizes.items():
+                thumbnail = image.copy()
+                thumbnail.thumbnail((edge, edge), Image.LANCZOS)
+                output = io.BytesIO()
+                thumbnail.save(output, 'WEBP', quality=80, method=4)
+                rendered[name] = output.getvalue()
+            return rendered
+    except (UnidentifiedImageError, OSError, ValueError, Image.DecompressionBombError):
+        return {}
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def _render(data, sizes):
+    """Render in the process pool, or in this thread when THUMBNAIL_WORKERS is 0."""
+    global _pool
+    if not getattr(settings, 'THUMBNAIL_WORKERS', 2):
+        return render_thumbnails(data, sizes)
+    try:
+        return _get_pool().submit(render_thumbnails, data, sizes).result(timeout=RENDER_TIMEOUT)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory on a huge image); start a fresh pool next time
+        with _pool_lock:
+            _pool = None
+        return {}
+
+
+def thumbnail_name(name, size_name, version):
+    """Get the storage name of one thumbnail, next to the original."""
+    stem = os.path.splitext(name)[0]
+    return f'{stem}.{size_name}.{version[:12]}.webp'
+
+
+def generate_thumbnails(field_file, version=None):
+    """
+    Store every configured thumbnail size for a saved image.
+    Thumbnails that already exist for this content (e.g. a shared resource blob) are reused.
+
+    Args:
+        field_file: FieldFile of the stored original
+        version: Content hash of the original (computed from the file when not given)
+
+    Returns:
+        Dict of size name -> storage name; empty when the file is not a readable image
+    """
+    storage = field_file.storage
+    sizes = get_thumbnail_sizes()
+
+    with field_file.open('rb') as file:
+        data = file.read()
+    version = version or hashlib.sha256(data).hexdigest()
+    names = {size_name: thumbnail_name(field_file.name, size_name, version) for size_name in sizes}
+    if all(storage.exists(name) for name in names.values()):
+        return names
+
+    rendered = _render(data, sizes)
+    if not rendered:
+        return {}
+    for size_name, content in rendered.items():
+        if storage.exists(names[size_name]):
+            storage.delete(names[size_name])
+        storage.save(names[size_name], ContentFile(content))
+    return names
+
+
+def delete_thumbnails(storage, thumbnails, keep=()):
+    """Remove stored thumbnails ({size: name}), except the names in keep."""
+    for name in (thumbnails or {}).values():
+        if name not in keep:
+            try:
+                storage.delete(name)
+            except Exception as e:
+                print(f"Error deleting thumbnail {name}: {e}")
+
+
+def refresh_thumbnails(model, pk, field_name, thumbnails_field='thumbnails', delete_previous=True, on_recorded=None):
+    """
+    Generate thumbnails for an object's image and record them on the object.
+    Nothing is recorded if the object's file changed while rendering.
+
+    Args:
+        delete_previous: Remove the thumbnails recorded before; off when they may be
+            shared with other objects and are cleaned up with the original instead
+        on_recorded: Called once the names are committed, e.g. to drop cached responses
+            (the queryset update that records them sends no save signal)
+    """
+    instance = model.objects.filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None) if instance else None
+    if not field_file:
+        return {}
+
+    previous = getattr(instance, thumbnails_field) or {}
+    names = generate_thumbnails(field_file, version=getattr(instance, 'content_hash', None) or None)
+    updated = model.objects.filter(pk=pk, **{field_name: field_file.name}).update(**{thumbnails_field: names})
+    if updated and on_recorded is not None:
+        transaction.on_commit(on_recorded)
+    if delete_previous:
+        if updated:
+            delete_thumbnails(field_file.storage, previous, keep=set(names.values()))
+        else:
+            delete_thumbnails(field_file.storage, names)
+    return names
+
+
+def schedule_thumbnails(model, pk, field_name, thumbnails_field='thumbnails', delete_previous=True, on_recorded=None):
+    """
+    Generate thumbnails once the current transaction commits: in a background thread,
+    or inline when THUMBNAILS_ASYNC is off. Arguments are passed to refresh_thumbnails().
+    """
+    def run():
+        if not getattr(settings, 'THUMBNAILS_ASYNC', True):
+            refresh_thumbnails(model, pk, field_name, thumbnails_field, delete_previous, on_recorded)
+            return
+
+        def target():
+            try:
+                refresh_thumbnails(model, pk, field_name, thumbnails_field, delete_previous, on_recorded)
+            except Exception as e:
+                print(f"Error generating thumbnails for {model.__name__} {pk}: {e}")
+            finally:
+                connections.close_all()
+
+        threading.Thread(target=target, name=f'thumbnails-{model.__name__}-{pk}', daemon=True).start()
+
+    transaction.on_commit(run)
+
+
+def delete_derivatives(storage, name):
+    """Remove every thumbnail stored next to an original, whatever its size or version."""
+    directory, filename = os.path.split(name)
+    prefix = os.path.splitext(filename)[0] + '.'
+    try:
+        files = storage.listdir(directory)[1]
+    except FileNotFoundError:
+        return
+    for derived in files:
+        if derived.startswith(prefix) and derived != filename:
+            storage.delete(f'{directory}/{derived}' if directory else derived)
+
+
+def is_image_name(name):
+    return bool(name) and os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def thumbnail_urls(field_file, thumbnails, request=None):
+    """Get {size: URL} for stored thumbnail names; empty when there are none."""
+    if not thumbnails:
+        return {}
+    storage = field_file.storage
+    urls = {}
+    for size_name, name in thumbnails.items():
+        url = storage.url(name)
+        urls[size_name] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def preview_type(mime_type=None, name=None):
+    """
+    Classify a file for list previews: 'image', 'video', 'audio', 'pdf' or 'document'.
+    Clients show the thumbnail for images and a placeholder for the rest.
+    """
+    if mime_type:
+        for kind in ('image', 'video', 'audio'):
+            if mime_type.startswith(kind + '/'):
+                return kind
+        if mime_type == 'application/pdf':
+            return 'pdf'
+    extension = os.path.splitext(name or '')[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in ('.mp4', '.mov', '.webm', '.mkv'):
+        return 'video'
+    if extension in ('.mp3', '.wav', '.ogg', '.m4a', '.flac'):
+        return 'audio'
+    if extension == '.pdf':
+        return 'pdf'
+    return 'document'
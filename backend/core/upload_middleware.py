@@ -4,7 +4,36 @@ Middleware for handling file uploads and optimization.
 import time
 from django.http import JsonResponse
 from django.conf import settings
-from django.core.exceptions import RequestDataTooBig
+from django.core.exceptions import RequestDataTooBig, SuspiciousOperation
+
+
+class UploadTooLarge(RequestDataTooBig):
+    """Raised by the upload handler as soon as a file exceeds MAX_UPLOAD_SIZE."""
+    
+    def __init__(self, max_size):
+        self.max_size = max_size
+        super().__init__(f'Maximum upload size is {max_size // (1024*1024)}MB')
+
+
+class UploadTypeNotAllowed(SuspiciousOperation):
+    """Raised by the upload handler when a file's sniffed type is in UPLOAD_BLOCKED_MIME_TYPES."""
+    
+    def __init__(self, mime_type):
+        self.mime_type = mime_type
+        super().__init__(f'Files of type {mime_type} cannot be uploaded')
+
+
+def check_upload_type(mime_type):
+    """
+    Refuse a sniffed MIME type listed in UPLOAD_BLOCKED_MIME_TYPES.
+    Every upload path calls this: the streaming handler for multipart uploads, and
+    the finalize step of chunked uploads.
+
+    Raises:
+        UploadTypeNotAllowed: If the type is blocked (answered with 415 by FileUploadMiddleware)
+    """
+    if mime_type in getattr(settings, 'UPLOAD_BLOCKED_MIME_TYPES', ()):
+        raise UploadTypeNotAllowed(mime_type)
 
 
 class FileUploadMiddleware:
@@ -34,6 +63,13 @@ class FileUploadMiddleware:
                 'code': 'FILE_TOO_LARGE'
             }, status=413)
         
+        if isinstance(exception, UploadTypeNotAllowed):
+            return JsonResponse({
+                'error': 'File type not allowed',
+                'message': str(exception),
+                'code': 'FILE_TYPE_NOT_ALLOWED'
+            }, status=415)
+        
         # Handle file upload timeout
         if hasattr(request, '_upload_start_time'):
             upload_time = time.time() - request._upload_start_time
@@ -48,27 +84,3 @@ class FileUploadMiddleware:
         
         return None
 
-
-class ProgressTrackingMiddleware:
-    """
-    Middleware to track upload progress.
-    """
-    
-    def __init__(self, get_response):
-        self.get_response = get_response
-    
-    def __call__(self, request):
-        # Add progress tracking for file uploads
-        if (request.method == 'POST' and 
-            request.content_type and 
-            'multipart/form-data' in request.content_type):
-            
-            # Set up progress tracking
-            request._upload_progress = {
-                'bytes_received': 0,
-                'total_bytes': int(request.META.get('CONTENT_LENGTH', 0)),
-                'start_time': time.time()
-            }
-        
-        response = self.get_response(request)
-        return response
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Live progress for file uploads.
+A client names its upload with an X-Upload-ID header (or ?upload_id=). While the
+body streams in, progress is written to the cache under that id and pushed to
+the uploader's notification websocket group as an 'upload_progress' event, at
+most every UPLOAD_PROGRESS_MIN_INTERVAL seconds. Clients without a websocket
+poll the progress endpoint instead.
+
+States: 'uploading' while bytes arrive, 'received' once the body is complete,
+'complete' when the upload has been saved (with the created object's id) and
+'failed' if the transfer was interrupted.
+"""
+
+import re
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+
+UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9-]{1,64}$')
+
+
+def get_upload_id(request):
+    """Get the client's upload id from the X-Upload-ID header or ?upload_id=, or None."""
+    upload_id = request.headers.get('X-Upload-ID') or request.GET.get('upload_id')
+    if upload_id and UPLOAD_ID_PATTERN.match(upload_id):
+        return upload_id
+    return None
+
+
+def progress_key(upload_id):
+    return f'upload_progress:{upload_id}'
+
+
+def get_progress(upload_id, user_id):
+    """Get an upload's latest progress, or None if it is unknown or belongs to another user."""
+    progress = cache.get(progress_key(upload_id))
+    if not progress or progress['user_id'] != user_id:
+        return None
+    return progress
+
+
+class UploadProgress:
+    """
+    Publishes the progress of one upload.
+    update() is cheap to call for every chunk; it only writes and broadcasts when
+    the throttle interval has passed, and always for a change of state.
+    """
+
+    def __init__(self, upload_id, user_id, total_bytes=0):
+        self.upload_id = upload_id
+        self.user_id = user_id
+        self.total_bytes = total_bytes
+        self.received_bytes = 0
+        self.last_published = None
+
+    def update(self, received_bytes, state='uploading', **extra):
+        """Record the bytes received so far and publish if due."""
+        self.received_bytes = received_bytes
+        interval = getattr(settings, 'UPLOAD_PROGRESS_MIN_INTERVAL', 0.25)
+        now = time.monotonic()
+        if state == 'uploading' and self.last_published is not None and now - self.last_published < interval:
+            return False
+        self.last_published = now
+        self.publish(state, **extra)
+        return True
+
+    def finish(self, state='complete', **extra):
+        """Publish a final state (always sent)."""
+        self.update(self.received_bytes, state=state, **extra)
+
+    def as_dict(self, state, **extra):
+        percent = 0
+        if self.total_bytes:
+            percent = min(round(self.received_bytes * 100 / self.total_bytes, 1), 100)
+        return {
+            'upload_id': self.upload_id,
+            'user_id': self.user_id,
+            'state': state,
+            'received_bytes': self.received_bytes,
+            'total_bytes': self.total_bytes,
+            'percent': percent,
+            'updated_at': time.time(),
+            **extra,
+        }
+
+    def publish(self, state, **extra):
+        progress = self.as_dict(state, **extra)
+        cache.set(progress_key(self.upload_id), progress, getattr(settings, 'UPLOAD_PROGRESS_TIMEOUT', 3600))
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        try:
+            async_to_sync(channel_layer.group_send)(
+                f'notifications_{self.user_id}',
+                {'type': 'upload_progress', 'progress': progress}
+            )
+        except Exception as e:
+            # Polling still works without the websocket push
+            print(f"Error publishing upload progress {self.upload_id}: {str(e)}")
+
+
+def track_request_upload(request, total_bytes=0):
+    """
+    Get an UploadProgress for a request that names an upload id, or None.
+    Only authenticated uploads are tracked, so progress always has an owner.
+    """
+    upload_id = get_upload_id(request)
+    user = getattr(request, 'user', None)
+    if not upload_id or not user or not user.is_authenticated:
+        return None
+    return UploadProgress(upload_id, user.id, total_bytes)
+
+
+def complete_request_upload(request, **extra):
+    """Mark a request's tracked upload as saved, e.g. with the created resource's id."""
+    progress = getattr(request, 'upload_progress', None)
+    if progress is not None:
+        progress.finish('complete', **extra)
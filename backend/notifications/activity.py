@@ -0,0 +1,99 @@
+"""
+Precomputed activity ranking for chat room discovery.
+A periodic job (refresh_room_activity) turns recent message volume, distinct
+posters and time since the last message into a score stored on ChatRoom, so
+listing rooms by activity is an indexed ORDER BY instead of a message scan.
+"""
+
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import ChatRoom, ChatMessage
+
+
+ACTIVITY_WINDOW_MINUTES = getattr(settings, 'CHAT_ACTIVITY_WINDOW_MINUTES', 60)
+ACTIVITY_HALF_LIFE_HOURS = getattr(settings, 'CHAT_ACTIVITY_HALF_LIFE_HOURS', 6)
+ACTIVE_NOW_MINUTES = getattr(settings, 'CHAT_ACTIVE_NOW_MINUTES', 15)
+
+# Weights for the score components
+POSTER_WEIGHT = 2.0
+RECENCY_WEIGHT = 10.0
+
+
+def compute_activity_score(messages_per_hour, active_posters, last_message_at, now):
+    """
+    Score a room from its recent activity.
+    Recency decays exponentially, halving every ACTIVITY_HALF_LIFE_HOURS since the last message.
+    """
+    score = messages_per_hour + POSTER_WEIGHT * active_posters
+    if last_message_at:
+        hours_since = max((now - last_message_at).total_seconds() / 3600, 0)
+        score += RECENCY_WEIGHT * math.pow(0.5, hours_since / ACTIVITY_HALF_LIFE_HOURS)
+    return round(score, 4)
+
+
+def refresh_room_activity(now=None, batch_size=500):
+    """
+    Recompute activity scores for all active rooms.
+    Only messages inside the activity window are aggregated (one GROUP BY on the created_at index);
+    rooms without recent messages keep their last_message_at and only their recency term decays.
+    Rooms scored for the first time are seeded with their latest message time.
+
+    Returns:
+        Number of rooms updated
+    """
+    now = now or timezone.now()
+    window_start = now - timedelta(minutes=ACTIVITY_WINDOW_MINUTES)
+    window_hours = ACTIVITY_WINDOW_MINUTES / 60
+
+    recent = {
+        row['room_id']: row
+        for row in ChatMessage.objects.filter(created_at__gte=window_start).order_by().values('room_id').annotate(
+            message_count=Count('id'),
+            poster_count=Count('user', distinct=True),
+            last_at=Max('created_at'),
+        )
+    }
+
+    # Rooms never scored before have no last_message_at; seed it from their latest message once
+    unseeded = ChatRoom.objects.filter(is_active=True, last_message_at__isnull=True)
+    last_seen = dict(
+        ChatMessage.objects.filter(room__in=unseeded).order_by().values('room_id').annotate(
+            last_at=Max('created_at')
+        ).values_list('room_id', 'last_at')
+    )
+
+    rooms = ChatRoom.objects.filter(is_active=True).only('id', 'last_message_at').order_by('id')
+    batch = []
+    updated = 0
+    for room in rooms.iterator(chunk_size=batch_size):
+        stats = recent.get(room.id)
+        if room.last_message_at is None:
+            room.last_message_at = last_seen.get(room.id)
+        if stats:
+            room.last_message_at = max(filter(None, [room.last_message_at, stats['last_at']]))
+        room.activity_score = compute_activity_score(
+            stats['message_count'] / window_hours if stats else 0,
+            stats['poster_count'] if stats else 0,
+            room.last_message_at,
+            now
+        )
+        batch.append(room)
+        if len(batch) >= batch_size:
+            ChatRoom.objects.bulk_update(batch, ['activity_score', 'last_message_at'])
+            updated += len(batch)
+            batch = []
+
+    if batch:
+        ChatRoom.objects.bulk_update(batch, ['activity_score', 'last_message_at'])
+        updated += len(batch)
+    return updated
+
+
+def get_active_now_since(now=None):
+    """Get the earliest last-message time that still counts as 'active now'."""
+    return (now or timezone.now()) - timedelta(minutes=ACTIVE_NOW_MINUTES)
@@ -0,0 +1,143 @@
+"""
+Capacity-checked admission to chat rooms.
+ChatRoom.participant_total counts active participants. Admitting someone is a
+compare-and-increment: a single conditional UPDATE that only succeeds while the
+room has space, so simultaneous joins cannot overfill a room and no COUNT query
+or room lock is needed. Leaving or being removed decrements it the same way.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ChatRoom, RoomParticipant
+from .membership import invalidate_membership
+from .mentions import invalidate_mention_index
+
+
+class RoomCapacityError(Exception):
+    """Raised when admitting users would take a room past max_participants."""
+
+    def __init__(self, available, requested):
+        self.available = available
+        self.requested = requested
+        super().__init__(f'Room has {available} open places but {requested} requests were selected.')
+
+
+class AlreadyParticipantError(Exception):
+    """Raised when the user is already an active participant of the room."""
+
+
+def get_available_places(room_id):
+    """Get how many more participants a room can take."""
+    row = ChatRoom.objects.filter(id=room_id).values('participant_total', 'max_participants').first()
+    if not row:
+        return 0
+    return max(row['max_participants'] - row['participant_total'], 0)
+
+
+def reserve_places(room_id, count=1):
+    """
+    Compare-and-increment the room's participant counter.
+
+    Returns:
+        True if the places were reserved, False if the room does not have room for count more
+    """
+    return ChatRoom.objects.filter(
+        id=room_id,
+        participant_total__lte=F('max_participants') - count
+    ).update(participant_total=F('participant_total') + count) == 1
+
+
+def release_places(room_id, count=1):
+    """Give places back to a room's participant counter."""
+    ChatRoom.objects.filter(id=room_id, participant_total__gte=count).update(
+        participant_total=F('participant_total') - count
+    )
+
+
+def _invalidate_members(room_id, user_ids):
+    """Queryset updates skip model signals, so drop the cached membership explicitly."""
+    for user_id in user_ids:
+        invalidate_membership(room_id, user_id)
+    invalidate_mention_index(room_id)
+
+
+def admit_participant(room, user, is_moderator=False):
+    """
+    Add a user to a room if it has space.
+    A user who left earlier has their participant row reactivated.
+
+    Raises:
+        AlreadyParticipantError: If the user is already an active participant
+        RoomCapacityError: If the room is full
+    """
+    with transaction.atomic():
+        # Participant row first, then the room row: the same order release_participant locks them in
+        fields = {'is_active': True, 'is_moderator': True} if is_moderator else {'is_active': True}
+        reactivated = RoomParticipant.objects.filter(room_id=room.id, user=user, is_active=False).update(**fields)
+        if not reactivated:
+            try:
+                with transaction.atomic():
+                    RoomParticipant.objects.create(room_id=room.id, user=user, is_moderator=is_moderator)
+            except IntegrityError:
+                raise AlreadyParticipantError()
+
+        if not reserve_places(room.id):
+            # Raising rolls back the participant row written above
+            raise RoomCapacityError(get_available_places(room.id), 1)
+
+        transaction.on_commit(lambda: _invalidate_members(room.id, [user.id]))
+
+
+def admit_participants(room, user_ids):
+    """
+    Add several users to a room at once, all or nothing.
+    Users who are already active participants are left as they are.
+
+    Raises:
+        RoomCapacityError: If the room cannot take every new participant
+    """
+    with transaction.atomic():
+        rows = dict(RoomParticipant.objects.filter(room_id=room.id, user_id__in=user_ids).values_list('user_id', 'is_active'))
+        inactive_ids = [user_id for user_id, is_active in rows.items() if not is_active]
+        new_ids = [user_id for user_id in user_ids if user_id not in rows]
+
+        RoomParticipant.objects.filter(room_id=room.id, user_id__in=inactive_ids).update(is_active=True)
+        RoomParticipant.objects.bulk_create([RoomParticipant(room_id=room.id, user_id=user_id) for user_id in new_ids])
+
+        admitted = len(inactive_ids) + len(new_ids)
+        if admitted and not reserve_places(room.id, admitted):
+            raise RoomCapacityError(get_available_places(room.id), admitted)
+
+        transaction.on_commit(lambda: _invalidate_members(room.id, user_ids))
+
+
+def release_participant(room, user_id):
+    """
+    Deactivate a user's participation and free their place.
+
+    Returns:
+        True if the user was an active participant
+    """
+    with transaction.atomic():
+        released = RoomParticipant.objects.filter(room_id=room.id, user_id=user_id, is_active=True).update(is_active=False)
+        if released:
+            release_places(room.id)
+            transaction.on_commit(lambda: _invalidate_members(room.id, [user_id]))
+    return bool(released)
+
+
+def recount_participants(rooms=None):
+    """
+    Reset participant counters from the participant rows in one UPDATE,
+    e.g. after participants were edited in the admin.
+
+    Returns:
+        Number of rooms updated
+    """
+    rooms = ChatRoom.objects.all() if rooms is None else rooms
+    return rooms.update(participant_total=Coalesce(Subquery(
+        RoomParticipant.objects.filter(room=OuterRef('pk'), is_active=True)
+        .order_by().values('room').annotate(count=Count('id')).values('count')
+    ), 0))
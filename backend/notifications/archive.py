@@ -0,0 +1,250 @@
+"""
+Cold archive for old chat history.
+Messages older than a room's threshold are serialized into compressed monthly
+segments and removed from the hot tables. History endpoints page into the
+archive only when a user scrolls past the hot window; a full load from the
+messages endpoints reads every segment.
+
+Messages with a voice recording or file stay hot: their attachment URLs are
+served by looking the message row up, and teardown removes their files with it.
+"""
+
+import gzip
+import json
+from datetime import date, timedelta
+from urllib.parse import unquote, urlparse
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ChatMessage, PrivateMessage, ChatArchiveSegment
+
+
+DEFAULT_ARCHIVE_AFTER_DAYS = getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180)
+DEFAULT_HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+ATTACHMENT_FIELDS = ('audio_file', 'file_attachment')
+WITHOUT_ATTACHMENTS = (
+    (Q(audio_file='') | Q(audio_file__isnull=True)) &
+    (Q(file_attachment='') | Q(file_attachment__isnull=True))
+)
+
+
+def encode_records(records):
+    """Compress serialized messages into gzip JSON lines."""
+    lines = '\n'.join(json.dumps(record, cls=DjangoJSONEncoder) for record in records)
+    return gzip.compress(lines.encode('utf-8'))
+
+
+def decode_records(data):
+    """Decompress a segment back into serialized messages."""
+    lines = gzip.decompress(bytes(data)).decode('utf-8')
+    return [json.loads(line) for line in lines.split('\n') if line]
+
+
+def archived_file_names(record):
+    """
+    Get the storage names of the files an archived record refers to.
+    Segments written before attachment messages were kept hot still hold them.
+    """
+    names = []
+    for field_name in ATTACHMENT_FIELDS:
+        path = unquote(urlparse(record.get(field_name) or '').path)
+        if path.startswith(settings.MEDIA_URL):
+            names.append(path[len(settings.MEDIA_URL):])
+    return names
+
+
+def get_archive_cutoff(room, now=None):
+    """Get the creation time before which a room's messages are archived."""
+    days = room.archive_after_days or DEFAULT_ARCHIVE_AFTER_DAYS
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def _write_segments(messages, serialize, scope):
+    """
+    Move a batch of messages (in id order) into one segment per month.
+
+    Args:
+        messages: List of message instances ordered by id
+        serialize: Callable turning a list of messages into API-shaped dicts
+        scope: {'room': room} or {'private_chat': private_chat}
+
+    Returns:
+        Number of messages archived
+    """
+    months = {}
+    for message in messages:
+        period = date(message.created_at.year, message.created_at.month, 1)
+        months.setdefault(period, []).append(message)
+
+    model = type(messages[0])
+    for period, month_messages in months.items():
+        records = serialize(month_messages)
+        with transaction.atomic():
+            ChatArchiveSegment.objects.create(
+                period=period,
+                message_count=len(records),
+                first_message_id=month_messages[0].id,
+                last_message_id=month_messages[-1].id,
+                data=encode_records(records),
+                **scope
+            )
+            model.objects.filter(id__in=[message.id for message in month_messages]).delete()
+
+    return len(messages)
+
+
+def archive_room_messages(room, now=None, batch_size=1000):
+    """
+    Archive a room's messages older than its threshold.
+    Messages that newer (hot) replies point at are kept so reply previews stay intact,
+    and so are messages with attachments.
+
+    Returns:
+        Number of messages archived
+    """
+    from .views import ChatMessageSerializer
+
+    cutoff = get_archive_cutoff(room, now)
+    queryset = ChatMessage.objects.filter(
+        WITHOUT_ATTACHMENTS,
+        room=room,
+        created_at__lt=cutoff
+    ).exclude(
+        replies__created_at__gte=cutoff
+    ).select_related('user', 'reply_to__user').prefetch_related('message_reactions').order_by('id')
+
+    def serialize(messages):
+        return ChatMessageSerializer(messages, many=True).data
+
+    # Deleting a batch sets reply_to to NULL on replies still waiting in later batches,
+    # so their targets are carried over and reattached before those replies are serialized
+    pending_links = {}
+    reply_targets = {}
+    archived = 0
+    while True:
+        batch = list(queryset[:batch_size])
+        if not batch:
+            break
+        for message in batch:
+            target_id = pending_links.pop(message.id, None)
+            if target_id is not None:
+                message.reply_to = reply_targets[target_id]
+
+        targets = {message.id: message for message in batch}
+        later_replies = queryset.filter(
+            id__gt=batch[-1].id, reply_to_id__in=list(targets)
+        ).values_list('id', 'reply_to_id')
+        for reply_id, target_id in later_replies:
+            pending_links[reply_id] = target_id
+            reply_targets[target_id] = targets[target_id]
+        waiting_for = set(pending_links.values())
+        reply_targets = {target_id: target for target_id, target in reply_targets.items() if target_id in waiting_for}
+
+        archived += _write_segments(batch, serialize, {'room': room})
+    return archived
+
+
+def archive_private_chat_messages(private_chat, now=None, batch_size=1000):
+    """
+    Archive a private chat's messages older than its public room's threshold.
+    Messages with attachments are kept.
+
+    Returns:
+        Number of messages archived
+    """
+    from .views import PrivateMessageSerializer
+
+    cutoff = get_archive_cutoff(private_chat.public_room, now)
+    queryset = PrivateMessage.objects.filter(
+        WITHOUT_ATTACHMENTS,
+        private_chat=private_chat,
+        created_at__lt=cutoff
+    ).select_related('sender').order_by('id')
+
+    def serialize(messages):
+        return PrivateMessageSerializer(messages, many=True).data
+
+    archived = 0
+    while True:
+        batch = list(queryset[:batch_size])
+        if not batch:
+            break
+        archived += _write_segments(batch, serialize, {'private_chat': private_chat})
+    return archived
+
+
+def read_archived_records(segments):
+    """
+    Get every archived record of a room or private chat, in id order.
+
+    Args:
+        segments: ChatArchiveSegment queryset for the scope
+
+    Returns:
+        List of API-shaped dicts, each marked is_archived
+    """
+    records = []
+    for segment in segments:
+        for record in decode_records(segment.data):
+            record['is_archived'] = True
+            records.append(record)
+    records.sort(key=lambda record: record['id'])
+    return records
+
+
+def get_history_page(hot_queryset, segments, serialize, before_id=None, limit=DEFAULT_HISTORY_PAGE_SIZE):
+    """
+    Get one page of history older than before_id (messages in the page are oldest first).
+    Archive segments are only decompressed when they can hold messages newer than the
+    oldest hot candidate, i.e. once the user scrolls past the hot window.
+
+    Args:
+        hot_queryset: Messages in the room or private chat
+        segments: ChatArchiveSegment queryset for the same scope
+        serialize: Callable turning a list of hot messages into API-shaped dicts
+        before_id: Only return messages with a smaller id
+        limit: Maximum number of messages to return
+
+    Returns:
+        Dict with 'results', 'has_more' and 'next_before_id'
+    """
+    if before_id is not None:
+        hot_queryset = hot_queryset.filter(id__lt=before_id)
+        segments = segments.filter(first_message_id__lt=before_id)
+    hot_messages = list(hot_queryset.order_by('-id')[:limit + 1])
+
+    if len(hot_messages) > limit:
+        segments = segments.filter(last_message_id__gt=hot_messages[-1].id)
+
+    archived = []
+    for segment in segments.order_by('-last_message_id'):
+        if len(archived) > limit and segment.last_message_id < archived[limit]['id']:
+            break
+        for record in decode_records(segment.data):
+            if before_id is None or record['id'] < before_id:
+                record['is_archived'] = True
+                archived.append(record)
+        archived.sort(key=lambda record: record['id'], reverse=True)
+
+    candidates = sorted(
+        [(message.id, message) for message in hot_messages] +
+        [(record['id'], record) for record in archived],
+        key=lambda candidate: candidate[0],
+        reverse=True
+    )
+    page = list(reversed(candidates[:limit]))
+
+    hot_page = [item for _, item in page if not isinstance(item, dict)]
+    serialized = iter(serialize(hot_page))
+    results = [item if isinstance(item, dict) else next(serialized) for _, item in page]
+
+    return {
+        'results': results,
+        'has_more': len(candidates) > limit,
+        'next_before_id': results[0]['id'] if results else None,
+    }
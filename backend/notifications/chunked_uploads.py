@@ -0,0 +1,224 @@
+"""
+Resumable chunked uploads for chat attachments and voice messages.
+A session is opened with the file's name and size, chunks are sent at the
+offset the server reports, and finalizing turns the assembled file into a
+room or private message exactly as a single-request upload would.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from core.chunked_upload import UploadSessionGone, open_assembled_file, discard_upload
+from core.media_probe import probe_file, probed_duration, media_file_type
+from core.upload_middleware import UploadTypeNotAllowed, check_upload_type
+from .models import Notification, ChatMessage, PrivateMessage, ChatUploadSession
+
+
+MAX_CHAT_FILE_SIZE = 50 * 1024 * 1024  # 50MB, same limit as send_file_message
+MAX_VOICE_DURATION = 180  # 3 minutes, same limit as send_voice_message
+
+
+def validate_upload_request(data):
+    """
+    Validate the fields needed to open an upload session.
+
+    Returns:
+        Tuple of (cleaned fields dict, error message or None)
+    """
+    kind = data.get('kind', 'file')
+    if kind not in ('file', 'voice'):
+        return None, 'kind must be "file" or "voice".'
+
+    filename = (data.get('filename') or '').strip()
+    if not filename:
+        return None, 'filename is required.'
+
+    try:
+        total_size = int(data.get('total_size'))
+    except (TypeError, ValueError):
+        return None, 'total_size is required.'
+    if total_size <= 0:
+        return None, 'total_size must be positive.'
+    if total_size > MAX_CHAT_FILE_SIZE:
+        return None, 'File size cannot exceed 50MB.'
+
+    fields = {'kind': kind, 'filename': filename[:255], 'total_size': total_size}
+
+    if kind == 'file':
+        file_type = data.get('file_type', 'document')
+        if file_type not in ('media', 'document'):
+            return None, 'Invalid file type. Must be "media" or "document".'
+        fields['file_type'] = file_type
+    else:
+        try:
+            duration = int(data.get('duration') or 0)
+        except (TypeError, ValueError):
+            duration = 0
+        if duration > MAX_VOICE_DURATION:
+            return None, 'Voice message duration cannot exceed 3 minutes (180 seconds).'
+        fields['duration'] = duration
+
+    return fields, None
+
+
+def describe_session(session):
+    """Get the API representation of an upload session."""
+    return {
+        'upload_id': str(session.id),
+        'kind': session.kind,
+        'filename': session.filename,
+        'offset': session.received_size,
+        'total_size': session.total_size,
+        'is_complete': session.is_complete,
+    }
+
+
+class UploadRejected(Exception):
+    """Raised when the probed contents of an upload break a chat limit."""
+
+
+def resolve_probed_fields(kind, probe, file_type=None, duration=0):
+    """
+    Replace client-supplied attachment details with what the media probe found.
+
+    Returns:
+        Tuple of (file_type, duration)
+
+    Raises:
+        UploadRejected: If a voice message is longer than MAX_VOICE_DURATION
+    """
+    duration = probed_duration(probe, duration)
+    if kind == 'voice':
+        if duration > MAX_VOICE_DURATION:
+            raise UploadRejected('Voice message duration cannot exceed 3 minutes (180 seconds).')
+        return file_type, duration
+    return media_file_type(probe and probe.get('mime_type'), file_type or 'document'), duration
+
+
+def build_message_fields(kind, file, filename, size, file_type=None, duration=0, probe=None):
+    """Get the message fields shared by room and private voice/file messages."""
+    probed = {}
+    if probe:
+        probed = {
+            'mime_type': probe['mime_type'],
+            'media_width': probe['width'],
+            'media_height': probe['height'],
+        }
+    if kind == 'voice':
+        return {
+            'message': f"Voice message ({duration}s)" if duration > 0 else "Voice message",
+            'message_type': 'voice',
+            'audio_file': file,
+            'duration': duration,
+            **probed,
+        }
+    return {
+        'message': f"📎 {filename}",
+        'message_type': 'file',
+        'file_attachment': file,
+        'file_type': file_type,
+        'file_size': size,
+        'original_filename': filename,
+        **probed,
+    }
+
+
+def notify_private_attachment(private_message, kind, filename, duration=0):
+    """Update the private chat and notify the other user about a new voice or file message."""
+    private_chat = private_message.private_chat
+    private_chat.updated_at = timezone.now()
+    private_chat.save()
+
+    other_user = private_chat.get_other_user(private_message.sender)
+    if kind == 'voice':
+        verb = f'sent you a voice message in "{private_chat.public_room.name}"'
+        preview = f'Voice message ({duration}s)' if duration > 0 else 'Voice message'
+        action_type = 'private_voice_message_received'
+    else:
+        verb = f'sent you a file in "{private_chat.public_room.name}"'
+        preview = f'📎 {filename}'
+        action_type = 'private_file_message_received'
+
+    Notification.objects.create(
+        recipient=other_user,
+        actor=private_message.sender,
+        verb=verb,
+        content_type=ContentType.objects.get_for_model(PrivateMessage),
+        object_id=private_message.id,
+        notification_type='private_message',
+        data={
+            'private_chat_id': private_chat.id,
+            'public_room_id': private_chat.public_room.id,
+            'public_room_name': private_chat.public_room.name,
+            'message_preview': preview,
+            'action_type': action_type
+        }
+    )
+
+
+def finalize_upload(session):
+    """
+    Turn a complete upload session into a room or private message.
+    The assembled file is probed, saved to the message's storage and the session is removed.
+    The session row stays locked throughout, so a retried finalize waits for this one
+    and then finds the session gone instead of creating a second message.
+
+    Returns:
+        The created ChatMessage or PrivateMessage
+
+    Raises:
+        UploadSessionGone: If another request already finalized the session
+        UploadRejected: If the probed file breaks a chat limit (the session is kept)
+        UploadTypeNotAllowed: If the file's sniffed type is blocked (the session is removed)
+    """
+    upload_id = session.id
+
+    try:
+        with transaction.atomic():
+            session = ChatUploadSession.objects.select_for_update().filter(id=upload_id).first()
+            if session is None:
+                raise UploadSessionGone(upload_id)
+
+            file = open_assembled_file(upload_id, session.filename)
+            try:
+                probe = probe_file(file)
+                check_upload_type(probe['mime_type'])
+                file_type, duration = resolve_probed_fields(
+                    session.kind, probe, file_type=session.file_type, duration=session.duration or 0
+                )
+                fields = build_message_fields(
+                    session.kind, file, session.filename, session.total_size,
+                    file_type=file_type, duration=duration, probe=probe
+                )
+                if session.room_id:
+                    message = ChatMessage.objects.create(room_id=session.room_id, user=session.user, **fields)
+                else:
+                    message = PrivateMessage.objects.create(
+                        private_chat_id=session.private_chat_id, sender=session.user, **fields
+                    )
+                    notify_private_attachment(message, session.kind, session.filename, duration)
+                session.delete()
+            finally:
+                file.close()
+    except UploadTypeNotAllowed:
+        discard_upload(upload_id)
+        session.delete()
+        raise
+
+    discard_upload(upload_id)
+    return message
+
+
+def expire_upload_sessions(older_than):
+    """
+    Delete upload sessions (and their working files) not touched since older_than.
+
+    Returns:
+        Number of sessions removed
+    """
+    stale = list(ChatUploadSession.objects.filter(updated_at__lt=older_than).values_list('id', flat=True))
+    for upload_id in stale:
+        discard_upload(upload_id)
+    ChatUploadSession.objects.filter(id__in=stale).delete()
+    return len(stale)
@@ -4,14 +4,23 @@ Handles real-time notification delivery via WebSocket.
 """
 
 import json
+import math
 import asyncio
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
 from django.utils import timezone
 from django.db import transaction
 
-from .models import Notification
+from .models import Notification, ChatRoom, ChatMessage
+from .membership import resolve_membership
+from .websocket_service import ChatRoomWebSocketService
+from .presence import presence_registry
+from .mentions import notify_message_mentions
+from .throttles import consume_token
 
 User = get_user_model()
 
@@ -236,6 +245,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             'timestamp': timezone.now().isoformat()
         }))
 
+    async def upload_progress(self, event):
+        """Handle upload progress published by core.upload_progress."""
+        await self.send(text_data=json.dumps({
+            'type': 'upload_progress',
+            'progress': event['progress'],
+            'timestamp': timezone.now().isoformat()
+        }))
+
     # Database operations
     @database_sync_to_async
     def get_unread_count(self):
@@ -389,3 +406,278 @@ class NotificationBroadcastConsumer(AsyncWebsocketConsumer):
             'data': event.get('data', {}),
             'timestamp': timezone.now().isoformat()
         }))
+
+
+class ChatRoomConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for live chat room events.
+    Participants receive small delta events (e.g. reaction changes) instead of refetching history.
+    """
+
+    async def connect(self):
+        """Connect to WebSocket and join the room's event group."""
+        self.user = self.scope['user']
+        self.room_id = self.scope['url_route']['kwargs']['room_id']
+        
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        if not await self.is_room_member():
+            await self.close()
+            return
+
+        self.room_group_name = ChatRoomWebSocketService.get_room_group_name(self.room_id)
+        
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        
+        await self.accept()
+        
+        await self.send(text_data=json.dumps({
+            'type': 'connection_established',
+            'message': 'Connected to chat room channel',
+            'room_id': int(self.room_id),
+            'user_id': self.user.id,
+            'timestamp': timezone.now().isoformat()
+        }))
+
+        joined = presence_registry.connect(int(self.room_id), self.user.id, self.user.username, self.channel_name)
+        await self.publish_expired_presence()
+        if joined:
+            await self.publish_presence_diff(self.room_group_name, joined=[self.user_summary()])
+
+        await self.send(text_data=json.dumps({
+            'type': 'presence_snapshot',
+            'online': presence_registry.online(int(self.room_id)),
+            'timestamp': timezone.now().isoformat()
+        }))
+
+    async def disconnect(self, close_code):
+        """Disconnect from WebSocket and leave the room's event group."""
+        if hasattr(self, 'room_group_name'):
+            if presence_registry.disconnect(int(self.room_id), self.user.id, self.channel_name):
+                await self.publish_presence_diff(self.room_group_name, left=[self.user.id])
+
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
+
+    async def receive(self, text_data):
+        """Handle incoming WebSocket messages."""
+        try:
+            data = json.loads(text_data)
+            message_type = data.get('type')
+            
+            if message_type in ('ping', 'heartbeat'):
+                await self.handle_heartbeat()
+                await self.send(text_data=json.dumps({
+                    'type': 'pong',
+                    'timestamp': timezone.now().isoformat()
+                }))
+            elif message_type == 'typing':
+                await self.handle_typing(bool(data.get('is_typing', True)))
+            elif message_type == 'send_message':
+                await self.handle_send_message(data.get('message', ''), data.get('reply_to'))
+            else:
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'message': f'Unknown message type: {message_type}',
+                    'timestamp': timezone.now().isoformat()
+                }))
+                
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid JSON format',
+                'timestamp': timezone.now().isoformat()
+            }))
+
+    async def handle_heartbeat(self):
+        """Keep this connection's presence alive and expire stale ones."""
+        if not presence_registry.heartbeat(int(self.room_id), self.user.id, self.channel_name):
+            # The connection expired (e.g. a missed heartbeat); bring the user back online
+            if presence_registry.connect(int(self.room_id), self.user.id, self.user.username, self.channel_name):
+                await self.publish_presence_diff(self.room_group_name, joined=[self.user_summary()])
+        await self.publish_expired_presence()
+
+    async def handle_typing(self, is_typing):
+        """Fan out a typing indicator; 'started typing' events are rate-limited."""
+        room_id = int(self.room_id)
+        if is_typing:
+            if not presence_registry.should_send_typing(room_id, self.user.id):
+                return
+        else:
+            presence_registry.clear_typing(room_id, self.user.id)
+
+        await self.channel_layer.group_send(self.room_group_name, {
+            'type': 'typing_indicator',
+            'payload': {
+                'room_id': room_id,
+                'user_id': self.user.id,
+                'username': self.user.username,
+                'is_typing': is_typing,
+            }
+        })
+
+    async def handle_send_message(self, text, reply_to_id=None):
+        """Post a text message (or reply) and broadcast it to the room."""
+        text = (text or '').strip()
+        if not text:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Message content is required.',
+                'timestamp': timezone.now().isoformat()
+            }))
+            return
+
+        # The bucket lock may wait on the cache, so keep it off the event loop
+        allowed, retry_after = await sync_to_async(consume_token)('message', self.room_id, self.user.id)
+        if not allowed:
+            await self.send(text_data=json.dumps({
+                'type': 'rate_limited',
+                'message': 'You are sending messages too quickly.',
+                'retry_after': math.ceil(retry_after),
+                'timestamp': timezone.now().isoformat()
+            }))
+            return
+
+        try:
+            message = await self.create_message(text, reply_to_id)
+        except PermissionDenied:
+            # Removed, left, or the room ended since this socket connected
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'You are no longer a participant of this room.',
+                'timestamp': timezone.now().isoformat()
+            }))
+            await self.close()
+            return
+        if message is None:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Reply target message not found.',
+                'timestamp': timezone.now().isoformat()
+            }))
+            return
+
+        await self.channel_layer.group_send(self.room_group_name, {
+            'type': 'message_created',
+            'payload': {'message': message},
+        })
+        await self.handle_typing(False)
+
+    async def publish_expired_presence(self):
+        """Publish 'left' diffs for connections that stopped sending heartbeats."""
+        for room_id, user_ids in presence_registry.expire().items():
+            await self.publish_presence_diff(
+                ChatRoomWebSocketService.get_room_group_name(room_id), left=user_ids
+            )
+
+    async def publish_presence_diff(self, group_name, joined=None, left=None):
+        """Send who came online and who went offline to a room group."""
+        await self.channel_layer.group_send(group_name, {
+            'type': 'presence_diff',
+            'payload': {
+                'joined': joined or [],
+                'left': left or [],
+            }
+        })
+
+    def user_summary(self):
+        return {'id': self.user.id, 'username': self.user.username}
+
+    # WebSocket group message handlers
+    async def presence_diff(self, event):
+        """Handle users coming online or going offline in the room."""
+        await self.send(text_data=json.dumps({
+            'type': 'presence_diff',
+            **event['payload'],
+            'timestamp': timezone.now().isoformat()
+        }))
+
+    async def typing_indicator(self, event):
+        """Handle another user starting or stopping typing."""
+        if event['payload']['user_id'] == self.user.id:
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'typing',
+            **event['payload'],
+            'timestamp': timezone.now().isoformat()
+        }))
+
+    async def message_created(self, event):
+        """Handle a new message posted to the room."""
+        await self.send(text_data=json.dumps({
+            'type': 'message_created',
+            **event['payload'],
+            'timestamp': timezone.now().isoformat()
+        }, cls=DjangoJSONEncoder))
+
+    async def reaction_delta(self, event):
+        """Handle a single reaction being added to or removed from a message."""
+        await self.send(text_data=json.dumps({
+            'type': 'reaction_delta',
+            **event['payload'],
+            'timestamp': timezone.now().isoformat()
+        }))
+
+    async def meeting_ended(self, event):
+        """Handle the host ending the meeting; the room is being deleted."""
+        await self.send(text_data=json.dumps({
+            'type': 'meeting_ended',
+            **event['payload'],
+            'timestamp': timezone.now().isoformat()
+        }))
+        await self.close()
+
+    # Database operations
+    @database_sync_to_async
+    def create_message(self, text, reply_to_id=None):
+        """
+        Create a room message, notify mentioned users and return it serialized (None if the reply target is missing).
+        Membership is checked again for every message, not memoized for the socket's lifetime.
+
+        Raises:
+            PermissionDenied: If the room has ended or the user is no longer a participant
+        """
+        from .views import ChatMessageSerializer
+
+        room = ChatRoom.objects.filter(id=self.room_id, is_active=True).only('id', 'creator_id').first()
+        if room is None or not resolve_membership(room, self.user).is_member:
+            raise PermissionDenied
+
+        reply_to = None
+        if reply_to_id:
+            reply_to = ChatMessage.objects.filter(id=reply_to_id, room_id=self.room_id).first()
+            if reply_to is None:
+                return None
+
+        message = ChatMessage.objects.create(
+            room_id=self.room_id,
+            user=self.user,
+            message=text,
+            message_type='reply' if reply_to else 'text',
+            reply_to=reply_to
+        )
+        try:
+            notify_message_mentions(message)
+        except Exception as e:
+            print(f"Error notifying mentions for message {message.id}: {e}")
+
+        return dict(ChatMessageSerializer(message).data)
+
+    @database_sync_to_async
+    def is_room_member(self):
+        """Check if the user is an active participant or the creator of the room."""
+        room = ChatRoom.objects.filter(
+            id=self.room_id,
+            is_active=True
+        ).only('id', 'creator_id').first()
+        
+        if room is None:
+            return False
+        return resolve_membership(room, self.user, self).is_member
@@ -0,0 +1,174 @@
+"""
+Streaming transcript export for chat rooms.
+Rows are read through server-side cursors (and archive segments one month at a
+time) and written straight to the response, so memory use does not grow with
+the size of the room. Attachments can be zipped on the fly alongside the transcript.
+"""
+
+import csv
+import heapq
+import json
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .archive import decode_records
+from .models import ChatMessage
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'CHAT_EXPORT_CHUNK_SIZE', 2000)
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'txt': 'text/plain',
+}
+EXPORT_FIELDS = [
+    'id', 'created_at', 'user_id', 'username', 'message_type', 'message',
+    'reply_to_id', 'is_edited', 'attachment', 'duration',
+]
+FILE_READ_CHUNK_SIZE = 64 * 1024
+
+
+def _storage_name(url_or_name):
+    """Turn an archived file URL back into its storage name."""
+    if url_or_name and settings.MEDIA_URL and url_or_name.startswith(settings.MEDIA_URL):
+        return url_or_name[len(settings.MEDIA_URL):]
+    return url_or_name or ''
+
+
+def _hot_rows(room):
+    """Yield export rows for messages still in the hot table, oldest first."""
+    messages = ChatMessage.objects.filter(room=room, is_private=False).order_by('id').values_list(
+        'id', 'created_at', 'user_id', 'user__username', 'message_type', 'message',
+        'reply_to_id', 'is_edited', 'original_filename', 'duration', 'file_attachment', 'audio_file'
+    )
+    for (message_id, created_at, user_id, username, message_type, message,
+         reply_to_id, is_edited, original_filename, duration, file_attachment, audio_file) in messages.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        files = [name for name in (file_attachment, audio_file) if name]
+        yield {
+            'id': message_id,
+            'created_at': created_at.isoformat(),
+            'user_id': user_id,
+            'username': username or 'System',
+            'message_type': message_type,
+            'message': message,
+            'reply_to_id': reply_to_id,
+            'is_edited': is_edited,
+            'attachment': original_filename or (os.path.basename(files[0]) if files else ''),
+            'duration': duration,
+        }, files
+
+
+def _archived_rows(room):
+    """Yield export rows from archive segments, decompressing one segment at a time."""
+    segment_ids = room.archive_segments.order_by('first_message_id').values_list('id', flat=True)
+    for segment_id in list(segment_ids):
+        segment = room.archive_segments.only('data').get(id=segment_id)
+        for record in decode_records(segment.data):
+            if record.get('is_private'):
+                continue
+            files = [_storage_name(record.get(field)) for field in ('file_attachment', 'audio_file')]
+            files = [name for name in files if name]
+            yield {
+                'id': record['id'],
+                'created_at': record['created_at'],
+                'user_id': record.get('user_id'),
+                'username': record.get('user_username') or 'System',
+                'message_type': record.get('message_type'),
+                'message': record.get('message'),
+                'reply_to_id': record.get('reply_to'),
+                'is_edited': record.get('is_edited', False),
+                'attachment': record.get('original_filename') or (os.path.basename(files[0]) if files else ''),
+                'duration': record.get('duration'),
+            }, files
+
+
+def iter_transcript_rows(room):
+    """
+    Yield (row, storage file names) for every message in a room in id order,
+    merging archived and hot messages.
+    """
+    return heapq.merge(_archived_rows(room), _hot_rows(room), key=lambda item: item[0]['id'])
+
+
+class _Echo:
+    """File-like object whose write returns the value, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def format_transcript(rows, export_format):
+    """Yield the transcript as text chunks in the given format."""
+    if export_format == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row, _ in rows:
+            yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+    elif export_format == 'txt':
+        for row, _ in rows:
+            line = f"[{row['created_at']}] {row['username']}: {row['message']}"
+            if row['reply_to_id']:
+                line += f" (reply to #{row['reply_to_id']})"
+            if row['attachment']:
+                line += f" [attachment: {row['attachment']}]"
+            yield line + '\n'
+    else:
+        for row, _ in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_transcript(room, export_format):
+    """Yield the transcript encoded as UTF-8 bytes."""
+    for chunk in format_transcript(iter_transcript_rows(room), export_format):
+        yield chunk.encode('utf-8')
+
+
+class _ZipStream:
+    """Unseekable sink for zipfile that hands written bytes back to the response generator."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Yield the bytes written since the last drain, if any."""
+        if self.chunks:
+            data = b''.join(self.chunks)
+            self.chunks = []
+            yield data
+
+
+def stream_transcript_zip(room, export_format):
+    """
+    Yield a zip archive holding the transcript and every attachment, built on the fly.
+    Attachments that are missing from storage are skipped.
+    """
+    sink = _ZipStream()
+    storage = ChatMessage._meta.get_field('file_attachment').storage
+
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f'transcript.{export_format}', 'w', force_zip64=True) as transcript:
+            for chunk in format_transcript(iter_transcript_rows(room), export_format):
+                transcript.write(chunk.encode('utf-8'))
+                yield from sink.drain()
+
+        for row, files in iter_transcript_rows(room):
+            for name in files:
+                if not storage.exists(name):
+                    continue
+                arcname = f"attachments/{row['id']}_{os.path.basename(name)}"
+                with storage.open(name, 'rb') as source, archive.open(arcname, 'w', force_zip64=True) as target:
+                    for data in iter(lambda: source.read(FILE_READ_CHUNK_SIZE), b''):
+                        target.write(data)
+                        yield from sink.drain()
+
+    yield from sink.drain()
@@ -0,0 +1,128 @@
+"""
+Bulk processing of chat room join requests.
+Hosts can admit or turn away a whole class at once: places are reserved on the
+room's participant counter in one step, and participants, request statuses and
+notifications are written in bulk inside a single transaction.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification, ChatRoom, JoinRequest
+from .admission import RoomCapacityError, admit_participants
+
+
+def get_pending_requests(room, request_ids=None):
+    """
+    Get pending join requests for a room, optionally limited to the given ids.
+    """
+    queryset = JoinRequest.objects.filter(room=room, status='pending')
+    if request_ids is not None:
+        queryset = queryset.filter(id__in=request_ids)
+    return queryset.order_by('created_at')
+
+
+def approve_join_requests(room, host, request_ids=None):
+    """
+    Approve pending join requests in one transaction.
+
+    Args:
+        room: ChatRoom the requests belong to
+        host: User approving the requests
+        request_ids: IDs to approve, or None for every pending request
+
+    Returns:
+        List of approved JoinRequest instances
+
+    Raises:
+        RoomCapacityError: If the room does not have enough open places
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        join_requests = list(get_pending_requests(room, request_ids).select_for_update())
+        if not join_requests:
+            return []
+
+        # Places are reserved on the room's participant counter, so concurrent approvals
+        # and joins cannot both take the last places
+        user_ids = [join_request.user_id for join_request in join_requests]
+        admit_participants(room, user_ids)
+
+        for join_request in join_requests:
+            join_request.status = 'approved'
+            join_request.processed_by = host
+            join_request.processed_at = now
+        JoinRequest.objects.bulk_update(join_requests, ['status', 'processed_by', 'processed_at'])
+
+        content_type = ContentType.objects.get_for_model(ChatRoom)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=user_id,
+                actor=host,
+                verb=f'approved your request to join "{room.name}". Click to enter the room.',
+                content_type=content_type,
+                object_id=room.id,
+                notification_type='chat',
+                data={
+                    'room_id': room.id,
+                    'room_name': room.name,
+                    'action_type': 'request_approved',
+                    'auto_join': True,
+                    'redirect_url': f'/chat-room/{room.id}',
+                    'room_access_granted': True
+                }
+            )
+            for user_id in user_ids
+        ])
+
+    return join_requests
+
+
+def deny_join_requests(room, host, request_ids=None, reason=''):
+    """
+    Deny pending join requests in one transaction.
+
+    Args:
+        room: ChatRoom the requests belong to
+        host: User denying the requests
+        request_ids: IDs to deny, or None for every pending request
+        reason: Optional reason shown to the users
+
+    Returns:
+        List of denied JoinRequest instances
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        join_requests = list(get_pending_requests(room, request_ids).select_for_update())
+        if not join_requests:
+            return []
+
+        for join_request in join_requests:
+            join_request.status = 'rejected'
+            join_request.processed_by = host
+            join_request.processed_at = now
+        JoinRequest.objects.bulk_update(join_requests, ['status', 'processed_by', 'processed_at'])
+
+        content_type = ContentType.objects.get_for_model(ChatRoom)
+        Notification.objects.bulk_create([
+            Notification(
+                recipient_id=join_request.user_id,
+                actor=host,
+                verb=f'denied your request to join "{room.name}"',
+                content_type=content_type,
+                object_id=room.id,
+                notification_type='chat',
+                data={
+                    'room_id': room.id,
+                    'room_name': room.name,
+                    'action_type': 'request_denied',
+                    'reason': reason
+                }
+            )
+            for join_request in join_requests
+        ])
+
+    return join_requests
@@ -0,0 +1,47 @@
+"""
+Move old chat messages into compressed archive segments.
+Intended to run nightly from cron.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.models import ChatRoom, PrivateChatRoom
+from notifications.archive import archive_room_messages, archive_private_chat_messages
+
+
+class Command(BaseCommand):
+    help = 'Archive chat room and private messages older than each room\'s threshold'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of messages to archive per batch'
+        )
+        parser.add_argument(
+            '--room',
+            type=int,
+            help='Only archive the given room (and its private chats)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        rooms = ChatRoom.objects.all()
+        private_chats = PrivateChatRoom.objects.select_related('public_room')
+        if options['room']:
+            rooms = rooms.filter(id=options['room'])
+            private_chats = private_chats.filter(public_room_id=options['room'])
+
+        room_count = 0
+        for room in rooms.iterator():
+            room_count += archive_room_messages(room, batch_size=batch_size)
+
+        private_count = 0
+        for private_chat in private_chats.iterator():
+            private_count += archive_private_chat_messages(private_chat, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {room_count} room messages and {private_count} private messages.'
+        ))
@@ -0,0 +1,64 @@
+"""
+Rebuild the chat message search index from scratch.
+Run once after deploying search, or whenever the index may have drifted.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notifications.models import ChatRoom, ChatMessage, PrivateMessage, MessageSearchTerm, RoomSearchTerm
+from notifications.search_index import build_chat_message_terms, build_private_message_terms, build_room_terms
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index for chat room and private messages and room names'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of messages to index per batch'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            MessageSearchTerm.objects.all().delete()
+            RoomSearchTerm.objects.all().delete()
+
+        chat_count = self.rebuild(
+            ChatMessage.objects.only('id', 'room_id', 'message', 'original_filename'),
+            build_chat_message_terms,
+            batch_size
+        )
+        private_count = self.rebuild(
+            PrivateMessage.objects.only('id', 'private_chat_id', 'message', 'original_filename'),
+            build_private_message_terms,
+            batch_size
+        )
+        room_count = self.rebuild(
+            ChatRoom.objects.only('id', 'name', 'description'),
+            build_room_terms,
+            batch_size,
+            RoomSearchTerm
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {chat_count} room messages, {private_count} private messages and {room_count} rooms.'
+        ))
+
+    def rebuild(self, queryset, build_terms, batch_size, term_model=MessageSearchTerm):
+        """Index every object in the queryset, writing terms in batches."""
+        count = 0
+        terms = []
+        for obj in queryset.order_by().iterator(chunk_size=batch_size):
+            terms.extend(build_terms(obj))
+            count += 1
+            if count % batch_size == 0:
+                term_model.objects.bulk_create(terms, batch_size=batch_size)
+                terms = []
+        if terms:
+            term_model.objects.bulk_create(terms, batch_size=batch_size)
+        return count
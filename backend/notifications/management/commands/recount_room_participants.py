@@ -0,0 +1,17 @@
+"""
+Recompute every chat room's participant counter from its participant rows.
+Only needed after participants were changed outside notifications.admission,
+e.g. edited in the admin or restored from a backup.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.admission import recount_participants
+
+
+class Command(BaseCommand):
+    help = 'Reset chat room participant counters from active participant rows'
+
+    def handle(self, *args, **options):
+        updated = recount_participants()
+        self.stdout.write(self.style.SUCCESS(f'Recounted participants for {updated} rooms.'))
@@ -0,0 +1,24 @@
+"""
+Refresh the precomputed activity score used to rank chat rooms.
+Intended to run every few minutes from cron.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.activity import refresh_room_activity
+
+
+class Command(BaseCommand):
+    help = 'Recompute activity scores for active chat rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rooms to update per batch'
+        )
+
+    def handle(self, *args, **options):
+        updated = refresh_room_activity(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed activity for {updated} rooms.'))
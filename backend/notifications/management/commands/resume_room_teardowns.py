@@ -0,0 +1,33 @@
+"""
+Finish deleting ended chat rooms whose background teardown was interrupted
+(e.g. by a worker restart). Ended rooms stay inactive until fully deleted.
+Only rooms whose teardown was started (teardown_started_at is set by
+start_room_teardown) are touched; rooms deactivated for other reasons are left alone.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.models import ChatRoom
+from notifications.teardown import get_teardown_progress, teardown_room
+
+
+class Command(BaseCommand):
+    help = 'Resume the teardown of ended chat rooms that were not fully deleted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of rows to delete per batch'
+        )
+
+    def handle(self, *args, **options):
+        resumed = 0
+        for room in ChatRoom.objects.filter(is_active=False, teardown_started_at__isnull=False).iterator():
+            progress = get_teardown_progress(room.id) or {}
+            progress = teardown_room(room.id, progress.get('actor_id', room.creator_id), options['batch_size'])
+            self.stdout.write(f'Room {room.id}: {progress["status"]}')
+            resumed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Resumed {resumed} room teardowns.'))
@@ -0,0 +1,98 @@
+"""
+Membership and role resolution for chat rooms.
+Loads a user's participant row once per request (or websocket session) and
+caches it briefly so chat actions don't repeat the same membership queries.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import RoomParticipant
+
+
+MEMBERSHIP_CACHE_TIMEOUT = getattr(settings, 'CHAT_MEMBERSHIP_CACHE_TIMEOUT', 30)
+
+
+class RoomMembership:
+    """
+    A user's resolved relationship to a chat room.
+    """
+
+    def __init__(self, room_id, user_id, is_participant=False, is_moderator=False, is_creator=False):
+        self.room_id = room_id
+        self.user_id = user_id
+        self.is_participant = is_participant
+        self.is_moderator = is_moderator
+        self.is_creator = is_creator
+
+    @property
+    def is_member(self):
+        """Active participants and the room creator can use the room."""
+        return self.is_participant or self.is_creator
+
+    @property
+    def is_host(self):
+        """The room creator and active moderators can manage the room."""
+        return self.is_creator or (self.is_participant and self.is_moderator)
+
+    def to_dict(self):
+        return {
+            'is_participant': self.is_participant,
+            'is_moderator': self.is_moderator,
+            'is_creator': self.is_creator,
+        }
+
+
+def get_membership_cache_key(room_id, user_id):
+    """Get the cache key for a user's membership in a room."""
+    return f'chat_membership_{room_id}_{user_id}'
+
+
+def resolve_membership(room, user, holder=None):
+    """
+    Resolve a user's membership in a room.
+
+    Args:
+        room: ChatRoom instance (only id and creator_id are read)
+        user: User to resolve
+        holder: Optional object (request or consumer) used to memoize results
+                for its lifetime
+
+    Returns:
+        RoomMembership instance
+    """
+    key = get_membership_cache_key(room.id, user.id)
+
+    memo = None
+    if holder is not None:
+        memo = getattr(holder, '_room_memberships', None)
+        if memo is None:
+            memo = {}
+            holder._room_memberships = memo
+        if key in memo:
+            return memo[key]
+
+    data = cache.get(key)
+    if data is None:
+        participant = RoomParticipant.objects.filter(
+            room_id=room.id,
+            user_id=user.id,
+            is_active=True
+        ).values('is_moderator').first()
+
+        data = {
+            'is_participant': participant is not None,
+            'is_moderator': bool(participant and participant['is_moderator']),
+            'is_creator': room.creator_id == user.id,
+        }
+        cache.set(key, data, MEMBERSHIP_CACHE_TIMEOUT)
+
+    membership = RoomMembership(room.id, user.id, **data)
+    if memo is not None:
+        memo[key] = membership
+    return membership
+
+
+def invalidate_membership(room_id, user_id):
+    """Drop a cached membership after a join, leave or removal."""
+    cache.delete(get_membership_cache_key(room_id, user_id))
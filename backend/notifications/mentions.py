@@ -0,0 +1,102 @@
+"""
+@mention parsing for chat room messages.
+Mentions are resolved against a cached per-room username index, so a message
+in a large room costs one cache read instead of a participant query per name.
+"""
+
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ChatMessage, RoomParticipant
+
+
+MENTION_PATTERN = re.compile(r'(?<![\w@])@([\w.@+-]+)')
+MAX_MENTIONS_PER_MESSAGE = 20
+MENTION_INDEX_CACHE_TIMEOUT = getattr(settings, 'CHAT_MENTION_INDEX_CACHE_TIMEOUT', 300)
+
+
+def get_mention_index_cache_key(room_id):
+    """Get the cache key for a room's username index."""
+    return f'chat_mention_index_{room_id}'
+
+
+def get_mention_index(room):
+    """
+    Get a mapping of lowercase username -> user id for everyone who can be mentioned in a room
+    (active participants and the creator).
+    """
+    cache_key = get_mention_index_cache_key(room.id)
+    index = cache.get(cache_key)
+    if index is None:
+        rows = RoomParticipant.objects.filter(
+            room_id=room.id,
+            is_active=True
+        ).values_list('user_id', 'user__username')
+        index = {username.lower(): user_id for user_id, username in rows}
+        if room.creator_id not in index.values():
+            index[room.creator.username.lower()] = room.creator_id
+        cache.set(cache_key, index, MENTION_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_mention_index(room_id):
+    """Drop a room's cached username index (e.g. when someone joins or leaves)."""
+    cache.delete(get_mention_index_cache_key(room_id))
+
+
+def extract_mentions(text):
+    """
+    Get the unique, lowercase usernames mentioned in text, in order of appearance.
+    Trailing sentence punctuation is ignored, so '@alice.' mentions 'alice'.
+    """
+    usernames = []
+    for match in MENTION_PATTERN.findall(text or ''):
+        username = match.rstrip('.-+@').lower()
+        if username and username not in usernames:
+            usernames.append(username)
+            if len(usernames) >= MAX_MENTIONS_PER_MESSAGE:
+                break
+    return usernames
+
+
+def resolve_mentions(room, text, author_id=None):
+    """
+    Get the ids of room members mentioned in text, excluding the author.
+    """
+    usernames = extract_mentions(text)
+    if not usernames:
+        return []
+
+    index = get_mention_index(room)
+    user_ids = []
+    for username in usernames:
+        user_id = index.get(username)
+        if user_id is not None and user_id != author_id and user_id not in user_ids:
+            user_ids.append(user_id)
+    return user_ids
+
+
+def notify_message_mentions(message):
+    """
+    Notify the room members mentioned in a chat message.
+
+    Returns:
+        List of mentioned user ids
+    """
+    if message.is_private or message.message_type not in ('text', 'reply'):
+        return []
+
+    user_ids = resolve_mentions(message.room, message.message, message.user_id)
+    if user_ids:
+        from .signals import user_mentioned
+
+        user_mentioned.send(
+            sender=ChatMessage,
+            users=user_ids,
+            mentioned_by=message.user,
+            context_object=message,
+            context_type='chat'
+        )
+    return user_ids
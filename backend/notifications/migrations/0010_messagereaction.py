@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_json_reactions(apps, schema_editor):
+    """Move reactions stored in the ChatMessage JSON column into MessageReaction rows."""
+    ChatMessage = apps.get_model('notifications', 'ChatMessage')
+    MessageReaction = apps.get_model('notifications', 'MessageReaction')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    
+    valid_user_ids = set(User.objects.values_list('id', flat=True))
+    batch = []
+    for message in ChatMessage.objects.exclude(reactions={}).only('id', 'reactions').iterator(chunk_size=500):
+        for emoji, user_ids in (message.reactions or {}).items():
+            for user_id in set(user_ids or []):
+                if user_id in valid_user_ids:
+                    batch.append(MessageReaction(message_id=message.id, user_id=user_id, emoji=emoji[:32]))
+        if len(batch) >= 1000:
+            MessageReaction.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        MessageReaction.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_chatmessage_file_attachment_chatmessage_file_size_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageReaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji', models.CharField(help_text='Emoji used for the reaction', max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_reactions', to='notifications.chatmessage')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='message_reactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['message', 'emoji'], name='notificatio_message_75dd54_idx')],
+                'constraints': [models.UniqueConstraint(fields=('message', 'user', 'emoji'), name='unique_message_user_emoji')],
+            },
+        ),
+        migrations.RunPython(copy_json_reactions, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='reactions',
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0010_messagereaction'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomparticipant',
+            name='last_read_message_id',
+            field=models.BigIntegerField(blank=True, help_text='ID of the last room message this participant has read', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'id'], name='notificatio_room_id_05e608_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0012_messagesearchterm'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month the archived messages were sent in')),
+                ('message_count', models.PositiveIntegerField()),
+                ('first_message_id', models.BigIntegerField()),
+                ('last_message_id', models.BigIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-last_message_id'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='chatmessage',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='privatemessage',
+            options={},
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='archive_after_days',
+            field=models.PositiveIntegerField(blank=True, help_text='Archive messages older than this many days (defaults to CHAT_ARCHIVE_AFTER_DAYS)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='privatemessage',
+            index=models.Index(fields=['private_chat', 'id'], name='notificatio_private_ae4b43_idx'),
+        ),
+        migrations.AddField(
+            model_name='chatarchivesegment',
+            name='private_chat',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='notifications.privatechatroom'),
+        ),
+        migrations.AddField(
+            model_name='chatarchivesegment',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archive_segments', to='notifications.chatroom'),
+        ),
+        migrations.AddIndex(
+            model_name='chatarchivesegment',
+            index=models.Index(fields=['room', 'last_message_id'], name='notificatio_room_id_7f00a6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatarchivesegment',
+            index=models.Index(fields=['private_chat', 'last_message_id'], name='notificatio_private_aabf2d_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:20
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0013_chatarchivesegment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatUploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('file', 'File Attachment'), ('voice', 'Voice Message')], max_length=10)),
+                ('filename', models.CharField(max_length=255)),
+                ('file_type', models.CharField(blank=True, choices=[('media', 'Media'), ('document', 'Document')], max_length=20, null=True)),
+                ('duration', models.IntegerField(blank=True, help_text='Duration of voice message in seconds', null=True)),
+                ('total_size', models.BigIntegerField(help_text='Declared size of the whole file in bytes')),
+                ('received_size', models.BigIntegerField(default=0, help_text='Bytes received so far (the next chunk offset)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('private_chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='notifications.privatechatroom')),
+                ('room', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='notifications.chatroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
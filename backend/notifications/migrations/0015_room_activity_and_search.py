@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0014_chatuploadsession'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='activity_score',
+            field=models.FloatField(default=0, help_text='Ranking score from recent messages, posters and recency'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, help_text='Time of the latest message as of the last activity refresh', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['created_at'], name='notificatio_created_3a754b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['is_active', '-created_at'], name='notificatio_is_acti_b4c1d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['is_active', '-activity_score'], name='notificatio_is_acti_b8cd7e_idx'),
+        ),
+        migrations.AddField(
+            model_name='roomsearchterm',
+            name='room',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms_index', to='notifications.chatroom'),
+        ),
+        migrations.AddIndex(
+            model_name='roomsearchterm',
+            index=models.Index(fields=['term', 'room'], name='notificatio_term_f0c7c1_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:10
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_participants(apps, schema_editor):
+    """Seed participant_total from the existing active participant rows."""
+    ChatRoom = apps.get_model('notifications', 'ChatRoom')
+    RoomParticipant = apps.get_model('notifications', 'RoomParticipant')
+    ChatRoom.objects.update(participant_total=Coalesce(Subquery(
+        RoomParticipant.objects.filter(room=OuterRef('pk'), is_active=True)
+        .order_by().values('room').annotate(count=Count('id')).values('count')
+    ), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0015_room_activity_and_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='participant_total',
+            field=models.PositiveIntegerField(default=0, help_text='Active participants, maintained by notifications.admission'),
+        ),
+        migrations.RunPython(count_participants, migrations.RunPython.noop),
+    ]
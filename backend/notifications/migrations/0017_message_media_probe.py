@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0016_chatroom_participant_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='media_height',
+            field=models.PositiveIntegerField(blank=True, help_text='Image or video height in pixels', null=True),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='media_width',
+            field=models.PositiveIntegerField(blank=True, help_text='Image or video width in pixels', null=True),
+        ),
+        migrations.AddField(
+            model_name='chatmessage',
+            name='mime_type',
+            field=models.CharField(blank=True, default='', help_text='MIME type sniffed from the file contents', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='privatemessage',
+            name='media_height',
+            field=models.PositiveIntegerField(blank=True, help_text='Image or video height in pixels', null=True),
+        ),
+        migrations.AddField(
+            model_name='privatemessage',
+            name='media_width',
+            field=models.PositiveIntegerField(blank=True, help_text='Image or video width in pixels', null=True),
+        ),
+        migrations.AddField(
+            model_name='privatemessage',
+            name='mime_type',
+            field=models.CharField(blank=True, default='', help_text='MIME type sniffed from the file contents', max_length=100),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0017_message_media_probe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the attachment, used as its download ETag', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='privatemessage',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the attachment, used as its download ETag', max_length=64),
+        ),
+    ]
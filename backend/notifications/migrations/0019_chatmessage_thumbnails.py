@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0018_attachment_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, help_text='Stored thumbnail names of an image attachment, by size'),
+        ),
+    ]
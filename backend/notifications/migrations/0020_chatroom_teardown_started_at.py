@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0019_chatmessage_thumbnails'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='teardown_started_at',
+            field=models.DateTimeField(blank=True, help_text='When the meeting was ended and its background teardown scheduled', null=True),
+        ),
+    ]
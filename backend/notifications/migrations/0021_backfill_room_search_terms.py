@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:20
+
+from django.db import migrations
+
+from notifications.search_index import extract_terms
+
+
+def index_existing_rooms(apps, schema_editor):
+    """Index the names and descriptions of rooms created before room search existed."""
+    ChatRoom = apps.get_model('notifications', 'ChatRoom')
+    RoomSearchTerm = apps.get_model('notifications', 'RoomSearchTerm')
+
+    indexed = set(RoomSearchTerm.objects.values_list('room_id', flat=True).distinct())
+    batch = []
+    for room in ChatRoom.objects.only('id', 'name', 'description').iterator(chunk_size=500):
+        if room.id in indexed:
+            continue
+        batch.extend(RoomSearchTerm(term=term, room_id=room.id) for term in extract_terms(room.name, room.description))
+        if len(batch) >= 1000:
+            RoomSearchTerm.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        RoomSearchTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0020_chatroom_teardown_started_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_rooms, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
@@ -7,6 +9,9 @@ from django.utils import timezone
 from django.urls import reverse
 from django.utils.html import format_html
 
+from core.file_delivery import get_upload_hash
+from core.thumbnails import is_image_name, schedule_thumbnails
+
 User = get_user_model()
 
 
@@ -336,20 +341,41 @@ class ChatRoom(models.Model):
     is_active = models.BooleanField(default=True)
     auto_approve = models.BooleanField(default=True, help_text="Auto approve join requests")
     max_participants = models.PositiveIntegerField(default=50)
+    participant_total = models.PositiveIntegerField(default=0, help_text="Active participants, maintained by notifications.admission")
+    archive_after_days = models.PositiveIntegerField(null=True, blank=True, help_text="Archive messages older than this many days (defaults to CHAT_ARCHIVE_AFTER_DAYS)")
+    
+    # Denormalized activity, refreshed periodically by refresh_room_activity
+    activity_score = models.FloatField(default=0, help_text="Ranking score from recent messages, posters and recency")
+    last_message_at = models.DateTimeField(null=True, blank=True, help_text="Time of the latest message as of the last activity refresh")
+    teardown_started_at = models.DateTimeField(null=True, blank=True, help_text="When the meeting was ended and its background teardown scheduled")
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['is_active', '-created_at']),
+            models.Index(fields=['is_active', '-activity_score']),
+        ]
         
     def __str__(self):
         return self.name
     
+    def save(self, *args, **kwargs):
+        # participant_total is only changed by the conditional UPDATEs in notifications.admission;
+        # saving a room loaded earlier must not write back a stale count
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'participant_total'
+            ]
+        super().save(*args, **kwargs)
+    
     @property
     def participant_count(self):
-        return self.participants.filter(is_active=True).count()
+        return self.participant_total
     
     @property
     def is_full(self):
-        return self.participant_count >= self.max_participants
+        return self.participant_total >= self.max_participants
 
 
 class RoomParticipant(models.Model):
@@ -361,6 +387,7 @@ class RoomParticipant(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     is_moderator = models.BooleanField(default=False)
+    last_read_message_id = models.BigIntegerField(null=True, blank=True, help_text="ID of the last room message this participant has read")
     
     class Meta:
         unique_together = ['room', 'user']
@@ -396,6 +423,13 @@ class JoinRequest(models.Model):
         return f"{self.user.username} -> {self.room.name} ({self.status})"
 
 
+def hash_new_attachment(message):
+    """Hash a chat message's attachment when it is newly uploaded (before it is written to storage)."""
+    for field_file in (message.audio_file, message.file_attachment):
+        if field_file and not field_file._committed:
+            message.content_hash = get_upload_hash(field_file)
+
+
 class ChatMessage(models.Model):
     """
     Model for storing chat messages in rooms.
@@ -425,6 +459,13 @@ class ChatMessage(models.Model):
     file_size = models.BigIntegerField(null=True, blank=True, help_text="File size in bytes")
     original_filename = models.CharField(max_length=255, null=True, blank=True, help_text="Original filename")
     
+    # Probed from the uploaded bytes (core.media_probe), so clients can render previews without downloading
+    mime_type = models.CharField(max_length=100, blank=True, default='', help_text="MIME type sniffed from the file contents")
+    media_width = models.PositiveIntegerField(null=True, blank=True, help_text="Image or video width in pixels")
+    media_height = models.PositiveIntegerField(null=True, blank=True, help_text="Image or video height in pixels")
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 of the attachment, used as its download ETag")
+    thumbnails = models.JSONField(default=dict, blank=True, help_text="Stored thumbnail names of an image attachment, by size")
+    
     # Reply functionality
     reply_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='replies')
     is_private = models.BooleanField(default=False, help_text="Private reply (only visible to sender and recipient)")
@@ -434,11 +475,12 @@ class ChatMessage(models.Model):
     edited_at = models.DateTimeField(null=True, blank=True)
     is_edited = models.BooleanField(default=False)
     
-    # Reactions (stored as JSON for simplicity)
-    reactions = models.JSONField(default=dict, blank=True, help_text="Emoji reactions with user IDs")
-    
     class Meta:
-        ordering = ['created_at']
+        # No default ordering: history queries order by id explicitly so they use the (room, id) index
+        indexes = [
+            models.Index(fields=['room', 'id']),
+            models.Index(fields=['created_at']),
+        ]
         
     def __str__(self):
         if self.user:
@@ -449,7 +491,46 @@ class ChatMessage(models.Model):
         # Set edited timestamp if message is being edited
         if self.pk and self.is_edited:
             self.edited_at = timezone.now()
+        hash_new_attachment(self)
+        new_image = bool(self.file_attachment) and not self.file_attachment._committed and (
+            self.mime_type.startswith('image/') or is_image_name(self.file_attachment.name)
+        )
         super().save(*args, **kwargs)
+        if new_image:
+            schedule_thumbnails(ChatMessage, self.pk, 'file_attachment')
+    
+    @property
+    def attachment(self):
+        """The message's stored voice recording or file, if any."""
+        return self.audio_file or self.file_attachment
+
+
+class MessageReaction(models.Model):
+    """
+    Model for a single user's emoji reaction to a chat message.
+    One row per (message, user, emoji) so concurrent reactions never overwrite each other.
+    """
+    message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, related_name='message_reactions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='message_reactions')
+    emoji = models.CharField(max_length=32, help_text="Emoji used for the reaction")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['message', 'user', 'emoji'], name='unique_message_user_emoji'),
+        ]
+        indexes = [
+            models.Index(fields=['message', 'emoji']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} reacted {self.emoji} to message {self.message_id}"
+    
+    @classmethod
+    def count_for(cls, message_id, emoji):
+        """Get the current number of reactions with an emoji on a message."""
+        return cls.objects.filter(message_id=message_id, emoji=emoji).count()
 
 
 class PrivateChatRoom(models.Model):
@@ -520,6 +601,12 @@ class PrivateMessage(models.Model):
     file_size = models.BigIntegerField(null=True, blank=True, help_text="File size in bytes")
     original_filename = models.CharField(max_length=255, null=True, blank=True, help_text="Original filename")
     
+    # Probed from the uploaded bytes (core.media_probe), so clients can render previews without downloading
+    mime_type = models.CharField(max_length=100, blank=True, default='', help_text="MIME type sniffed from the file contents")
+    media_width = models.PositiveIntegerField(null=True, blank=True, help_text="Image or video width in pixels")
+    media_height = models.PositiveIntegerField(null=True, blank=True, help_text="Image or video height in pixels")
+    content_hash = models.CharField(max_length=64, blank=True, default='', help_text="SHA-256 of the attachment, used as its download ETag")
+    
     # Message status
     is_read = models.BooleanField(default=False)
     read_at = models.DateTimeField(null=True, blank=True)
@@ -533,7 +620,9 @@ class PrivateMessage(models.Model):
     reactions = models.JSONField(default=dict, blank=True, help_text="Emoji reactions with user IDs")
     
     class Meta:
-        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['private_chat', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.sender.username} -> {self.private_chat}: {self.message[:50]}..."
@@ -549,4 +638,117 @@ class PrivateMessage(models.Model):
         # Set edited timestamp if message is being edited
         if self.pk and self.is_edited:
             self.edited_at = timezone.now()
+        hash_new_attachment(self)
         super().save(*args, **kwargs)
+    
+    @property
+    def attachment(self):
+        """The message's stored voice recording or file, if any."""
+        return self.audio_file or self.file_attachment
+
+
+
+class MessageSearchTerm(models.Model):
+    """
+    Inverted index entry mapping a normalized search term to a chat or private message.
+    Maintained incrementally when messages are saved so searches never scan message text.
+    """
+    term = models.CharField(max_length=64, help_text="Normalized search term")
+    
+    # Scope: exactly one of room/private_chat is set, matching the indexed message
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='search_terms')
+    private_chat = models.ForeignKey(PrivateChatRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='search_terms')
+    
+    chat_message = models.ForeignKey(ChatMessage, on_delete=models.CASCADE, null=True, blank=True, related_name='search_terms')
+    private_message = models.ForeignKey(PrivateMessage, on_delete=models.CASCADE, null=True, blank=True, related_name='search_terms')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'term']),
+            models.Index(fields=['private_chat', 'term']),
+        ]
+    
+    def __str__(self):
+        return self.term
+
+
+
+class RoomSearchTerm(models.Model):
+    """
+    Inverted index entry mapping a normalized term from a room's name or description to the room.
+    Lets room discovery search without scanning text columns.
+    """
+    term = models.CharField(max_length=64)
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='search_terms_index')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'room']),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} -> room {self.room_id}"
+
+
+class ChatArchiveSegment(models.Model):
+    """
+    Compressed, immutable block of archived messages for one room (or private chat) and month.
+    Old messages are moved here so the hot message tables and their indexes stay small.
+    """
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='archive_segments')
+    private_chat = models.ForeignKey(PrivateChatRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='archive_segments')
+    period = models.DateField(help_text="First day of the month the archived messages were sent in")
+    
+    message_count = models.PositiveIntegerField()
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    
+    # Gzip-compressed JSON lines, one serialized message per line in id order
+    data = models.BinaryField()
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-last_message_id']
+        indexes = [
+            models.Index(fields=['room', 'last_message_id']),
+            models.Index(fields=['private_chat', 'last_message_id']),
+        ]
+    
+    def __str__(self):
+        scope = self.room or self.private_chat
+        return f"Archive of {scope} for {self.period:%Y-%m} ({self.message_count} messages)"
+
+
+class ChatUploadSession(models.Model):
+    """
+    Model for a resumable, chunked upload of a chat attachment or voice message.
+    Chunks are appended to a working file until the upload is finalized into a message.
+    """
+    KIND_CHOICES = [
+        ('file', 'File Attachment'),
+        ('voice', 'Voice Message'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_upload_sessions')
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    private_chat = models.ForeignKey(PrivateChatRoom, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    filename = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=20, choices=[('media', 'Media'), ('document', 'Document')], null=True, blank=True)
+    duration = models.IntegerField(null=True, blank=True, help_text="Duration of voice message in seconds")
+    
+    total_size = models.BigIntegerField(help_text="Declared size of the whole file in bytes")
+    received_size = models.BigIntegerField(default=0, help_text="Bytes received so far (the next chunk offset)")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.filename} ({self.received_size}/{self.total_size})"
+    
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
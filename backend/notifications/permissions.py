@@ -5,6 +5,7 @@ Ensures users can only access their own notifications, while admins can view all
 
 from rest_framework import permissions
 from .models import Notification
+from .membership import resolve_membership
 
 
 class IsNotificationRecipientOrAdmin(permissions.BasePermission):
@@ -369,3 +370,34 @@ class IsNotificationSystemOrAdmin(permissions.BasePermission):
             return False
 
         return request.user.is_staff or getattr(request.user, 'is_system', False)
+
+
+class IsRoomMember(permissions.BasePermission):
+    """
+    Custom permission to only allow active participants and the creator of a chat room.
+    Membership is resolved once per request and cached briefly.
+    """
+    message = 'You must be a participant in this room.'
+    
+    def has_permission(self, request, view):
+        """Check if user is authenticated."""
+        return request.user and request.user.is_authenticated
+
+    def has_object_permission(self, request, view, obj):
+        """Check if user is a member of the chat room."""
+        return resolve_membership(obj, request.user, request).is_member
+
+
+class IsRoomHost(permissions.BasePermission):
+    """
+    Custom permission to only allow the creator or an active moderator of a chat room.
+    """
+    message = 'Only hosts can perform this action.'
+    
+    def has_permission(self, request, view):
+        """Check if user is authenticated."""
+        return request.user and request.user.is_authenticated
+
+    def has_object_permission(self, request, view, obj):
+        """Check if user is a host of the chat room."""
+        return resolve_membership(obj, request.user, request).is_host
@@ -0,0 +1,136 @@
+"""
+Ephemeral presence and typing state for chat rooms.
+Fed by ChatRoomConsumer connect, disconnect and heartbeat events and kept only
+in memory with TTL expiry, so live indicators never write to the database.
+Like the in-memory channel layer, state is per process.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+
+
+PRESENCE_TTL = getattr(settings, 'CHAT_PRESENCE_TTL', 60)
+TYPING_MIN_INTERVAL = getattr(settings, 'CHAT_TYPING_MIN_INTERVAL', 2)
+
+
+class PresenceRegistry:
+    """
+    Tracks which users are connected to each room.
+    A user stays online while any of their connections has sent a heartbeat within the TTL.
+    Methods that change presence return the users who joined or left so callers can publish diffs.
+    """
+
+    def __init__(self, ttl=PRESENCE_TTL, typing_interval=TYPING_MIN_INTERVAL):
+        self.ttl = ttl
+        self.typing_interval = typing_interval
+        self._lock = threading.Lock()
+        # room_id -> user_id -> {'username': str, 'connections': {channel_name: expires_at}}
+        self._rooms = {}
+        # (room_id, user_id) -> time of the last typing event that was fanned out
+        self._typing = {}
+
+    def connect(self, room_id, user_id, username, channel_name, now=None):
+        """
+        Register a connection. Returns True if the user just came online in the room.
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            users = self._rooms.setdefault(room_id, {})
+            entry = users.get(user_id)
+            joined = entry is None
+            if joined:
+                entry = users[user_id] = {'username': username, 'connections': {}}
+            entry['connections'][channel_name] = now + self.ttl
+            return joined
+
+    def heartbeat(self, room_id, user_id, channel_name, now=None):
+        """
+        Extend a connection's TTL. Returns False if the connection is unknown (e.g. already expired).
+        """
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            entry = self._rooms.get(room_id, {}).get(user_id)
+            if entry is None or channel_name not in entry['connections']:
+                return False
+            entry['connections'][channel_name] = now + self.ttl
+            return True
+
+    def disconnect(self, room_id, user_id, channel_name):
+        """
+        Remove a connection. Returns True if the user has no connections left in the room.
+        """
+        with self._lock:
+            users = self._rooms.get(room_id, {})
+            entry = users.get(user_id)
+            if entry is None:
+                return False
+            entry['connections'].pop(channel_name, None)
+            if entry['connections']:
+                return False
+            self._forget(room_id, user_id)
+            return True
+
+    def expire(self, now=None):
+        """
+        Drop connections whose TTL has passed.
+
+        Returns:
+            Dict of room_id -> list of user ids that went offline
+        """
+        if now is None:
+            now = time.monotonic()
+        left = {}
+        with self._lock:
+            for room_id, users in list(self._rooms.items()):
+                for user_id, entry in list(users.items()):
+                    connections = entry['connections']
+                    for channel_name, expires_at in list(connections.items()):
+                        if expires_at <= now:
+                            del connections[channel_name]
+                    if not connections:
+                        self._forget(room_id, user_id)
+                        left.setdefault(room_id, []).append(user_id)
+        return left
+
+    def online(self, room_id):
+        """Get the users currently online in a room."""
+        with self._lock:
+            return [
+                {'id': user_id, 'username': entry['username']}
+                for user_id, entry in self._rooms.get(room_id, {}).items()
+            ]
+
+    def should_send_typing(self, room_id, user_id, now=None):
+        """
+        Rate-limit typing events to one per TYPING_MIN_INTERVAL per user and room.
+        Returns True if this event should be fanned out.
+        """
+        if now is None:
+            now = time.monotonic()
+        key = (room_id, user_id)
+        with self._lock:
+            last_sent = self._typing.get(key)
+            if last_sent is not None and now - last_sent < self.typing_interval:
+                return False
+            self._typing[key] = now
+            return True
+
+    def clear_typing(self, room_id, user_id):
+        """Reset the typing rate limit so the next 'started typing' event goes out at once."""
+        with self._lock:
+            self._typing.pop((room_id, user_id), None)
+
+    def _forget(self, room_id, user_id):
+        users = self._rooms.get(room_id, {})
+        users.pop(user_id, None)
+        if not users:
+            self._rooms.pop(room_id, None)
+        self._typing.pop((room_id, user_id), None)
+
+
+# Global registry shared by every chat room connection in this process
+presence_registry = PresenceRegistry()
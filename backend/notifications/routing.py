@@ -11,4 +11,7 @@ websocket_urlpatterns = [
     
     # Broadcast notification channel - for admin/system broadcasts
     re_path(r'ws/notifications/broadcast/$', consumers.NotificationBroadcastConsumer.as_asgi()),
+    
+    # Chat room channel - live room events for participants
+    re_path(r'ws/chat/rooms/(?P<room_id>\d+)/$', consumers.ChatRoomConsumer.as_asgi()),
 ]
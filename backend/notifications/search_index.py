@@ -0,0 +1,189 @@
+"""
+Incrementally maintained text index for chat room and private messages (and room names).
+Messages are split into normalized terms when saved; searches intersect term
+lookups instead of scanning message text, so they stay fast in large rooms.
+"""
+
+import re
+
+from django.db.models import Q
+
+from .models import ChatMessage, PrivateMessage, MessageSearchTerm, RoomSearchTerm
+
+
+TERM_PATTERN = re.compile(r'[^\W_]+')
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 64
+MAX_TERMS_PER_MESSAGE = 500
+MAX_QUERY_TERMS = 8
+SNIPPET_RADIUS = 60
+
+
+def extract_terms(*texts):
+    """
+    Split text into unique, lowercase search terms.
+    Filenames are split on punctuation, so 'week_3-notes.pdf' yields 'week', '3', 'notes', 'pdf'.
+    """
+    terms = []
+    seen = set()
+    for text in texts:
+        if not text:
+            continue
+        for term in TERM_PATTERN.findall(text.lower()):
+            if len(term) < MIN_TERM_LENGTH and not term.isdigit():
+                continue
+            term = term[:MAX_TERM_LENGTH]
+            if term not in seen:
+                seen.add(term)
+                terms.append(term)
+                if len(terms) >= MAX_TERMS_PER_MESSAGE:
+                    return terms
+    return terms
+
+
+def build_chat_message_terms(message):
+    """Build (unsaved) index entries for a room message."""
+    return [
+        MessageSearchTerm(term=term, room_id=message.room_id, chat_message_id=message.id)
+        for term in extract_terms(message.message, message.original_filename)
+    ]
+
+
+def build_private_message_terms(message):
+    """Build (unsaved) index entries for a private message."""
+    return [
+        MessageSearchTerm(term=term, private_chat_id=message.private_chat_id, private_message_id=message.id)
+        for term in extract_terms(message.message, message.original_filename)
+    ]
+
+
+def index_chat_message(message):
+    """Replace the index entries for a room message."""
+    MessageSearchTerm.objects.filter(chat_message_id=message.id).delete()
+    MessageSearchTerm.objects.bulk_create(build_chat_message_terms(message))
+
+
+def index_private_message(message):
+    """Replace the index entries for a private message."""
+    MessageSearchTerm.objects.filter(private_message_id=message.id).delete()
+    MessageSearchTerm.objects.bulk_create(build_private_message_terms(message))
+
+
+def build_room_terms(room):
+    """Build (unsaved) index entries for a room's name and description."""
+    return [
+        RoomSearchTerm(term=term, room_id=room.id)
+        for term in extract_terms(room.name, room.description)
+    ]
+
+
+def index_room(room):
+    """Replace the index entries for a room."""
+    RoomSearchTerm.objects.filter(room_id=room.id).delete()
+    RoomSearchTerm.objects.bulk_create(build_room_terms(room))
+
+
+def _filter_by_terms(queryset, scoped_terms, message_field, query_terms):
+    """
+    Restrict a message queryset to messages containing every query term.
+    The last term is matched as a prefix so partially typed words still match.
+    """
+    for position, term in enumerate(query_terms):
+        if position == len(query_terms) - 1:
+            # Range instead of LIKE so the (scope, term) index is used on every backend
+            term_filter = Q(term__gte=term, term__lt=term + '\uffff')
+        else:
+            term_filter = Q(term=term)
+        queryset = queryset.filter(
+            id__in=scoped_terms.filter(term_filter).values(message_field)
+        )
+    return queryset
+
+
+def search_room_messages(room, query):
+    """
+    Search messages in a chat room.
+
+    Returns:
+        Tuple of (queryset of matching ChatMessage newest first, list of query terms)
+    """
+    query_terms = extract_terms(query)[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return ChatMessage.objects.none(), query_terms
+
+    queryset = _filter_by_terms(
+        ChatMessage.objects.filter(room=room),
+        MessageSearchTerm.objects.filter(room=room),
+        'chat_message_id',
+        query_terms
+    )
+    return queryset.select_related('user').order_by('-id'), query_terms
+
+
+def search_private_messages(private_chat, query):
+    """
+    Search messages in a private chat.
+
+    Returns:
+        Tuple of (queryset of matching PrivateMessage newest first, list of query terms)
+    """
+    query_terms = extract_terms(query)[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return PrivateMessage.objects.none(), query_terms
+
+    queryset = _filter_by_terms(
+        PrivateMessage.objects.filter(private_chat=private_chat),
+        MessageSearchTerm.objects.filter(private_chat=private_chat),
+        'private_message_id',
+        query_terms
+    )
+    return queryset.select_related('sender').order_by('-id'), query_terms
+
+
+def search_rooms(queryset, query):
+    """
+    Restrict a room queryset to rooms whose name or description contains every query term.
+    """
+    query_terms = extract_terms(query)[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return queryset.none()
+    return _filter_by_terms(queryset, RoomSearchTerm.objects.all(), 'room_id', query_terms)
+
+
+def make_snippet(text, query_terms):
+    """Get a short excerpt of text around the first matching term."""
+    if not text:
+        return ''
+
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in query_terms]
+    positions = [position for position in positions if position >= 0]
+    if not positions:
+        return text[:SNIPPET_RADIUS * 2]
+
+    position = min(positions)
+    start = max(position - SNIPPET_RADIUS, 0)
+    end = min(position + SNIPPET_RADIUS, len(text))
+
+    snippet = text[start:end].strip()
+    if start > 0:
+        snippet = '…' + snippet
+    if end < len(text):
+        snippet = snippet + '…'
+    return snippet
+
+
+def build_search_result(message, user, query_terms):
+    """Build a search result entry for a room or private message."""
+    text = message.message
+    if message.original_filename and not any(term in (text or '').lower() for term in query_terms):
+        text = message.original_filename
+
+    return {
+        'id': message.id,
+        'message_type': message.message_type,
+        'snippet': make_snippet(text, query_terms),
+        'user_id': user.id if user else None,
+        'username': user.username if user else 'System',
+        'created_at': message.created_at,
+    }
@@ -8,7 +8,10 @@ from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 
-from .models import Notification
+from .models import Notification, ChatRoom, RoomParticipant, ChatMessage, PrivateMessage
+from .membership import invalidate_membership
+from .mentions import invalidate_mention_index
+from .search_index import index_chat_message, index_private_message, index_room
 from .utils import NotificationManager
 from .websocket_service import send_notification_realtime, send_notification_update_realtime, send_notification_deletion_realtime
 
@@ -129,6 +132,50 @@ def notify_event_cancelled(sender, instance, **kwargs):
             )
 
 
+@receiver(post_save, sender=RoomParticipant)
+@receiver(post_delete, sender=RoomParticipant)
+def invalidate_room_membership(sender, instance, **kwargs):
+    """
+    Drop the cached membership and mention index when a participant joins, leaves or is removed.
+    """
+    invalidate_membership(instance.room_id, instance.user_id)
+    invalidate_mention_index(instance.room_id)
+
+
+def _indexed_fields_saved(created, update_fields, indexed_fields):
+    """Check whether a save can have changed indexed text (update_fields=None saves every field)."""
+    return created or update_fields is None or not indexed_fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=ChatRoom)
+def index_room_for_search(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the room discovery index in step with room names and descriptions.
+    """
+    if _indexed_fields_saved(created, update_fields, {'name', 'description'}):
+        index_room(instance)
+
+
+@receiver(post_save, sender=ChatMessage)
+def index_chat_message_for_search(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the chat search index in step with message content.
+    Saves that only touch flags (e.g. read state) leave the index alone.
+    """
+    if _indexed_fields_saved(created, update_fields, {'message', 'original_filename'}):
+        index_chat_message(instance)
+
+
+@receiver(post_save, sender=PrivateMessage)
+def index_private_message_for_search(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the private chat search index in step with message content.
+    Saves that only touch flags (e.g. mark_as_read) leave the index alone.
+    """
+    if _indexed_fields_saved(created, update_fields, {'message', 'original_filename'}):
+        index_private_message(instance)
+
+
 # Custom signal for user mentions
 from django.dispatch import Signal
 
@@ -136,11 +183,18 @@ user_mentioned = Signal()
 
 
 @receiver(user_mentioned)
-def handle_user_mention(sender, user, mentioned_by, context_object, context_type, **kwargs):
+def handle_user_mention(sender, mentioned_by, context_object, context_type, user=None, users=None, **kwargs):
     """
     Handle user mention notifications.
+    Senders pass either a single user or a list of user ids (notified in one bulk insert).
     """
-    NotificationManager.notify_user_mentioned(user, mentioned_by, context_object, context_type)
+    if users:
+        notifications = NotificationManager.notify_users_mentioned(users, mentioned_by, context_object, context_type)
+    else:
+        notifications = [NotificationManager.notify_user_mentioned(user, mentioned_by, context_object, context_type)]
+
+    for notification in notifications:
+        send_notification_realtime(notification)
 
 
 # Custom signal for system announcements
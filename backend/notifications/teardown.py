@@ -0,0 +1,266 @@
+"""
+Background teardown for ended chat rooms.
+Ending a meeting only marks the room inactive; the cascade through messages,
+private chats, participants and uploaded files then runs in bounded batches
+outside the request, reporting progress through the cache.
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.thumbnails import delete_thumbnails
+
+from .models import (
+    Notification, ChatRoom, RoomParticipant, JoinRequest, ChatMessage,
+    PrivateChatRoom, PrivateMessage, ChatArchiveSegment
+)
+from .archive import archived_file_names, decode_records
+from .websocket_service import chat_room_websocket_service
+
+
+DEFAULT_TEARDOWN_BATCH_SIZE = 500
+TEARDOWN_PROGRESS_TIMEOUT = getattr(settings, 'CHAT_TEARDOWN_PROGRESS_TIMEOUT', 60 * 60)
+FILE_FIELDS = ('audio_file', 'file_attachment')
+
+
+def get_teardown_cache_key(room_id):
+    """Get the cache key holding a room's teardown progress."""
+    return f'chat_teardown_{room_id}'
+
+
+def get_teardown_progress(room_id):
+    """Get the teardown progress for a room, or None if no teardown is known."""
+    return cache.get(get_teardown_cache_key(room_id))
+
+
+def _save_progress(progress):
+    progress['updated_at'] = timezone.now().isoformat()
+    cache.set(get_teardown_cache_key(progress['room_id']), progress, TEARDOWN_PROGRESS_TIMEOUT)
+
+
+def start_room_teardown(room, actor):
+    """
+    Mark a room inactive and schedule its teardown once the transaction commits.
+    The room disappears from every room query immediately; deletion happens in the background.
+
+    Args:
+        room: ChatRoom being ended
+        actor: User who ended the meeting
+
+    Returns:
+        Initial progress dict
+    """
+    now = timezone.now()
+    # The marker lets resume_room_teardowns find teardowns interrupted by a restart
+    ChatRoom.objects.filter(id=room.id).update(is_active=False, teardown_started_at=now, updated_at=now)
+
+    progress = {
+        'room_id': room.id,
+        'room_name': room.name,
+        'actor_id': actor.id,
+        'status': 'pending',
+        'deleted': {},
+    }
+    _save_progress(progress)
+
+    chat_room_websocket_service.send_room_event(room.id, 'meeting_ended', {
+        'room_id': room.id,
+        'room_name': room.name,
+        'ended_by': actor.id,
+    })
+
+    transaction.on_commit(lambda: run_room_teardown(room.id, actor.id))
+    return progress
+
+
+def run_room_teardown(room_id, actor_id):
+    """Run a room teardown in a background thread, or inline when CHAT_TEARDOWN_ASYNC is off."""
+    if not getattr(settings, 'CHAT_TEARDOWN_ASYNC', True):
+        teardown_room(room_id, actor_id)
+        return
+
+    def target():
+        try:
+            teardown_room(room_id, actor_id)
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=target, name=f'chat-teardown-{room_id}', daemon=True).start()
+
+
+def _delete_files(model, rows):
+    """Remove stored files for deleted messages; missing files are ignored."""
+    for field_name, names in zip(FILE_FIELDS, zip(*rows)):
+        storage = model._meta.get_field(field_name).storage
+        for name in names:
+            if not name:
+                continue
+            try:
+                storage.delete(name)
+            except Exception as e:
+                print(f"Error deleting file {name}: {e}")
+
+
+def _delete_in_batches(queryset, label, progress, batch_size, with_files=False):
+    """
+    Delete a queryset in id-ordered batches, each in its own short transaction.
+
+    Returns:
+        Number of rows deleted so far, including earlier interrupted runs
+    """
+    model = queryset.model
+    with_thumbnails = with_files and any(field.name == 'thumbnails' for field in model._meta.fields)
+    columns = ('id',) + (FILE_FIELDS if with_files else ()) + (('thumbnails',) if with_thumbnails else ())
+    total = progress['deleted'].get(label, 0)
+
+    while True:
+        rows = list(queryset.order_by('id').values_list(*columns)[:batch_size])
+        if not rows:
+            break
+
+        with transaction.atomic():
+            model.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+        if with_files:
+            _delete_files(model, [row[1:3] for row in rows])
+        if with_thumbnails:
+            storage = model._meta.get_field('file_attachment').storage
+            for row in rows:
+                delete_thumbnails(storage, row[3])
+
+        total += len(rows)
+        progress['deleted'][label] = total
+        _save_progress(progress)
+
+    return total
+
+
+def _delete_segments_in_batches(queryset, label, progress, batch_size):
+    """
+    Delete archive segments in batches, together with the attachment files their records refer to.
+
+    Returns:
+        Number of segments deleted so far, including earlier interrupted runs
+    """
+    storage = ChatMessage._meta.get_field('file_attachment').storage
+    total = progress['deleted'].get(label, 0)
+
+    while True:
+        rows = list(queryset.order_by('id').values_list('id', 'data')[:batch_size])
+        if not rows:
+            break
+
+        with transaction.atomic():
+            ChatArchiveSegment.objects.filter(id__in=[row[0] for row in rows]).delete()
+
+        for _, data in rows:
+            for record in decode_records(data):
+                for name in archived_file_names(record):
+                    try:
+                        storage.delete(name)
+                    except Exception as e:
+                        print(f"Error deleting file {name}: {e}")
+
+        total += len(rows)
+        progress['deleted'][label] = total
+        _save_progress(progress)
+
+    return total
+
+
+def _notify_participants(room, actor_id, batch_size):
+    """Tell every other active participant the meeting ended, in one bulk insert."""
+    recipient_ids = RoomParticipant.objects.filter(
+        room_id=room.id,
+        is_active=True
+    ).exclude(user_id=actor_id).values_list('user_id', flat=True)
+
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            actor_id=actor_id,
+            verb=f'ended and deleted the meeting "{room.name}"',
+            notification_type='chat',
+            data={
+                'room_id': room.id,
+                'room_name': room.name,
+                'action_type': 'meeting_deleted',
+                'message': f'The meeting "{room.name}" has been permanently deleted by the host.'
+            }
+        )
+        for recipient_id in recipient_ids
+    ], batch_size=batch_size)
+    return len(recipient_ids)
+
+
+def teardown_room(room_id, actor_id, batch_size=None):
+    """
+    Delete an inactive room and everything that belongs to it in bounded batches.
+    Safe to re-run: a teardown interrupted part way resumes where it stopped.
+
+    Returns:
+        Final progress dict
+    """
+    batch_size = batch_size or getattr(settings, 'CHAT_TEARDOWN_BATCH_SIZE', DEFAULT_TEARDOWN_BATCH_SIZE)
+    room = ChatRoom.objects.filter(id=room_id, is_active=False).first()
+    progress = get_teardown_progress(room_id) or {
+        'room_id': room_id,
+        'room_name': room.name if room else '',
+        'actor_id': actor_id,
+        'deleted': {},
+    }
+    if room is None:
+        progress['status'] = 'done'
+        _save_progress(progress)
+        return progress
+
+    progress['status'] = 'running'
+    _save_progress(progress)
+
+    try:
+        if 'notified' not in progress:
+            progress['notified'] = _notify_participants(room, actor_id, batch_size)
+            _save_progress(progress)
+
+        _delete_in_batches(
+            PrivateMessage.objects.filter(private_chat__public_room_id=room_id),
+            'private_messages', progress, batch_size, with_files=True
+        )
+        _delete_segments_in_batches(
+            ChatArchiveSegment.objects.filter(private_chat__public_room_id=room_id),
+            'private_archive_segments', progress, batch_size
+        )
+        _delete_in_batches(
+            PrivateChatRoom.objects.filter(public_room_id=room_id),
+            'private_chats', progress, batch_size
+        )
+        _delete_segments_in_batches(
+            ChatArchiveSegment.objects.filter(room_id=room_id),
+            'archive_segments', progress, batch_size
+        )
+        _delete_in_batches(
+            ChatMessage.objects.filter(room_id=room_id),
+            'messages', progress, batch_size, with_files=True
+        )
+        _delete_in_batches(
+            JoinRequest.objects.filter(room_id=room_id),
+            'join_requests', progress, batch_size
+        )
+        _delete_in_batches(
+            RoomParticipant.objects.filter(room_id=room_id),
+            'participants', progress, batch_size
+        )
+
+        room.delete()
+        progress['status'] = 'done'
+    except Exception as e:
+        print(f"Error tearing down room {room_id}: {e}")
+        progress['status'] = 'failed'
+        progress['error'] = str(e)
+
+    _save_progress(progress)
+    return progress
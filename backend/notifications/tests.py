@@ -1,3 +1,975 @@
-from django.test import TestCase
+"""
+Tests for the chat room features of the notifications app.
+"""
 
-# Create your tests here.
+import io
+import json
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.exceptions import PermissionDenied
+from django.db import OperationalError, connection
+from django.utils import timezone
+from PIL import Image
+from asgiref.sync import async_to_sync
+from rest_framework.test import APIClient
+
+from core.chunked_upload import UploadSessionGone
+
+from .archive import archive_private_chat_messages, archive_room_messages, decode_records, encode_records
+from .chunked_uploads import finalize_upload
+from .consumers import ChatRoomConsumer
+from .presence import PresenceRegistry
+from .mentions import extract_mentions
+from .throttles import consume_token
+from .activity import refresh_room_activity
+from .admission import RoomCapacityError, admit_participant, release_participant
+from .models import (
+    Notification, ChatRoom, RoomParticipant, JoinRequest, ChatMessage, MessageReaction, ChatArchiveSegment,
+    PrivateChatRoom, PrivateMessage, ChatUploadSession
+)
+
+User = get_user_model()
+
+
+class ChatRoomTestMixin:
+    """Shared setup for chat room API tests."""
+
+    def setUp(self):
+        """Set up a room with a host and one student participant."""
+        cache.clear()
+        self.client = APIClient()
+
+        self.teacher = User.objects.create_user(
+            username='teacher',
+            email='teacher@test.com',
+            password='testpass123',
+            role='teacher'
+        )
+
+        self.student = User.objects.create_user(
+            username='student',
+            email='student@test.com',
+            password='testpass123',
+            role='student'
+        )
+
+        self.room = ChatRoom.objects.create(name='Physics', creator=self.teacher)
+        admit_participant(self.room, self.teacher, is_moderator=True)
+        admit_participant(self.room, self.student)
+
+        self.message = ChatMessage.objects.create(room=self.room, user=self.teacher, message='Welcome')
+
+    def room_url(self, action):
+        return f'/api/notifications/rooms/{self.room.id}/{action}/'
+
+
+class MessageReactionTests(ChatRoomTestMixin, TestCase):
+    """Test cases for relational message reactions."""
+
+    def test_add_reaction_is_idempotent(self):
+        """Adding the same reaction twice stores a single row."""
+        self.client.force_authenticate(self.student)
+        url = self.room_url(f'add-reaction/{self.message.id}')
+
+        first = self.client.post(url, {'emoji': '👍'}, format='json')
+        second = self.client.post(url, {'emoji': '👍'}, format='json')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data['count'], 1)
+        self.assertEqual(MessageReaction.objects.filter(message=self.message).count(), 1)
+
+    def test_remove_reaction_only_removes_own(self):
+        """Removing a reaction leaves other users' reactions untouched."""
+        MessageReaction.objects.create(message=self.message, user=self.teacher, emoji='👍')
+        MessageReaction.objects.create(message=self.message, user=self.student, emoji='👍')
+        self.client.force_authenticate(self.student)
+
+        response = self.client.delete(
+            self.room_url(f'remove-reaction/{self.message.id}'), {'emoji': '👍'}, format='json'
+        )
+
+        self.assertEqual(response.data['count'], 1)
+        self.assertTrue(MessageReaction.objects.filter(user=self.teacher).exists())
+
+    def test_messages_include_grouped_reactions(self):
+        """Message history groups reactions by emoji."""
+        MessageReaction.objects.create(message=self.message, user=self.teacher, emoji='🎉')
+        MessageReaction.objects.create(message=self.message, user=self.student, emoji='🎉')
+        self.client.force_authenticate(self.student)
+
+        response = self.client.get(self.room_url('messages'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['reactions'], {'🎉': [self.teacher.id, self.student.id]})
+        self.assertEqual(response.data[0]['reactions_formatted'][0]['count'], 2)
+
+
+class RoomMembershipTests(ChatRoomTestMixin, TestCase):
+    """Test cases for cached room membership checks."""
+
+    def test_removed_participant_loses_access(self):
+        """Leaving a room invalidates the cached membership."""
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(self.room_url('messages')).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.room_url('leave_room'))
+
+        self.assertEqual(self.client.get(self.room_url('messages')).status_code, 403)
+
+    def test_cached_membership_skips_participant_query(self):
+        """A second request reuses the cached membership instead of querying it."""
+        self.client.force_authenticate(self.student)
+        self.client.get(self.room_url('messages'))
+
+        with self.assertNumQueries(4):
+            # room lookup, archive segments, messages, reactions prefetch
+            self.client.get(self.room_url('messages'))
+
+    def test_non_host_cannot_remove_participants(self):
+        """Only hosts can remove participants."""
+        self.client.force_authenticate(self.student)
+
+        response = self.client.post(self.room_url('remove_participant'), {'user_id': self.teacher.id})
+
+        self.assertEqual(response.status_code, 403)
+
+    def test_open_socket_cannot_post_after_removal(self):
+        """Each websocket message re-checks membership instead of trusting the check made on connect."""
+        consumer = ChatRoomConsumer()
+        consumer.user = self.student
+        consumer.room_id = self.room.id
+        self.assertTrue(async_to_sync(consumer.is_room_member)())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            release_participant(self.room, self.student.id)
+        with self.assertRaises(PermissionDenied):
+            async_to_sync(consumer.create_message)('still here?')
+
+        ChatRoom.objects.filter(id=self.room.id).update(is_active=False)
+        consumer.user = self.teacher
+        with self.assertRaises(PermissionDenied):
+            async_to_sync(consumer.create_message)('after the meeting')
+        self.assertFalse(ChatMessage.objects.exclude(id=self.message.id).exists())
+
+
+class ReadCursorTests(ChatRoomTestMixin, TestCase):
+    """Test cases for per-participant read cursors and unread badges."""
+
+    def test_my_rooms_reports_unread_count_in_one_query(self):
+        """my_rooms annotates unread counts and previews without per-room queries."""
+        ChatMessage.objects.create(room=self.room, user=self.teacher, message='Homework is due')
+        other_room = ChatRoom.objects.create(name='Chemistry', creator=self.teacher)
+        admit_participant(other_room, self.student)
+        self.client.force_authenticate(self.student)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/notifications/rooms/my_rooms/')
+
+        self.assertEqual(len(response.data), 2)
+        rooms = {room['id']: room for room in response.data}
+        self.assertEqual(rooms[self.room.id]['unread_count'], 2)
+        self.assertEqual(rooms[self.room.id]['participant_count'], 2)
+        self.assertEqual(rooms[self.room.id]['last_message']['message'], 'Homework is due')
+        self.assertEqual(rooms[other_room.id]['unread_count'], 0)
+        self.assertIsNone(rooms[other_room.id]['last_message'])
+
+    def test_mark_read_moves_cursor_forward_only(self):
+        """Marking read clears unread messages and never moves the cursor back."""
+        latest = ChatMessage.objects.create(room=self.room, user=self.teacher, message='Latest')
+        self.client.force_authenticate(self.student)
+
+        self.client.post(self.room_url('mark_read'))
+        self.client.post(self.room_url('mark_read'), {'message_id': self.message.id})
+
+        participant = RoomParticipant.objects.get(room=self.room, user=self.student)
+        self.assertEqual(participant.last_read_message_id, latest.id)
+        response = self.client.get('/api/notifications/rooms/my_rooms/')
+        self.assertEqual(response.data[0]['unread_count'], 0)
+
+    def test_mark_read_rejects_messages_outside_the_room(self):
+        """A message id from another room or beyond the latest message leaves the cursor alone."""
+        other_room = ChatRoom.objects.create(name='Chemistry', creator=self.teacher)
+        foreign = ChatMessage.objects.create(room=other_room, user=self.teacher, message='Elsewhere')
+        self.client.force_authenticate(self.student)
+
+        for message_id in (foreign.id, foreign.id + 1000):
+            response = self.client.post(self.room_url('mark_read'), {'message_id': message_id})
+            self.assertEqual(response.status_code, 400)
+
+        participant = RoomParticipant.objects.get(room=self.room, user=self.student)
+        self.assertIsNone(participant.last_read_message_id)
+        ChatMessage.objects.create(room=self.room, user=self.teacher, message='Later')
+        response = self.client.get('/api/notifications/rooms/my_rooms/')
+        self.assertEqual(response.data[0]['unread_count'], 2)
+
+
+class MessageSearchTests(ChatRoomTestMixin, TestCase):
+    """Test cases for searching chat messages."""
+
+    def test_search_matches_all_terms_and_prefix(self):
+        """Searches require every term and match the last one as a prefix."""
+        match = ChatMessage.objects.create(
+            room=self.room, user=self.teacher, message='The revision link for the chemistry exam is posted'
+        )
+        ChatMessage.objects.create(room=self.room, user=self.teacher, message='Chemistry lab is cancelled')
+        self.client.force_authenticate(self.student)
+
+        response = self.client.get(self.room_url('search'), {'q': 'chemistry revi'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.data['results']], [match.id])
+        self.assertIn('revision', response.data['results'][0]['snippet'])
+
+    def test_search_reindexes_edited_messages(self):
+        """Editing a message replaces its index entries."""
+        self.client.force_authenticate(self.teacher)
+        self.client.patch(self.room_url(f'edit-message/{self.message.id}'), {'message': 'Farewell'}, format='json')
+
+        self.assertEqual(self.client.get(self.room_url('search'), {'q': 'welcome'}).data['count'], 0)
+        self.assertEqual(self.client.get(self.room_url('search'), {'q': 'farewell'}).data['count'], 1)
+
+    def test_flag_only_saves_leave_the_index_alone(self):
+        """Marking a private message read is one UPDATE, with no index rebuild."""
+        private_chat = PrivateChatRoom.objects.create(public_room=self.room, user1=self.teacher, user2=self.student)
+        message = PrivateMessage.objects.create(private_chat=private_chat, sender=self.student, message='Homework help')
+
+        with self.assertNumQueries(1):
+            message.mark_as_read(self.teacher)
+
+        self.client.force_authenticate(self.teacher)
+        self.assertEqual(self.client.get(f'/api/notifications/private-chats/{private_chat.id}/search/', {'q': 'homework'}).data['count'], 1)
+
+
+class RoomDiscoveryTests(ChatRoomTestMixin, TestCase):
+    """Test cases for searching and ranking rooms in the discovery list."""
+
+    def setUp(self):
+        super().setUp()
+        self.busy = ChatRoom.objects.create(name='Chemistry', description='Revision club', creator=self.teacher)
+        self.quiet = ChatRoom.objects.create(name='History', creator=self.teacher)
+        ChatMessage.objects.filter(id=self.message.id).update(created_at=timezone.now() - timedelta(hours=3))
+        for text in ('one', 'two', 'three'):
+            ChatMessage.objects.create(room=self.busy, user=self.student, message=text)
+        ChatMessage.objects.create(room=self.busy, user=self.teacher, message='four')
+        self.client.force_authenticate(self.student)
+
+    def list_rooms(self, **params):
+        response = self.client.get('/api/notifications/rooms/', params)
+        self.assertEqual(response.status_code, 200)
+        return [room['id'] for room in response.data['results']]
+
+    def test_sort_by_activity_uses_refreshed_score(self):
+        """Rooms are ranked by the stored score once the refresh job has run."""
+        self.assertEqual(refresh_room_activity(), 3)
+
+        self.assertEqual(self.list_rooms(sort='active'), [self.busy.id, self.room.id, self.quiet.id])
+        self.assertEqual(self.list_rooms(sort='active_now'), [self.busy.id])
+
+    def test_search_matches_name_and_description_prefix(self):
+        """Room search matches words in the name or description by prefix."""
+        self.assertEqual(self.list_rooms(search='revis'), [self.busy.id])
+        self.assertEqual(self.list_rooms(search='phys'), [self.room.id])
+
+    def test_list_queries_do_not_grow_with_rooms(self):
+        """Participant counts and per-user badges come from annotations."""
+        for index in range(5):
+            ChatRoom.objects.create(name=f'Extra {index}', creator=self.teacher)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/notifications/rooms/')
+        self.assertEqual(response.data['count'], 8)
+        physics = next(room for room in response.data['results'] if room['id'] == self.room.id)
+        self.assertEqual(physics['participant_count'], 2)
+        self.assertTrue(physics['is_participant'])
+
+
+class ChatArchiveTests(ChatRoomTestMixin, TestCase):
+    """Test cases for archiving old chat history."""
+
+    def create_old_message(self, text, days_ago):
+        message = ChatMessage.objects.create(room=self.room, user=self.teacher, message=text)
+        ChatMessage.objects.filter(id=message.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return message
+
+    def test_history_pages_from_hot_table_into_archive(self):
+        """Old messages move to segments and history reads them after the hot window."""
+        old = [self.create_old_message(f'Old {i}', 400 - i) for i in range(3)]
+        recent = ChatMessage.objects.create(room=self.room, user=self.teacher, message='Recent')
+        MessageReaction.objects.create(message=old[2], user=self.student, emoji='👍')
+
+        archived = archive_room_messages(self.room)
+
+        self.assertEqual(archived, 3)
+        self.assertFalse(ChatMessage.objects.filter(id__in=[m.id for m in old]).exists())
+        self.assertTrue(ChatArchiveSegment.objects.filter(room=self.room).exists())
+
+        self.client.force_authenticate(self.student)
+        first_page = self.client.get(self.room_url('history'), {'limit': 3}).data
+        self.assertEqual([m['id'] for m in first_page['results']], [old[1].id, old[2].id, recent.id])
+        self.assertTrue(first_page['has_more'])
+        self.assertEqual(first_page['results'][1]['reactions'], {'👍': [self.student.id]})
+        self.assertTrue(first_page['results'][1]['is_archived'])
+
+        second_page = self.client.get(
+            self.room_url('history'), {'limit': 3, 'before_id': first_page['next_before_id']}
+        ).data
+        self.assertEqual([m['id'] for m in second_page['results']], [self.message.id, old[0].id])
+        self.assertFalse(second_page['has_more'])
+
+    def test_reply_targets_of_hot_messages_stay_hot(self):
+        """Messages that recent replies point at are not archived."""
+        old = self.create_old_message('Question', 400)
+        ChatMessage.objects.create(room=self.room, user=self.student, message='Answer', reply_to=old)
+
+        self.assertEqual(archive_room_messages(self.room), 0)
+
+    def test_messages_endpoints_include_archived_history(self):
+        """A full conversation load merges archived segments with the hot messages."""
+        old = self.create_old_message('Old', 400)
+        private_chat = PrivateChatRoom.objects.create(public_room=self.room, user1=self.teacher, user2=self.student)
+        old_private = PrivateMessage.objects.create(private_chat=private_chat, sender=self.teacher, message='Old hi')
+        PrivateMessage.objects.filter(id=old_private.id).update(created_at=timezone.now() - timedelta(days=400))
+        recent_private = PrivateMessage.objects.create(private_chat=private_chat, sender=self.teacher, message='Hi')
+        archive_room_messages(self.room)
+        archive_private_chat_messages(private_chat)
+        self.client.force_authenticate(self.student)
+
+        response = self.client.get(self.room_url('messages'))
+        self.assertEqual([m['id'] for m in response.data], [self.message.id, old.id])
+        self.assertTrue(response.data[1]['is_archived'])
+        response = self.client.get(self.room_url('messages'), {'after_id': self.message.id})
+        self.assertEqual([m['id'] for m in response.data], [])
+
+        response = self.client.get(f'/api/notifications/private-chats/{private_chat.id}/messages/')
+        self.assertEqual([m['id'] for m in response.data], [old_private.id, recent_private.id])
+
+    def test_replies_in_later_batches_keep_their_target(self):
+        """A reply archived after the batch holding its target still links to it."""
+        question = self.create_old_message('Question', 400)
+        answer = self.create_old_message('Answer', 399)
+        ChatMessage.objects.filter(id=answer.id).update(reply_to=question)
+
+        self.assertEqual(archive_room_messages(self.room, batch_size=1), 2)
+
+        records = {
+            record['id']: record
+            for segment in ChatArchiveSegment.objects.filter(room=self.room)
+            for record in decode_records(segment.data)
+        }
+        self.assertEqual(records[answer.id]['reply_to'], question.id)
+        self.assertEqual(records[answer.id]['reply_to_data']['message'], 'Question')
+
+    def test_attachment_messages_stay_hot(self):
+        """Messages with files are not archived, so their attachment URLs keep working."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with self.settings(MEDIA_ROOT=media_root):
+            message = ChatMessage.objects.create(
+                room=self.room, user=self.teacher, message_type='file',
+                file_attachment=SimpleUploadedFile('notes.txt', b'old notes')
+            )
+            ChatMessage.objects.filter(id=message.id).update(created_at=timezone.now() - timedelta(days=400))
+            self.create_old_message('Old text', 400)
+
+            self.assertEqual(archive_room_messages(self.room), 1)
+
+            self.client.force_authenticate(self.student)
+            response = self.client.get(self.room_url(f'attachments/{message.id}'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'old notes')
+
+
+@override_settings(CHAT_TEARDOWN_ASYNC=False)
+class RoomTeardownTests(ChatRoomTestMixin, TestCase):
+    """Test cases for ending a meeting and tearing the room down."""
+
+    def test_teardown_deletes_files_of_archived_messages(self):
+        """Files referenced from archive segments are removed with the room."""
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with self.settings(MEDIA_ROOT=media_root):
+            message = ChatMessage.objects.create(
+                room=self.room, user=self.teacher, message_type='file',
+                file_attachment=SimpleUploadedFile('notes.txt', b'old notes')
+            )
+            storage = message.file_attachment.storage
+            name = message.file_attachment.name
+            # A segment written before attachment messages were kept hot
+            ChatArchiveSegment.objects.create(
+                room=self.room, period=date(2025, 1, 1), message_count=1,
+                first_message_id=message.id, last_message_id=message.id,
+                data=encode_records([{'id': message.id, 'file_attachment': message.file_attachment.url}])
+            )
+            ChatMessage.objects.filter(id=message.id).delete()
+
+            self.client.force_authenticate(self.teacher)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.room_url('end_meeting'))
+
+            self.assertFalse(storage.exists(name))
+            self.assertFalse(ChatArchiveSegment.objects.exists())
+
+    def test_end_meeting_hides_room_then_deletes_in_batches(self):
+        """The room is hidden at once and its contents are deleted after commit."""
+        for i in range(5):
+            ChatMessage.objects.create(room=self.room, user=self.student, message=f'Note {i}')
+        private_chat = PrivateChatRoom.objects.create(public_room=self.room, user1=self.teacher, user2=self.student)
+        PrivateMessage.objects.create(private_chat=private_chat, sender=self.student, message='Hi')
+        self.client.force_authenticate(self.teacher)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(self.room_url('end_meeting'))
+
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(ChatRoom.objects.get(id=self.room.id).is_active)
+        self.assertEqual(self.client.get(self.room_url('messages')).status_code, 404)
+
+        with self.settings(CHAT_TEARDOWN_BATCH_SIZE=2):
+            for callback in callbacks:
+                callback()
+
+        self.assertFalse(ChatRoom.objects.filter(id=self.room.id).exists())
+        self.assertFalse(ChatMessage.objects.filter(room_id=self.room.id).exists())
+        self.assertFalse(PrivateMessage.objects.exists())
+        self.assertEqual(Notification.objects.filter(recipient=self.student).count(), 1)
+
+        progress = self.client.get(self.room_url('teardown_status')).data
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['deleted']['messages'], 6)
+        self.assertEqual(progress['deleted']['private_messages'], 1)
+
+    def test_resume_only_touches_rooms_whose_teardown_started(self):
+        """Rooms deactivated for other reasons survive resume_room_teardowns."""
+        closed = ChatRoom.objects.create(name='Closed for the holidays', creator=self.teacher, is_active=False)
+        ChatRoom.objects.filter(id=self.room.id).update(is_active=False, teardown_started_at=timezone.now())
+
+        call_command('resume_room_teardowns', stdout=io.StringIO())
+
+        self.assertFalse(ChatRoom.objects.filter(id=self.room.id).exists())
+        self.assertTrue(ChatRoom.objects.filter(id=closed.id).exists())
+
+    def test_only_host_can_view_teardown_status(self):
+        """Teardown progress is reported to the host who ended the meeting."""
+        self.client.force_authenticate(self.teacher)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.room_url('end_meeting'))
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.client.get(self.room_url('teardown_status')).status_code, 404)
+
+
+class PresenceRegistryTests(SimpleTestCase):
+    """Test cases for the in-memory presence and typing registry."""
+
+    def setUp(self):
+        self.registry = PresenceRegistry(ttl=30, typing_interval=2)
+
+    def test_user_is_online_until_last_connection_leaves(self):
+        """Presence changes are reported only for the first and last connection."""
+        self.assertTrue(self.registry.connect(1, 7, 'student', 'tab-1', now=0))
+        self.assertFalse(self.registry.connect(1, 7, 'student', 'tab-2', now=0))
+
+        self.assertFalse(self.registry.disconnect(1, 7, 'tab-1'))
+        self.assertEqual(self.registry.online(1), [{'id': 7, 'username': 'student'}])
+        self.assertTrue(self.registry.disconnect(1, 7, 'tab-2'))
+        self.assertEqual(self.registry.online(1), [])
+
+    def test_connections_expire_without_heartbeat(self):
+        """Connections that stop sending heartbeats expire after the TTL."""
+        self.registry.connect(1, 7, 'student', 'tab-1', now=0)
+        self.registry.connect(1, 8, 'teacher', 'tab-2', now=0)
+        self.registry.heartbeat(1, 8, 'tab-2', now=20)
+
+        self.assertEqual(self.registry.expire(now=40), {1: [7]})
+        self.assertEqual(self.registry.online(1), [{'id': 8, 'username': 'teacher'}])
+        self.assertFalse(self.registry.heartbeat(1, 7, 'tab-1', now=41))
+
+    def test_typing_events_are_rate_limited(self):
+        """Typing events go out at most once per interval unless typing stops."""
+        self.assertTrue(self.registry.should_send_typing(1, 7, now=0))
+        self.assertFalse(self.registry.should_send_typing(1, 7, now=1))
+        self.assertTrue(self.registry.should_send_typing(1, 7, now=2.5))
+
+        self.registry.clear_typing(1, 7)
+        self.assertTrue(self.registry.should_send_typing(1, 7, now=3))
+
+
+class MentionTests(ChatRoomTestMixin, TestCase):
+    """Test cases for @mention notifications in chat rooms."""
+
+    def test_extract_mentions_ignores_emails_and_punctuation(self):
+        """Usernames are lowercased, deduplicated and stripped of trailing punctuation."""
+        self.assertEqual(
+            extract_mentions('Hi @Student, mail me@example.com or ping @student. @teacher!'),
+            ['student', 'teacher']
+        )
+
+    def test_send_message_notifies_mentioned_participants_only(self):
+        """Only room members other than the author are notified."""
+        outsider = User.objects.create_user(username='outsider', email='o@test.com', password='testpass123')
+        self.client.force_authenticate(self.teacher)
+
+        response = self.client.post(
+            self.room_url('send_message'), {'message': '@student @outsider @teacher see the notes'}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        notification = Notification.objects.get(recipient=self.student)
+        self.assertEqual(notification.verb, 'mentioned you in')
+        self.assertEqual(notification.data['message_id'], response.data['id'])
+        self.assertFalse(Notification.objects.filter(recipient__in=[outsider, self.teacher]).exists())
+
+    def test_new_participant_can_be_mentioned(self):
+        """Joining a room refreshes the cached username index."""
+        self.client.force_authenticate(self.student)
+        self.client.post(self.room_url('send_message'), {'message': 'hello @newcomer'}, format='json')
+
+        newcomer = User.objects.create_user(username='newcomer', email='n@test.com', password='testpass123')
+        admit_participant(self.room, newcomer)
+        self.client.post(self.room_url('send_reply'), {'message': 'welcome @newcomer'}, format='json')
+
+        self.assertEqual(Notification.objects.filter(recipient=newcomer).count(), 1)
+
+
+@override_settings(CHAT_FLOOD_CONTROL={
+    'message': {'capacity': 2, 'refill_rate': 1.0},
+    'reaction': {'capacity': 1, 'refill_rate': 1.0},
+})
+class FloodControlTests(ChatRoomTestMixin, TestCase):
+    """Test cases for per-user, per-room flood control."""
+
+    def test_bucket_refills_over_time(self):
+        """A drained bucket allows another message once a token has refilled."""
+        self.assertEqual(consume_token('message', 1, 7, now=100), (True, 0))
+        self.assertEqual(consume_token('message', 1, 7, now=100), (True, 0))
+        self.assertEqual(consume_token('message', 1, 7, now=100.25), (False, 0.75))
+        self.assertEqual(consume_token('message', 1, 7, now=101), (True, 0))
+
+    def test_parallel_requests_cannot_spend_the_same_token(self):
+        """Concurrent consumers of one bucket never get more tokens than it holds."""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: consume_token('message', 1, 8, now=100)[0], range(8)))
+
+        self.assertEqual(results.count(True), 2)
+
+    def test_send_message_returns_429_with_retry_after(self):
+        """Bursting past the bucket is rejected without creating a message."""
+        self.client.force_authenticate(self.student)
+        for _ in range(2):
+            self.client.post(self.room_url('send_message'), {'message': 'spam'}, format='json')
+
+        response = self.client.post(self.room_url('send_message'), {'message': 'spam'}, format='json')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(ChatMessage.objects.filter(user=self.student).count(), 2)
+
+    def test_buckets_are_per_room_and_action(self):
+        """Posting in one room does not use up reactions or another room's bucket."""
+        self.client.force_authenticate(self.student)
+        for _ in range(3):
+            self.client.post(self.room_url('send_message'), {'message': 'spam'}, format='json')
+
+        reaction = self.client.post(self.room_url(f'add-reaction/{self.message.id}'), {'emoji': '👍'}, format='json')
+        self.assertEqual(reaction.status_code, 200)
+        self.assertTrue(consume_token('message', self.room.id + 1, self.student.id)[0])
+
+
+class TranscriptExportTests(ChatRoomTestMixin, TestCase):
+    """Test cases for streaming transcript export."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+    def export(self, **params):
+        response = self.client.get(self.room_url('export'), params)
+        return response, b''.join(response.streaming_content)
+
+    def test_jsonl_export_merges_archived_and_hot_messages(self):
+        """Archived and hot messages are exported together in id order."""
+        old = ChatMessage.objects.create(room=self.room, user=self.student, message='Old question')
+        ChatMessage.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=400))
+        archive_room_messages(self.room)
+        ChatMessage.objects.create(room=self.room, user=self.student, message='Secret', is_private=True)
+        self.client.force_authenticate(self.teacher)
+
+        response, content = self.export(export_format='jsonl')
+
+        self.assertEqual(response.status_code, 200)
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual([row['message'] for row in rows], ['Welcome', 'Old question'])
+        self.assertEqual(rows[1]['username'], 'student')
+
+    def test_csv_export_has_header(self):
+        """CSV exports start with a header row."""
+        self.client.force_authenticate(self.teacher)
+
+        response, content = self.export(export_format='csv')
+
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertTrue(content.decode().startswith('id,created_at,user_id,username'))
+
+    def test_zip_export_includes_attachments(self):
+        """Attachments are streamed into the zip next to the transcript."""
+        with self.settings(MEDIA_ROOT=self.media_root):
+            ChatMessage.objects.create(
+                room=self.room, user=self.teacher, message='Notes', message_type='file',
+                file_attachment=SimpleUploadedFile('notes.txt', b'chapter one'), original_filename='notes.txt'
+            )
+            self.client.force_authenticate(self.teacher)
+
+            response, content = self.export(export_format='txt', attachments='true')
+
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        names = archive.namelist()
+        self.assertIn('transcript.txt', names)
+        attachment = next(name for name in names if name.startswith('attachments/'))
+        self.assertEqual(archive.read(attachment), b'chapter one')
+        self.assertIn('[attachment: notes.txt]', archive.read('transcript.txt').decode())
+
+    def test_only_host_can_export(self):
+        """Participants who are not hosts cannot export the transcript."""
+        self.client.force_authenticate(self.student)
+
+        self.assertEqual(self.client.get(self.room_url('export')).status_code, 403)
+
+
+class BulkJoinRequestTests(ChatRoomTestMixin, TestCase):
+    """Test cases for approving and denying join requests in bulk."""
+
+    def setUp(self):
+        super().setUp()
+        self.room.auto_approve = False
+        self.room.max_participants = 5
+        self.room.save()
+        self.requests = [
+            JoinRequest.objects.create(
+                room=self.room,
+                user=User.objects.create_user(username=f'applicant{i}', email=f'a{i}@test.com', password='testpass123')
+            )
+            for i in range(3)
+        ]
+        self.client.force_authenticate(self.teacher)
+
+    def test_approve_all_pending(self):
+        """Every pending request is approved with one notification each."""
+        response = self.client.post(self.room_url('bulk_approve_requests'), {'all_pending': True}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['approved']), 3)
+        self.assertEqual(RoomParticipant.objects.filter(room=self.room, is_active=True).count(), 5)
+        self.assertFalse(JoinRequest.objects.filter(room=self.room, status='pending').exists())
+        self.assertEqual(Notification.objects.filter(data__action_type='request_approved').count(), 3)
+
+    def test_approve_rejects_batch_over_capacity(self):
+        """A batch that does not fit is rejected as a whole."""
+        self.room.max_participants = 4
+        self.room.save()
+
+        response = self.client.post(self.room_url('bulk_approve_requests'), {'all_pending': True}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['available_slots'], 2)
+        self.assertEqual(JoinRequest.objects.filter(room=self.room, status='pending').count(), 3)
+
+    def test_approve_reactivates_previous_participant(self):
+        """A user who left earlier is reactivated instead of inserted twice."""
+        applicant = self.requests[0].user
+        RoomParticipant.objects.create(room=self.room, user=applicant, is_active=False)
+        self.client.force_authenticate(applicant)
+        self.assertEqual(self.client.get(self.room_url('messages')).status_code, 403)
+        self.client.force_authenticate(self.teacher)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.room_url('bulk_approve_requests'), {'request_ids': [self.requests[0].id]}, format='json')
+
+        self.client.force_authenticate(applicant)
+        self.assertEqual(self.client.get(self.room_url('messages')).status_code, 200)
+
+    def test_deny_selected_requests(self):
+        """Only the selected requests are denied; unknown ids are reported as skipped."""
+        response = self.client.post(
+            self.room_url('bulk_deny_requests'),
+            {'request_ids': [self.requests[0].id, self.requests[1].id, 999], 'reason': 'Class is full'},
+            format='json'
+        )
+
+        self.assertEqual(len(response.data['denied']), 2)
+        self.assertEqual(response.data['skipped'], [999])
+        self.assertEqual(JoinRequest.objects.get(id=self.requests[2].id).status, 'pending')
+        self.assertEqual(Notification.objects.filter(data__reason='Class is full').count(), 2)
+
+
+class RoomAdmissionTests(ChatRoomTestMixin, TestCase):
+    """Test cases for counter-based room admission."""
+
+    def test_join_leave_and_rejoin_keep_counter_in_step(self):
+        """Joining, leaving and rejoining move the participant counter by one each."""
+        newcomer = User.objects.create_user(username='newcomer', password='testpass123')
+        self.client.force_authenticate(newcomer)
+
+        self.assertEqual(self.client.post(self.room_url('join')).status_code, 200)
+        self.assertEqual(self.client.post(self.room_url('join')).status_code, 400)
+        self.assertEqual(ChatRoom.objects.get(id=self.room.id).participant_total, 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.room_url('leave_room'))
+        self.assertEqual(ChatRoom.objects.get(id=self.room.id).participant_total, 2)
+        self.assertEqual(self.client.post(self.room_url('join')).status_code, 200)
+        self.assertEqual(ChatRoom.objects.get(id=self.room.id).participant_total, 3)
+
+    def test_full_room_refuses_admission(self):
+        """The compare-and-increment refuses once max_participants is reached."""
+        ChatRoom.objects.filter(id=self.room.id).update(max_participants=2)
+        newcomer = User.objects.create_user(username='newcomer', password='testpass123')
+
+        with self.assertRaises(RoomCapacityError):
+            admit_participant(self.room, newcomer)
+        self.assertFalse(RoomParticipant.objects.filter(room=self.room, user=newcomer).exists())
+
+        release_participant(self.room, self.student.id)
+        admit_participant(self.room, newcomer)
+        self.assertEqual(ChatRoom.objects.get(id=self.room.id).participant_total, 2)
+
+
+class ConcurrentAdmissionTests(ChatRoomTestMixin, TransactionTestCase):
+    """Test that simultaneous joins never overfill a room."""
+
+    def admit(self, user):
+        try:
+            while True:
+                try:
+                    admit_participant(self.room, user)
+                    return True
+                except RoomCapacityError:
+                    return False
+                except OperationalError:
+                    # SQLite reports lock contention instead of waiting; retry like a busy timeout would
+                    time.sleep(0.001)
+        finally:
+            connection.close()
+
+    def test_hundreds_of_simultaneous_joins(self):
+        """Exactly the remaining places are handed out under concurrent joins."""
+        ChatRoom.objects.filter(id=self.room.id).update(max_participants=50)
+        User.objects.bulk_create([User(username=f'joiner{index}', email=f'joiner{index}@test.com') for index in range(300)])
+        joiners = list(User.objects.filter(username__startswith='joiner'))
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            results = list(executor.map(self.admit, joiners))
+
+        room = ChatRoom.objects.get(id=self.room.id)
+        self.assertEqual(results.count(True), 48)
+        self.assertEqual(room.participant_total, 50)
+        self.assertEqual(RoomParticipant.objects.filter(room=room, is_active=True).count(), 50)
+
+
+def make_wav(seconds, rate=8000, declared_seconds=None):
+    """Build a mono 8-bit WAV; declared_seconds sets the data size written in the header."""
+    data_size = int(rate * (declared_seconds or seconds))
+    header = b'RIFF' + struct.pack('<I', 36 + data_size) + b'WAVE'
+    header += b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, rate, rate, 1, 8)
+    return header + b'data' + struct.pack('<I', data_size) + b'\x80' * int(rate * seconds)
+
+
+class MediaProbeTests(ChatRoomTestMixin, TestCase):
+    """Test cases for server-side probing of chat attachments."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_authenticate(self.student)
+
+    def test_voice_duration_comes_from_audio_headers(self):
+        """The client's duration is replaced by the one read from the file."""
+        audio = SimpleUploadedFile('note.wav', make_wav(2), content_type='audio/wav')
+
+        response = self.client.post(self.room_url('send_voice_message'), {'audio': audio, 'duration': 170})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['duration'], 2)
+        self.assertEqual(response.data['mime_type'], 'audio/wav')
+
+    def test_voice_over_limit_by_headers_is_rejected(self):
+        """A recording whose headers say it is over three minutes is refused."""
+        audio = SimpleUploadedFile('long.wav', make_wav(1, declared_seconds=181), content_type='audio/wav')
+
+        response = self.client.post(self.room_url('send_voice_message'), {'audio': audio, 'duration': 10})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ChatMessage.objects.filter(message_type='voice').exists())
+
+    def test_attachment_download_supports_range_and_etag(self):
+        """Attachments are served to members with Range and revalidation support."""
+        audio = SimpleUploadedFile('note.wav', make_wav(2), content_type='audio/wav')
+        message_id = self.client.post(self.room_url('send_voice_message'), {'audio': audio}).data['id']
+        url = self.room_url(f'attachments/{message_id}')
+
+        partial = self.client.get(url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(b''.join(partial.streaming_content), b'RIFF')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=partial['ETag']).status_code, 304)
+
+        outsider = User.objects.create_user(username='outsider', password='testpass123')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_image_is_classified_and_measured(self):
+        """An image sent as a document is stored as media with its dimensions."""
+        image = io.BytesIO()
+        Image.new('RGB', (64, 48)).save(image, 'PNG')
+        upload = SimpleUploadedFile('photo.bin', image.getvalue(), content_type='application/octet-stream')
+
+        response = self.client.post(self.room_url('send_file_message'), {'file': upload, 'file_type': 'document'})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['file_type'], 'media')
+        self.assertEqual(response.data['mime_type'], 'image/png')
+        self.assertEqual((response.data['media_width'], response.data['media_height']), (64, 48))
+
+    @override_settings(THUMBNAILS_ASYNC=False, THUMBNAIL_WORKERS=0)
+    def test_image_thumbnails_are_served_to_members(self):
+        """Image attachments get thumbnails behind the same membership check as the file."""
+        image = io.BytesIO()
+        Image.new('RGB', (640, 480)).save(image, 'PNG')
+        upload = SimpleUploadedFile('board.png', image.getvalue(), content_type='image/png')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            message_id = self.client.post(self.room_url('send_file_message'), {'file': upload}).data['id']
+        data = self.client.get(self.room_url('messages')).data
+        thumbnails = next(message for message in data if message['id'] == message_id)['thumbnails']
+        self.assertEqual(set(thumbnails), {'small', 'medium'})
+
+        response = self.client.get(thumbnails['small'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as thumbnail:
+            self.assertEqual(thumbnail.size, (160, 120))
+
+        outsider = User.objects.create_user(username='outsider', password='testpass123')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(thumbnails['small']).status_code, 403)
+
+
+class ChunkedUploadTests(ChatRoomTestMixin, TestCase):
+    """Test cases for resumable chunked chat uploads."""
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.upload_dir, ignore_errors=True)
+        settings_override = self.settings(MEDIA_ROOT=self.media_root, CHUNKED_UPLOAD_DIR=self.upload_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_authenticate(self.student)
+
+    def put_chunk(self, upload_id, data, offset):
+        return self.client.put(
+            self.room_url(f'uploads/{upload_id}'), data=data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunks_resume_at_server_offset_and_finalize_into_message(self):
+        """Chunks must arrive at the acknowledged offset; finalize creates the file message."""
+        start = self.client.post(
+            self.room_url('uploads'), {'filename': 'essay.txt', 'total_size': 10, 'file_type': 'document'}, format='json'
+        )
+        self.assertEqual(start.status_code, 201)
+        upload_id = start.data['upload_id']
+
+        self.assertEqual(self.put_chunk(upload_id, b'hello', 0).data['offset'], 5)
+        retry = self.put_chunk(upload_id, b'hello', 0)
+        self.assertEqual(retry.status_code, 409)
+        self.assertEqual(retry.data['offset'], 5)
+        self.assertEqual(self.client.get(self.room_url(f'uploads/{upload_id}')).data['offset'], 5)
+
+        early = self.client.post(self.room_url(f'uploads/{upload_id}/finalize'))
+        self.assertEqual(early.status_code, 409)
+
+        self.put_chunk(upload_id, b'world', 5)
+        response = self.client.post(self.room_url(f'uploads/{upload_id}/finalize'))
+
+        self.assertEqual(response.status_code, 201)
+        message = ChatMessage.objects.get(id=response.data['id'])
+        self.assertEqual(message.message_type, 'file')
+        self.assertEqual(message.original_filename, 'essay.txt')
+        self.assertTrue(message.file_attachment.name.startswith('chat_files/'))
+        self.assertEqual(message.file_attachment.read(), b'helloworld')
+        self.assertFalse(ChatUploadSession.objects.exists())
+
+    def test_empty_chunk_is_rejected(self):
+        """A PUT without a body is a bad request, not a server error."""
+        upload_id = self.client.post(
+            self.room_url('uploads'), {'filename': 'essay.txt', 'total_size': 5}, format='json'
+        ).data['upload_id']
+
+        self.assertEqual(self.put_chunk(upload_id, b'', 0).status_code, 400)
+        self.assertEqual(self.client.get(self.room_url(f'uploads/{upload_id}')).data['offset'], 0)
+
+    def test_finalize_retry_does_not_create_a_second_message(self):
+        """A finalize that loses the race finds the session gone instead of posting again."""
+        upload_id = self.client.post(
+            self.room_url('uploads'), {'filename': 'essay.txt', 'total_size': 5}, format='json'
+        ).data['upload_id']
+        self.put_chunk(upload_id, b'hello', 0)
+        stale_session = ChatUploadSession.objects.get(id=upload_id)
+
+        self.assertEqual(self.client.post(self.room_url(f'uploads/{upload_id}/finalize')).status_code, 201)
+        with self.assertRaises(UploadSessionGone):
+            finalize_upload(stale_session)
+        self.assertEqual(ChatMessage.objects.filter(message_type='file').count(), 1)
+
+    def test_blocked_type_is_refused_when_finalized(self):
+        """An executable sent in chunks is refused with 415 like a multipart upload."""
+        executable = b'\x7fELF\x02\x01\x01' + bytes(64)
+        upload_id = self.client.post(
+            self.room_url('uploads'), {'filename': 'notes.txt', 'total_size': len(executable)}, format='json'
+        ).data['upload_id']
+        self.put_chunk(upload_id, executable, 0)
+
+        response = self.client.post(self.room_url(f'uploads/{upload_id}/finalize'))
+
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(ChatUploadSession.objects.exists())
+        self.assertFalse(ChatMessage.objects.filter(message_type='file').exists())
+
+    def test_chunk_past_declared_size_is_rejected(self):
+        """A chunk cannot grow the upload beyond its declared size."""
+        upload_id = self.client.post(
+            self.room_url('uploads'), {'kind': 'voice', 'filename': 'note.webm', 'total_size': 4}, format='json'
+        ).data['upload_id']
+
+        response = self.put_chunk(upload_id, b'too long', 0)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.get(self.room_url(f'uploads/{upload_id}')).data['offset'], 0)
+
+    def test_other_users_cannot_use_a_session(self):
+        """Upload sessions belong to the user who opened them."""
+        upload_id = self.client.post(
+            self.room_url('uploads'), {'filename': 'a.txt', 'total_size': 1}, format='json'
+        ).data['upload_id']
+        self.client.force_authenticate(self.teacher)
+
+        self.assertEqual(self.put_chunk(upload_id, b'a', 0).status_code, 404)
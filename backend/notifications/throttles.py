@@ -0,0 +1,109 @@
+"""
+Token-bucket flood control for chat rooms.
+Each (user, room, bucket) pair holds a bucket in the shared cache that refills
+at a steady rate, allowing short bursts while capping sustained posting.
+Used by the chat REST actions (as a DRF throttle) and the chat room websocket.
+
+A bucket is read and written under a short lock taken with cache.add (atomic
+on every backend), so two sockets posting at once cannot spend the same
+token. The limit spans worker processes only when CACHES points at a shared
+backend such as Redis; with the default LocMemCache each process keeps its own
+buckets.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+LOCK_TIMEOUT = 1  # seconds a crashed holder can keep a bucket locked
+LOCK_WAIT = 0.05  # seconds to wait for a bucket held by a concurrent request
+LOCK_POLL_INTERVAL = 0.005
+
+DEFAULT_FLOOD_CONTROL = {
+    # capacity: burst size; refill_rate: tokens regained per second
+    'message': {'capacity': 10, 'refill_rate': 0.5},
+    'reaction': {'capacity': 20, 'refill_rate': 2.0},
+}
+
+
+def get_bucket_config(bucket):
+    """Get the capacity and refill rate for a bucket from CHAT_FLOOD_CONTROL."""
+    config = getattr(settings, 'CHAT_FLOOD_CONTROL', DEFAULT_FLOOD_CONTROL)
+    return config.get(bucket) or DEFAULT_FLOOD_CONTROL[bucket]
+
+
+def get_bucket_cache_key(bucket, room_id, user_id):
+    """Get the cache key holding a user's bucket in a room."""
+    return f'chat_flood_{bucket}_{room_id}_{user_id}'
+
+
+def _acquire_bucket_lock(lock_key):
+    """Take a bucket's lock, waiting up to LOCK_WAIT; returns False if it stays held."""
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(LOCK_POLL_INTERVAL)
+    return True
+
+
+def consume_token(bucket, room_id, user_id, now=None):
+    """
+    Take one token from a user's bucket in a room.
+
+    Returns:
+        Tuple of (allowed, retry_after seconds; 0 when allowed)
+    """
+    config = get_bucket_config(bucket)
+    capacity = config['capacity']
+    refill_rate = config['refill_rate']
+
+    cache_key = get_bucket_cache_key(bucket, room_id, user_id)
+    lock_key = f'{cache_key}_lock'
+    if not _acquire_bucket_lock(lock_key):
+        # Only a burst of simultaneous requests from one user keeps the lock busy
+        return False, 1 / refill_rate
+
+    try:
+        if now is None:
+            now = time.time()
+        tokens, updated_at = cache.get(cache_key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated_at) * refill_rate)
+
+        # Expire the bucket once it would be full again; a missing bucket is a full one
+        timeout = int((capacity - tokens + 1) / refill_rate) + 1
+
+        if tokens < 1:
+            cache.set(cache_key, (tokens, now), timeout)
+            return False, (1 - tokens) / refill_rate
+
+        cache.set(cache_key, (tokens - 1, now), timeout)
+        return True, 0
+    finally:
+        cache.delete(lock_key)
+
+
+class RoomMessageThrottle(BaseThrottle):
+    """
+    Flood control for posting messages and replies, per user and room.
+    DRF answers throttled requests with 429 and a Retry-After header.
+    """
+    bucket = 'message'
+
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+
+        allowed, self.retry_after = consume_token(self.bucket, view.kwargs.get('pk'), request.user.id)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class RoomReactionThrottle(RoomMessageThrottle):
+    """Flood control for adding reactions, per user and room."""
+    bucket = 'reaction'
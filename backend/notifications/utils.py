@@ -164,6 +164,46 @@ class NotificationManager:
             }
         )
     
+    @staticmethod
+    def notify_users_mentioned(user_ids, mentioned_by, context_object, context_type):
+        """
+        Create mention notifications for several users in one bulk insert.
+        
+        Args:
+            user_ids: IDs of the users who were mentioned
+            mentioned_by: User who mentioned them
+            context_object: Object where mention occurred
+            context_type: Type of context (chat, forum, etc.)
+        
+        Returns:
+            List of Notification instances
+        """
+        content_type = ContentType.objects.get_for_model(context_object)
+        data = {
+            'context_type': context_type,
+            'mentioned_by': mentioned_by.username
+        }
+        if context_type == 'chat':
+            data.update({
+                'room_id': context_object.room_id,
+                'room_name': context_object.room.name,
+                'message_id': context_object.id,
+                'message': context_object.message[:200],
+            })
+        
+        return Notification.objects.bulk_create([
+            Notification(
+                recipient_id=user_id,
+                actor=mentioned_by,
+                verb="mentioned you in",
+                content_type=content_type,
+                object_id=context_object.pk,
+                notification_type=context_type,
+                data=data
+            )
+            for user_id in user_ids
+        ])
+    
     @staticmethod
     def notify_system_message(recipient, message, data=None):
         """
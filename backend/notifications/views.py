@@ -34,7 +34,9 @@ from .permissions import (
     CanViewNotificationHistory,
     CanExportNotifications,
     CanManageNotificationSettings,
-    IsNotificationSystemOrAdmin
+    IsNotificationSystemOrAdmin,
+    IsRoomMember,
+    IsRoomHost
 )
 
 
@@ -637,7 +639,40 @@ def notification_mark_recent_as_read(request):
 # CHAT ROOM VIEWS
 # ============================================================================
 
-from .models import ChatRoom, RoomParticipant, JoinRequest, ChatMessage, PrivateChatRoom, PrivateMessage
+import mimetypes
+import os
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import PermissionDenied
+from .models import ChatRoom, RoomParticipant, JoinRequest, ChatMessage, MessageReaction, PrivateChatRoom, PrivateMessage, ChatUploadSession
+from .membership import resolve_membership
+from .search_index import search_room_messages, search_private_messages, search_rooms, build_search_result
+from .activity import get_active_now_since
+from .archive import get_history_page, read_archived_records, DEFAULT_HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE
+from .websocket_service import send_reaction_delta_realtime
+from .teardown import start_room_teardown, get_teardown_progress
+from .presence import presence_registry
+from .mentions import notify_message_mentions
+from .throttles import RoomMessageThrottle, RoomReactionThrottle
+from .export import EXPORT_FORMATS, stream_transcript, stream_transcript_zip
+from .join_requests import approve_join_requests, deny_join_requests
+from .admission import (
+    RoomCapacityError, AlreadyParticipantError, admit_participant, release_participant
+)
+from .chunked_uploads import (
+    UploadRejected, validate_upload_request, describe_session, finalize_upload, notify_private_attachment,
+    resolve_probed_fields, build_message_fields
+)
+from core.media_probe import get_upload_probe
+from core.file_delivery import deliver_file
+from core.chunked_upload import (
+    ChunkError, UploadSessionGone, append_chunk, discard_staged_chunk, get_max_chunk_size, get_offset_from_request,
+    stage_chunk
+)
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
@@ -647,14 +682,32 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_role = serializers.CharField(source='user.role', read_only=True)
     reply_to_data = serializers.SerializerMethodField()
+    reactions = serializers.SerializerMethodField()
     reactions_formatted = serializers.SerializerMethodField()
+    attachment_url = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = ChatMessage
         fields = ['id', 'message', 'message_type', 'created_at', 'user_id', 'user_username', 'user_name', 'user_role', 
                  'is_edited', 'edited_at', 'reply_to', 'reply_to_data', 'is_private', 'reactions', 'reactions_formatted',
-                 'audio_file', 'duration', 'file_attachment', 'file_type', 'file_size', 'original_filename']
-        read_only_fields = ['id', 'created_at', 'user_id', 'user_username', 'user_name', 'user_role', 'reply_to_data', 'reactions_formatted']
+                 'audio_file', 'duration', 'file_attachment', 'file_type', 'file_size', 'original_filename',
+                 'mime_type', 'media_width', 'media_height', 'attachment_url', 'thumbnails']
+        read_only_fields = ['id', 'created_at', 'user_id', 'user_username', 'user_name', 'user_role', 'reply_to_data', 'reactions', 'reactions_formatted',
+                           'mime_type', 'media_width', 'media_height', 'attachment_url', 'thumbnails']
+    
+    def get_attachment_url(self, obj):
+        """Authorized download URL for the voice recording or file (supports Range requests)."""
+        if obj.attachment:
+            return f'/api/notifications/rooms/{obj.room_id}/attachments/{obj.id}/'
+        return None
+    
+    def get_thumbnails(self, obj):
+        """Authorized thumbnail URLs of an image attachment by size ({} until generated)."""
+        attachment_url = self.get_attachment_url(obj)
+        if not attachment_url or not obj.thumbnails:
+            return {}
+        return {size_name: f'{attachment_url}?thumbnail={size_name}' for size_name in obj.thumbnails}
     
     def get_reply_to_data(self, obj):
         """Get reply-to message data if this is a reply."""
@@ -670,20 +723,32 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             }
         return None
     
+    def _get_reaction_map(self, obj):
+        """
+        Group reaction rows by emoji as {emoji: [user_ids]}.
+        Uses prefetched message_reactions when available so a page of messages costs one query.
+        """
+        if not hasattr(obj, '_reaction_map'):
+            reaction_map = {}
+            for reaction in obj.message_reactions.all():
+                reaction_map.setdefault(reaction.emoji, []).append(reaction.user_id)
+            obj._reaction_map = reaction_map
+        return obj._reaction_map
+    
+    def get_reactions(self, obj):
+        """Get reactions as {emoji: [user_ids]}."""
+        return self._get_reaction_map(obj)
+    
     def get_reactions_formatted(self, obj):
         """Format reactions for frontend consumption."""
-        if not obj.reactions:
-            return []
-        
-        formatted = []
-        for emoji, user_ids in obj.reactions.items():
-            if user_ids:  # Only include reactions that have users
-                formatted.append({
-                    'emoji': emoji,
-                    'count': len(user_ids),
-                    'users': user_ids
-                })
-        return formatted
+        return [
+            {
+                'emoji': emoji,
+                'count': len(user_ids),
+                'users': user_ids
+            }
+            for emoji, user_ids in self._get_reaction_map(obj).items()
+        ]
 
 
 class PrivateMessageSerializer(serializers.ModelSerializer):
@@ -691,13 +756,22 @@ class PrivateMessageSerializer(serializers.ModelSerializer):
     sender_id = serializers.IntegerField(source='sender.id', read_only=True)
     sender_name = serializers.CharField(source='sender.get_full_name', read_only=True)
     sender_username = serializers.CharField(source='sender.username', read_only=True)
+    attachment_url = serializers.SerializerMethodField()
     
     class Meta:
         model = PrivateMessage
         fields = ['id', 'message', 'message_type', 'sender_id', 'sender_name', 'sender_username', 
                  'is_read', 'read_at', 'created_at', 'edited_at', 'is_edited', 'reactions',
-                 'audio_file', 'duration', 'file_attachment', 'file_type', 'file_size', 'original_filename']
-        read_only_fields = ['id', 'sender_id', 'sender_name', 'sender_username', 'created_at', 'read_at']
+                 'audio_file', 'duration', 'file_attachment', 'file_type', 'file_size', 'original_filename',
+                 'mime_type', 'media_width', 'media_height', 'attachment_url']
+        read_only_fields = ['id', 'sender_id', 'sender_name', 'sender_username', 'created_at', 'read_at',
+                           'mime_type', 'media_width', 'media_height', 'attachment_url']
+    
+    def get_attachment_url(self, obj):
+        """Authorized download URL for the voice recording or file (supports Range requests)."""
+        if obj.attachment:
+            return f'/api/notifications/private-chats/{obj.private_chat_id}/attachments/{obj.id}/'
+        return None
 
 
 class PrivateChatRoomSerializer(serializers.ModelSerializer):
@@ -741,7 +815,10 @@ class PrivateChatRoomSerializer(serializers.ModelSerializer):
 
 
 class ChatRoomSerializer(serializers.ModelSerializer):
-    """Serializer for chat rooms."""
+    """
+    Serializer for chat rooms.
+    Uses values annotated by the discovery list when present instead of querying per room.
+    """
     participant_count = serializers.ReadOnlyField()
     is_full = serializers.ReadOnlyField()
     creator_name = serializers.CharField(source='creator.get_full_name', read_only=True)
@@ -752,38 +829,281 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         model = ChatRoom
         fields = ['id', 'name', 'description', 'room_type', 'creator', 'creator_name', 
                  'created_at', 'is_active', 'auto_approve', 'max_participants', 
-                 'participant_count', 'is_full', 'is_participant', 'has_pending_request']
-        read_only_fields = ['id', 'creator', 'created_at']
+                 'participant_count', 'is_full', 'is_participant', 'has_pending_request',
+                 'activity_score', 'last_message_at']
+        read_only_fields = ['id', 'creator', 'created_at', 'activity_score', 'last_message_at']
     
     def get_is_participant(self, obj):
+        if hasattr(obj, 'user_is_participant'):
+            return obj.user_is_participant
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             return obj.participants.filter(user=request.user, is_active=True).exists()
         return False
     
     def get_has_pending_request(self, obj):
+        if hasattr(obj, 'pending_request_exists'):
+            return obj.pending_request_exists
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             return obj.join_requests.filter(user=request.user, status='pending').exists()
         return False
 
 
-class ChatRoomViewSet(viewsets.ModelViewSet):
+class MyChatRoomSerializer(ChatRoomSerializer):
+    """
+    Serializer for the current user's rooms with unread badges and last-message previews.
+    Reads values annotated by ChatRoomViewSet.my_rooms so a full dashboard costs one query.
+    """
+    last_read_message_id = serializers.IntegerField(read_only=True)
+    unread_count = serializers.IntegerField(read_only=True)
+    last_message = serializers.SerializerMethodField()
+    
+    class Meta(ChatRoomSerializer.Meta):
+        fields = ChatRoomSerializer.Meta.fields + ['last_read_message_id', 'unread_count', 'last_message']
+    
+    def get_is_participant(self, obj):
+        return True
+    
+    def get_last_message(self, obj):
+        """Get a preview of the latest message in the room."""
+        if obj.last_message_id is None:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'message': (obj.last_message_text or '')[:100],
+            'message_type': obj.last_message_type,
+            'username': obj.last_message_username or 'System',
+            'created_at': obj.last_message_created_at,
+        }
+
+
+def notify_mentions_safely(message):
+    """Notify users mentioned in a new room message without failing the send."""
+    try:
+        notify_message_mentions(message)
+    except Exception as e:
+        print(f"Error notifying mentions for message {message.id}: {e}")
+
+
+def attachment_response(request, message):
+    """
+    Serve a room or private message's voice recording or file.
+    Supports Range requests and revalidation against the attachment's content hash.
+    ?thumbnail=<size> serves a generated thumbnail of an image attachment instead.
+    """
+    attachment = message.attachment if message else None
+    if not attachment:
+        return Response({'detail': 'Attachment not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    size_name = request.query_params.get('thumbnail')
+    if size_name:
+        thumbnail = (getattr(message, 'thumbnails', None) or {}).get(size_name)
+        if not thumbnail:
+            return Response({'detail': 'Thumbnail not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            # Thumbnail names carry the content version, so they never change in place
+            return deliver_file(
+                request, FieldFile(message, attachment.field, thumbnail), os.path.basename(thumbnail),
+                'image/webp', as_attachment=False, last_modified=message.created_at
+            )
+        except FileNotFoundError:
+            return Response({'detail': 'Thumbnail not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        filename = message.original_filename or os.path.basename(attachment.name)
+        content_type = message.mime_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        return deliver_file(
+            request, attachment, filename, content_type,
+            # Voice notes and media play inline; documents download
+            as_attachment=message.message_type == 'file' and message.file_type != 'media',
+            content_hash=message.content_hash,
+            last_modified=message.created_at
+        )
+    except FileNotFoundError:
+        return Response({'detail': 'Attachment file not found on server.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+def get_history_params(request):
+    """Parse before_id/limit query parameters for history paging."""
+    before_id = request.query_params.get('before_id')
+    before_id = int(before_id) if before_id and before_id.isdigit() else None
+    
+    limit = request.query_params.get('limit')
+    limit = int(limit) if limit and limit.isdigit() else DEFAULT_HISTORY_PAGE_SIZE
+    return before_id, max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+
+class ChunkedUploadMixin:
+    """
+    Resumable chunked uploads of attachments and voice messages for a chat viewset.
+    POST uploads/ → open a session
+    GET uploads/<id>/ → current offset, PUT uploads/<id>/ → append a chunk at Upload-Offset
+    POST uploads/<id>/finalize/ → create the message
+    Viewsets implement get_upload_scope() to return the target room or private chat.
+    """
+    
+    def get_upload_scope(self):
+        raise NotImplementedError
+    
+    def serialize_uploaded_message(self, message):
+        raise NotImplementedError
+    
+    def get_upload_session(self, upload_id):
+        return ChatUploadSession.objects.filter(
+            id=upload_id,
+            user=self.request.user,
+            **self.get_upload_scope()
+        ).first()
+    
+    def upload_response(self, session, status_code=status.HTTP_200_OK):
+        response = Response(describe_session(session), status=status_code)
+        response['Upload-Offset'] = str(session.received_size)
+        return response
+    
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def start_upload(self, request, pk=None):
+        """Open a resumable upload session for a file or voice message."""
+        scope = self.get_upload_scope()
+        
+        fields, error = validate_upload_request(request.data)
+        if error:
+            return Response({'detail': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        session = ChatUploadSession.objects.create(user=request.user, **scope, **fields)
+        response = self.upload_response(session, status.HTTP_201_CREATED)
+        response['Upload-Chunk-Size'] = str(get_max_chunk_size())
+        return response
+    
+    @action(detail=True, methods=['get', 'put'], url_path='uploads/(?P<upload_id>[0-9a-f-]+)')
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """Report an upload's offset (GET) or append the raw request body as the next chunk (PUT)."""
+        session = self.get_upload_session(upload_id)
+        if session is None:
+            return Response({'detail': 'Upload session not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if request.method == 'GET':
+            return self.upload_response(session)
+        
+        offset = get_offset_from_request(request)
+        if offset is None:
+            return Response(
+                {'detail': 'Upload-Offset header (or offset parameter) is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # DRF gives no stream for an empty body (e.g. Content-Length: 0)
+        if request.stream is None:
+            return Response({'detail': 'Chunk body is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # Read the body before locking; only the offset check and append hold the lock
+            staged_path = stage_chunk(session.id, offset, session.received_size, session.total_size, request.stream)
+        except ChunkError as e:
+            return Response(
+                {'detail': str(e), 'offset': e.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            with transaction.atomic():
+                session = ChatUploadSession.objects.select_for_update().filter(id=session.id).first()
+                if session is None:
+                    return Response({'detail': 'Upload session not found.'}, status=status.HTTP_404_NOT_FOUND)
+                session.received_size = append_chunk(session.id, offset, session.received_size, staged_path)
+                session.save(update_fields=['received_size', 'updated_at'])
+        except ChunkError as e:
+            return Response(
+                {'detail': str(e), 'offset': e.offset},
+                status=status.HTTP_409_CONFLICT
+            )
+        finally:
+            discard_staged_chunk(staged_path)
+        
+        return self.upload_response(session)
+    
+    @action(detail=True, methods=['post'], url_path='uploads/(?P<upload_id>[0-9a-f-]+)/finalize')
+    def finalize_upload(self, request, pk=None, upload_id=None):
+        """Create the message from a fully received upload."""
+        session = self.get_upload_session(upload_id)
+        if session is None:
+            return Response({'detail': 'Upload session not found.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not session.is_complete:
+            return Response(
+                {'detail': 'Upload is not complete.', 'offset': session.received_size},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            message = finalize_upload(session)
+        except UploadSessionGone:
+            return Response({'detail': 'Upload session not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except UploadRejected as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.serialize_uploaded_message(message), status=status.HTTP_201_CREATED)
+
+
+class ChatRoomViewSet(ChunkedUploadMixin, viewsets.ModelViewSet):
     """ViewSet for chat rooms."""
     serializer_class = ChatRoomSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return ChatRoom.objects.filter(is_active=True)
+        queryset = ChatRoom.objects.filter(is_active=True)
+        if self.action == 'list':
+            queryset = self.filter_discovery(queryset)
+        return queryset
+    
+    def filter_discovery(self, queryset):
+        """
+        Search and rank rooms for the discovery list.
+        GET ?search=<terms>&sort=newest|active|active_now
+        Ranking reads the precomputed activity_score, and the per-room badges are annotated,
+        so listing never scans messages or counts rows per room.
+        """
+        user = self.request.user
+        params = self.request.query_params
+        
+        search = params.get('search', '').strip()
+        if search:
+            queryset = search_rooms(queryset, search)
+        
+        sort = params.get('sort', 'newest')
+        if sort == 'active_now':
+            queryset = queryset.filter(last_message_at__gte=get_active_now_since())
+        if sort in ('active', 'active_now'):
+            queryset = queryset.order_by('-activity_score', '-id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+        
+        return queryset.select_related('creator').annotate(
+            user_is_participant=Exists(
+                RoomParticipant.objects.filter(room=OuterRef('pk'), user=user, is_active=True)
+            ),
+            pending_request_exists=Exists(
+                JoinRequest.objects.filter(room=OuterRef('pk'), user=user, status='pending')
+            ),
+        )
+    
+    def get_membership(self, room):
+        """Resolve the current user's membership in a room (memoized per request)."""
+        return resolve_membership(room, self.request.user, self.request)
+    
+    def get_upload_scope(self):
+        """Uploads go to a room the user participates in."""
+        room = self.get_object()
+        if not self.get_membership(room).is_member:
+            raise PermissionDenied('You must be a participant in this room.')
+        return {'room': room}
+    
+    def serialize_uploaded_message(self, message):
+        return ChatMessageSerializer(message).data
     
     def perform_create(self, serializer):
         room = serializer.save(creator=self.request.user)
         # Automatically add creator as participant
-        RoomParticipant.objects.create(
-            room=room, 
-            user=self.request.user, 
-            is_moderator=True
-        )
+        admit_participant(room, self.request.user, is_moderator=True)
     
     @action(detail=True, methods=['post'])
     def join(self, request, pk=None):
@@ -792,13 +1112,13 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Check if already a participant
-        if room.participants.filter(user=user, is_active=True).exists():
+        if self.get_membership(room).is_participant:
             return Response(
                 {'detail': 'You are already a participant in this room.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if room is full
+        # Cheap early check on the counter; admission itself re-checks atomically
         if room.is_full:
             return Response(
                 {'detail': 'Room is full.'},
@@ -815,7 +1135,18 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         
         if room.auto_approve:
             # Auto-approve: add directly as participant
-            RoomParticipant.objects.create(room=room, user=user)
+            try:
+                admit_participant(room, user)
+            except RoomCapacityError:
+                return Response(
+                    {'detail': 'Room is full.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            except AlreadyParticipantError:
+                return Response(
+                    {'detail': 'You are already a participant in this room.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response(
                 {'detail': 'Successfully joined the room!'},
                 status=status.HTTP_200_OK
@@ -855,15 +1186,73 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def my_rooms(self, request):
-        """Get rooms where user is a participant."""
+        """Get rooms where user is a participant, with unread counts and last-message previews."""
+        user = request.user
+        latest_message = ChatMessage.objects.filter(room=OuterRef('pk')).order_by('-id')
+        
         user_rooms = ChatRoom.objects.filter(
-            participants__user=request.user,
+            participants__user=user,
             participants__is_active=True,
             is_active=True
+        ).select_related('creator').annotate(
+            last_read_message_id=F('participants__last_read_message_id'),
+        ).annotate(
+            unread_count=Coalesce(Subquery(
+                ChatMessage.objects.filter(
+                    room=OuterRef('pk'),
+                    id__gt=Coalesce(OuterRef('last_read_message_id'), 0)
+                ).exclude(user=user)
+                .order_by().values('room').annotate(count=Count('id')).values('count')
+            ), 0),
+            pending_request_exists=Exists(
+                JoinRequest.objects.filter(room=OuterRef('pk'), user=user, status='pending')
+            ),
+            last_message_id=Subquery(latest_message.values('id')[:1]),
+            last_message_text=Subquery(latest_message.values('message')[:1]),
+            last_message_type=Subquery(latest_message.values('message_type')[:1]),
+            last_message_username=Subquery(latest_message.values('user__username')[:1]),
+            last_message_created_at=Subquery(latest_message.values('created_at')[:1]),
         )
-        serializer = self.get_serializer(user_rooms, many=True)
+        serializer = MyChatRoomSerializer(user_rooms, many=True, context=self.get_serializer_context())
         return Response(serializer.data)
     
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomMember])
+    def mark_read(self, request, pk=None):
+        """Move the user's read cursor forward (defaults to the latest message)."""
+        room = self.get_object()
+        message_id = request.data.get('message_id')
+        
+        if message_id:
+            try:
+                message_id = int(message_id)
+            except (ValueError, TypeError):
+                return Response(
+                    {'detail': 'message_id must be an integer.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            # A cursor past the room's messages would hide every later one as read
+            if not room.messages.filter(id=message_id).exists():
+                return Response(
+                    {'detail': 'message_id is not a message in this room.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            cursor = Value(message_id)
+        else:
+            cursor = Subquery(
+                ChatMessage.objects.filter(room=room).order_by('-id').values('id')[:1]
+            )
+        
+        # Single conditional UPDATE; the cursor only ever moves forward
+        updated = RoomParticipant.objects.filter(
+            room=room,
+            user=request.user,
+            is_active=True
+        ).filter(
+            Q(last_read_message_id__isnull=True) | Q(last_read_message_id__lt=cursor)
+        ).update(last_read_message_id=cursor)
+        
+        return Response({'detail': 'Read position updated.', 'updated': bool(updated)})
+    
     @action(detail=False, methods=['get'])
     def my_requests(self, request):
         """Get user's join requests."""
@@ -884,7 +1273,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         room = self.get_object()
         
         # Only room creator can view pending requests
-        if room.creator != request.user:
+        if room.creator_id != request.user.id:
             return Response(
                 {'detail': 'Only room creator can view pending requests.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -907,7 +1296,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         room = self.get_object()
         
         # Only room creator can approve requests
-        if room.creator != request.user:
+        if room.creator_id != request.user.id:
             return Response(
                 {'detail': 'Only room creator can approve requests.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -932,24 +1321,24 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if room is full
-        if room.is_full:
+        # Add user as participant and approve the request together
+        try:
+            with transaction.atomic():
+                admit_participant(room, join_request.user)
+                join_request.status = 'approved'
+                join_request.processed_by = request.user
+                join_request.processed_at = timezone.now()
+                join_request.save()
+        except RoomCapacityError:
             return Response(
                 {'detail': 'Room is full, cannot approve more requests.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Approve request and add as participant
-        join_request.status = 'approved'
-        join_request.processed_by = request.user
-        join_request.processed_at = timezone.now()
-        join_request.save()
-        
-        # Add user as participant
-        RoomParticipant.objects.create(
-            room=room, 
-            user=join_request.user
-        )
+        except AlreadyParticipantError:
+            return Response(
+                {'detail': 'User is already a participant in this room.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Create notification for the user
         from .models import Notification
@@ -987,7 +1376,7 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         room = self.get_object()
         
         # Only room creator can deny requests
-        if room.creator != request.user:
+        if room.creator_id != request.user.id:
             return Response(
                 {'detail': 'Only room creator can deny requests.'},
                 status=status.HTTP_403_FORBIDDEN
@@ -1042,36 +1431,192 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
-    @action(detail=True, methods=['get'])
-    def messages(self, request, pk=None):
-        """Get messages for a room (participants only)."""
+    def get_bulk_request_ids(self, request):
+        """
+        Read the join requests selected for a bulk action.
+        Returns (request_ids or None for all pending, error Response or None).
+        """
+        if request.data.get('all_pending') in (True, 'true', '1'):
+            return None, None
+        
+        request_ids = request.data.get('request_ids')
+        if not isinstance(request_ids, list) or not request_ids:
+            return None, Response(
+                {'detail': 'request_ids (a list) or all_pending is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            return [int(request_id) for request_id in request_ids], None
+        except (TypeError, ValueError):
+            return None, Response(
+                {'detail': 'request_ids must be a list of integers.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    @action(detail=True, methods=['post'])
+    def bulk_approve_requests(self, request, pk=None):
+        """
+        Approve many join requests at once (room creator only).
+        POST {"request_ids": [...]} or {"all_pending": true}
+        """
         room = self.get_object()
         
-        # Check if user is a participant or room creator
-        if not (room.participants.filter(user=request.user, is_active=True).exists() or 
-                room.creator == request.user):
+        if room.creator_id != request.user.id:
             return Response(
-                {'detail': 'You must be a participant to view messages.'},
+                {'detail': 'Only room creator can approve requests.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        messages = ChatMessage.objects.filter(room=room).order_by('created_at')
-        serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        request_ids, error = self.get_bulk_request_ids(request)
+        if error:
+            return error
+        
+        try:
+            approved = approve_join_requests(room, request.user, request_ids)
+        except RoomCapacityError as e:
+            return Response(
+                {'detail': str(e), 'available_slots': e.available},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        approved_ids = [join_request.id for join_request in approved]
+        return Response({
+            'detail': f'{len(approved)} join requests approved.',
+            'approved': approved_ids,
+            'skipped': [request_id for request_id in request_ids or [] if request_id not in approved_ids],
+            'room_name': room.name
+        })
     
     @action(detail=True, methods=['post'])
-    def send_message(self, request, pk=None):
-        """Send a message to a room (participants only)."""
+    def bulk_deny_requests(self, request, pk=None):
+        """
+        Deny many join requests at once (room creator only).
+        POST {"request_ids": [...], "reason": "..."} or {"all_pending": true}
+        """
         room = self.get_object()
         
-        # Check if user is a participant or room creator
-        if not (room.participants.filter(user=request.user, is_active=True).exists() or 
-                room.creator == request.user):
+        if room.creator_id != request.user.id:
             return Response(
-                {'detail': 'You must be a participant to send messages.'},
+                {'detail': 'Only room creator can deny requests.'},
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        request_ids, error = self.get_bulk_request_ids(request)
+        if error:
+            return error
+        
+        denied = deny_join_requests(room, request.user, request_ids, request.data.get('reason', ''))
+        
+        denied_ids = [join_request.id for join_request in denied]
+        return Response({
+            'detail': f'{len(denied)} join requests denied.',
+            'denied': denied_ids,
+            'skipped': [request_id for request_id in request_ids or [] if request_id not in denied_ids]
+        })
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsRoomMember])
+    def messages(self, request, pk=None):
+        """Get messages for a room (participants only)."""
+        room = self.get_object()
+        
+        messages = ChatMessage.objects.filter(room=room).select_related(
+            'user', 'reply_to__user'
+        ).prefetch_related('message_reactions').order_by('id')
+        
+        # Only fetch messages newer than one the client already has
+        after_id = request.query_params.get('after_id')
+        if after_id and after_id.isdigit():
+            messages = messages.filter(id__gt=int(after_id))
+            return Response(ChatMessageSerializer(messages, many=True).data)
+        
+        # A full load includes history the archiver has moved into segments
+        data = read_archived_records(room.archive_segments.all()) + list(ChatMessageSerializer(messages, many=True).data)
+        return Response(sorted(data, key=lambda message: message['id']))
+    
+    @action(detail=True, methods=['get'], url_path='attachments/(?P<message_id>[0-9]+)',
+            permission_classes=[IsAuthenticated, IsRoomMember])
+    def attachment(self, request, pk=None, message_id=None):
+        """Download a message's voice recording or file (participants only), with Range and ETag support."""
+        room = self.get_object()
+        return attachment_response(request, room.messages.filter(id=message_id).first())
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsRoomMember])
+    def history(self, request, pk=None):
+        """
+        Page backwards through a room's history (participants only).
+        GET ?before_id=<id>&limit=<n> → older messages, reading archived segments once the hot window runs out
+        """
+        room = self.get_object()
+        before_id, limit = get_history_params(request)
+        
+        hot_messages = ChatMessage.objects.filter(room=room).select_related(
+            'user', 'reply_to__user'
+        ).prefetch_related('message_reactions')
+        
+        return Response(get_history_page(
+            hot_messages,
+            room.archive_segments.all(),
+            lambda messages: ChatMessageSerializer(messages, many=True).data,
+            before_id=before_id,
+            limit=limit
+        ))
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsRoomHost])
+    def export(self, request, pk=None):
+        """
+        Download a room's full transcript (host only), streamed row by row.
+        GET ?export_format=jsonl|csv|txt&attachments=true → optionally a zip with every attachment
+        """
+        room = self.get_object()
+        
+        export_format = request.query_params.get('export_format', 'jsonl')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'detail': f'export_format must be one of: {", ".join(EXPORT_FORMATS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        filename = f'room-{room.id}-transcript'
+        if request.query_params.get('attachments', '').lower() in ('1', 'true'):
+            response = StreamingHttpResponse(
+                stream_transcript_zip(room, export_format),
+                content_type='application/zip'
+            )
+            filename += '.zip'
+        else:
+            response = StreamingHttpResponse(
+                stream_transcript(room, export_format),
+                content_type=f'{EXPORT_FORMATS[export_format]}; charset=utf-8'
+            )
+            filename += f'.{export_format}'
+        
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsRoomMember])
+    def search(self, request, pk=None):
+        """Search message text and attachment names in a room (participants only)."""
+        room = self.get_object()
+        
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'detail': 'Search query (q) is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        messages, query_terms = search_room_messages(room, query)
+        
+        paginator = NotificationPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        results = [build_search_result(message, message.user, query_terms) for message in page]
+        return paginator.get_paginated_response(results)
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomMember], throttle_classes=[RoomMessageThrottle])
+    def send_message(self, request, pk=None):
+        """Send a message to a room (participants only)."""
+        room = self.get_object()
+        
         message_text = request.data.get('message', '').strip()
         if not message_text:
             return Response(
@@ -1086,23 +1631,16 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             message=message_text,
             message_type='text'
         )
+        notify_mentions_safely(message)
         
         serializer = ChatMessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomMember])
     def send_voice_message(self, request, pk=None):
         """Send a voice message to a room (participants only)."""
         room = self.get_object()
         
-        # Check if user is a participant or room creator
-        if not (room.participants.filter(user=request.user, is_active=True).exists() or 
-                room.creator == request.user):
-            return Response(
-                {'detail': 'You must be a participant to send messages.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         # Check if audio file is provided
         audio_file = request.FILES.get('audio')
         if not audio_file:
@@ -1124,20 +1662,24 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         except (ValueError, TypeError):
             duration = 0
         
+        # Trust the duration read from the audio headers over the client's value
+        probe = get_upload_probe(request, 'audio')
+        try:
+            _, duration = resolve_probed_fields('voice', probe, duration=duration)
+        except UploadRejected as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Create the voice message
         message = ChatMessage.objects.create(
             room=room,
             user=request.user,
-            message=f"Voice message ({duration}s)" if duration > 0 else "Voice message",
-            message_type='voice',
-            audio_file=audio_file,
-            duration=duration
+            **build_message_fields('voice', audio_file, audio_file.name, audio_file.size, duration=duration, probe=probe)
         )
         
         serializer = ChatMessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomMember])
     def send_file_message(self, request, pk=None):
         """Send a file message to a room (participants only)."""
         print("=== FILE UPLOAD REQUEST ===")
@@ -1150,19 +1692,6 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         
         room = self.get_object()
         print(f"Room object: {room}")
-        
-        # Check if user is a participant or room creator
-        is_participant = room.participants.filter(user=request.user, is_active=True).exists()
-        is_creator = room.creator == request.user
-        print(f"Is participant: {is_participant}")
-        print(f"Is creator: {is_creator}")
-        
-        if not (is_participant or is_creator):
-            print("Access denied: User is not a participant or creator")
-            return Response(
-                {'detail': 'You must be a participant to send messages.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
 
         # Check if file is provided
         file_attachment = request.FILES.get('file')
@@ -1194,17 +1723,18 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Classify the file by its sniffed contents rather than the client's file_type
+        probe = get_upload_probe(request, 'file')
+        file_type, _ = resolve_probed_fields('file', probe, file_type=file_type)
+        
         # Create the file message
         print("Creating file message...")
         message = ChatMessage.objects.create(
             room=room,
             user=request.user,
-            message=f"📎 {file_attachment.name}",
-            message_type='file',
-            file_attachment=file_attachment,
-            file_type=file_type,
-            file_size=file_attachment.size,
-            original_filename=file_attachment.name
+            **build_message_fields(
+                'file', file_attachment, file_attachment.name, file_attachment.size, file_type=file_type, probe=probe
+            )
         )
         print(f"File message created successfully: {message.id}")
         
@@ -1213,19 +1743,17 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         print("=== FILE UPLOAD SUCCESS ===")
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsRoomMember])
+    def online(self, request, pk=None):
+        """Get users currently connected to the room (participants only)."""
+        room = self.get_object()
+        return Response({'online': presence_registry.online(room.id)})
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsRoomMember])
     def participants(self, request, pk=None):
         """Get participants for a room (participants only)."""
         room = self.get_object()
         
-        # Check if user is a participant or room creator
-        if not (room.participants.filter(user=request.user, is_active=True).exists() or 
-                room.creator == request.user):
-            return Response(
-                {'detail': 'You must be a participant to view participants.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         participants = RoomParticipant.objects.filter(room=room, is_active=True)
         data = [{
             'id': p.user.id,
@@ -1250,19 +1778,11 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         
         return Response(data)
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomMember], throttle_classes=[RoomMessageThrottle])
     def send_reply(self, request, pk=None):
         """Send a reply to a specific message."""
         room = self.get_object()
         
-        # Check if user is a participant or room creator
-        if not (room.participants.filter(user=request.user, is_active=True).exists() or 
-                room.creator == request.user):
-            return Response(
-                {'detail': 'You must be a participant to send messages.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         message_text = request.data.get('message', '').strip()
         reply_to_id = request.data.get('replyTo')
         is_private = request.data.get('isPrivate', False)
@@ -1292,11 +1812,12 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             reply_to=reply_to,
             is_private=is_private
         )
+        notify_mentions_safely(message)
         
         serializer = ChatMessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    @action(detail=True, methods=['patch', 'put'], url_path='edit-message/(?P<message_id>[^/.]+)')
+    @action(detail=True, methods=['patch', 'put'], permission_classes=[IsAuthenticated, IsRoomMember], url_path='edit-message/(?P<message_id>[^/.]+)')
     def edit_message(self, request, pk=None, message_id=None):
         """Edit a message (own messages only)."""
         try:
@@ -1354,22 +1875,12 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         
         return Response({'detail': 'Message deleted successfully.'})
 
-    @action(detail=True, methods=['post'], url_path='add-reaction/(?P<message_id>[^/.]+)')
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomMember], throttle_classes=[RoomReactionThrottle], url_path='add-reaction/(?P<message_id>[^/.]+)')
     def add_reaction(self, request, pk=None, message_id=None):
         """Add emoji reaction to a message."""
         room = self.get_object()
         
-        # Check if user is a participant
-        if not (room.participants.filter(user=request.user, is_active=True).exists() or 
-                room.creator == request.user):
-            return Response(
-                {'detail': 'You must be a participant to react to messages.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        try:
-            message = ChatMessage.objects.get(id=message_id, room=room)
-        except ChatMessage.DoesNotExist:
+        if not ChatMessage.objects.filter(id=message_id, room=room).exists():
             return Response(
                 {'detail': 'Message not found.'},
                 status=status.HTTP_404_NOT_FOUND
@@ -1382,28 +1893,41 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # For simplicity, we'll store reactions in the message's metadata
-        # In a production app, you'd have a separate Reaction model
-        if not message.reactions:
-            message.reactions = {}
+        if len(emoji) > 32:
+            return Response(
+                {'detail': 'Emoji cannot exceed 32 characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        if emoji not in message.reactions:
-            message.reactions[emoji] = []
+        # One row per (message, user, emoji); the unique constraint makes repeated
+        # or concurrent reactions idempotent without touching the message row
+        try:
+            with transaction.atomic():
+                _, created = MessageReaction.objects.get_or_create(
+                    message_id=message_id,
+                    user=request.user,
+                    emoji=emoji
+                )
+        except IntegrityError:
+            created = False
         
-        if request.user.id not in message.reactions[emoji]:
-            message.reactions[emoji].append(request.user.id)
-            message.save()
+        count = MessageReaction.count_for(message_id, emoji)
+        if created:
+            send_reaction_delta_realtime(room.id, int(message_id), emoji, request.user.id, 'added', count)
         
-        return Response({'detail': 'Reaction added successfully.', 'message_id': message.id, 'emoji': emoji})
+        return Response({
+            'detail': 'Reaction added successfully.',
+            'message_id': int(message_id),
+            'emoji': emoji,
+            'count': count
+        })
 
     @action(detail=True, methods=['delete'], url_path='remove-reaction/(?P<message_id>[^/.]+)')
     def remove_reaction(self, request, pk=None, message_id=None):
         """Remove emoji reaction from a message."""
         room = self.get_object()
         
-        try:
-            message = ChatMessage.objects.get(id=message_id, room=room)
-        except ChatMessage.DoesNotExist:
+        if not ChatMessage.objects.filter(id=message_id, room=room).exists():
             return Response(
                 {'detail': 'Message not found.'},
                 status=status.HTTP_404_NOT_FOUND
@@ -1416,17 +1940,25 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Remove user's reaction
-        if message.reactions and emoji in message.reactions:
-            if request.user.id in message.reactions[emoji]:
-                message.reactions[emoji].remove(request.user.id)
-                if not message.reactions[emoji]:  # Remove empty emoji lists
-                    del message.reactions[emoji]
-                message.save()
+        # Remove only the user's own reaction
+        deleted_count, _ = MessageReaction.objects.filter(
+            message_id=message_id,
+            user=request.user,
+            emoji=emoji
+        ).delete()
         
-        return Response({'detail': 'Reaction removed successfully.', 'message_id': message.id, 'emoji': emoji})
+        count = MessageReaction.count_for(message_id, emoji)
+        if deleted_count:
+            send_reaction_delta_realtime(room.id, int(message_id), emoji, request.user.id, 'removed', count)
+        
+        return Response({
+            'detail': 'Reaction removed successfully.',
+            'message_id': int(message_id),
+            'emoji': emoji,
+            'count': count
+        })
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomHost])
     def remove_participant(self, request, pk=None):
         """Remove a participant from the room (host only)."""
         room = self.get_object()
@@ -1438,18 +1970,6 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Check if current user is host (creator or moderator)
-        is_host = (
-            room.creator == request.user or
-            room.participants.filter(user=request.user, is_moderator=True, is_active=True).exists()
-        )
-        
-        if not is_host:
-            return Response(
-                {'detail': 'Only hosts can remove participants.'},
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
         # Prevent host from removing themselves
         if str(user_id) == str(request.user.id):
             return Response(
@@ -1458,10 +1978,9 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            # Find and deactivate the participant
-            participant = room.participants.get(user_id=user_id, is_active=True)
-            participant.is_active = False
-            participant.save()
+            # Deactivate the participant and free their place
+            if not release_participant(room, user_id):
+                raise RoomParticipant.DoesNotExist
             
             # Create notification for removed user
             from .models import Notification
@@ -1495,13 +2014,12 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
         room = self.get_object()
         
         try:
-            # Find and deactivate the participant
-            participant = room.participants.get(user=request.user, is_active=True)
-            participant.is_active = False
-            participant.save()
+            # Deactivate the participant and free their place
+            if not release_participant(room, request.user.id):
+                raise RoomParticipant.DoesNotExist
             
             # Create notification for room creator if not the one leaving
-            if room.creator != request.user:
+            if room.creator_id != request.user.id:
                 from .models import Notification
                 from django.contrib.contenttypes.models import ContentType
                 
@@ -1527,64 +2045,24 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsRoomHost])
     def end_meeting(self, request, pk=None):
-        """End the meeting (host only) - permanently deletes the room."""
+        """
+        End the meeting (host only) - permanently deletes the room.
+        The room is hidden immediately; messages, files and participants are
+        removed by a background teardown whose progress is at teardown_status.
+        """
+        room = self.get_object()
+        
         try:
-            room = self.get_object()
-            
-            # Check if current user is host (creator or moderator)
-            is_host = (
-                room.creator == request.user or
-                room.participants.filter(user=request.user, is_moderator=True, is_active=True).exists()
-            )
-            
-            if not is_host:
-                return Response(
-                    {'detail': 'Only hosts can end meetings.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Store room info before deletion for notifications
-            room_name = room.name
-            room_id = room.id
-            
-            # Get all participants before deletion (excluding the host)
-            try:
-                participants = room.participants.filter(is_active=True).exclude(user=request.user)
-                participant_users = [p.user for p in participants]
-            except Exception as e:
-                print(f"Error getting participants: {e}")
-                participant_users = []
-            
-            # Notify all participants that the meeting has ended BEFORE deletion
-            try:
-                for participant in participant_users:
-                    Notification.objects.create(
-                        recipient=participant,
-                        actor=request.user,
-                        verb=f'ended and deleted the meeting "{room_name}"',
-                        notification_type='chat',
-                        data={
-                            'room_id': room_id,
-                            'room_name': room_name,
-                            'action_type': 'meeting_deleted',
-                            'message': f'The meeting "{room_name}" has been permanently deleted by the host.'
-                        }
-                    )
-            except Exception as e:
-                print(f"Error creating notifications: {e}")
-                # Continue with deletion even if notifications fail
-            
-            # Permanently delete the room and all related data
-            # This will cascade delete: participants, messages, join_requests, reactions
-            room.delete()
+            progress = start_room_teardown(room, request.user)
             
             return Response({
-                'detail': 'Meeting ended and deleted successfully.',
-                'room_name': room_name,
-                'deleted': True
-            })
+                'detail': 'Meeting ended. The room is being deleted.',
+                'room_name': room.name,
+                'deleted': True,
+                'teardown': progress
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             print(f"Error in end_meeting: {e}")
@@ -1592,9 +2070,20 @@ class ChatRoomViewSet(viewsets.ModelViewSet):
                 {'detail': f'Failed to end meeting: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=True, methods=['get'])
+    def teardown_status(self, request, pk=None):
+        """Get the progress of deleting an ended meeting (host only)."""
+        progress = get_teardown_progress(pk)
+        if progress is None or progress['actor_id'] != request.user.id:
+            return Response(
+                {'detail': 'No teardown found for this room.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(progress)
 
 
-class PrivateChatRoomViewSet(viewsets.ModelViewSet):
+class PrivateChatRoomViewSet(ChunkedUploadMixin, viewsets.ModelViewSet):
     """ViewSet for private chat rooms within public chat rooms."""
     serializer_class = PrivateChatRoomSerializer
     permission_classes = [IsAuthenticated]
@@ -1607,6 +2096,13 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
             is_active=True
         )
     
+    def get_upload_scope(self):
+        """Uploads go to one of the user's own private chats."""
+        return {'private_chat': self.get_object()}
+    
+    def serialize_uploaded_message(self, message):
+        return PrivateMessageSerializer(message).data
+    
     @action(detail=False, methods=['get'])
     def by_public_room(self, request):
         """Get private chat rooms for a specific public room."""
@@ -1620,7 +2116,7 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
         # Verify user is participant in the public room
         try:
             public_room = ChatRoom.objects.get(id=public_room_id)
-            if not public_room.participants.filter(user=request.user, is_active=True).exists():
+            if not resolve_membership(public_room, request.user, request).is_participant:
                 return Response(
                     {'detail': 'You are not a participant in this room.'},
                     status=status.HTTP_403_FORBIDDEN
@@ -1653,10 +2149,7 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
             public_room = ChatRoom.objects.get(id=public_room_id)
             
             # Check if current user is participant or creator
-            current_user_is_participant = (
-                public_room.participants.filter(user=request.user, is_active=True).exists() or
-                public_room.creator == request.user
-            )
+            current_user_is_participant = resolve_membership(public_room, request.user, request).is_member
             
             if not current_user_is_participant:
                 return Response(
@@ -1669,10 +2162,7 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
             other_user = User.objects.get(id=other_user_id)
             
             # Check if other user is participant or creator
-            other_user_is_participant = (
-                public_room.participants.filter(user=other_user, is_active=True).exists() or
-                public_room.creator == other_user
-            )
+            other_user_is_participant = resolve_membership(public_room, other_user, request).is_member
             
             if not other_user_is_participant:
                 return Response(
@@ -1715,15 +2205,58 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
     def messages(self, request, pk=None):
         """Get messages from a private chat room."""
         private_chat = self.get_object()
-        messages = private_chat.private_messages.all()
+        messages = private_chat.private_messages.select_related('sender').order_by('id')
         
         # Mark messages as read for the current user
         unread_messages = messages.filter(is_read=False).exclude(sender=request.user)
         for message in unread_messages:
             message.mark_as_read(request.user)
         
-        serializer = PrivateMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        # Include history the archiver has moved into segments
+        data = read_archived_records(private_chat.archive_segments.all()) + list(PrivateMessageSerializer(messages, many=True).data)
+        return Response(sorted(data, key=lambda message: message['id']))
+    
+    @action(detail=True, methods=['get'], url_path='attachments/(?P<message_id>[0-9]+)')
+    def attachment(self, request, pk=None, message_id=None):
+        """Download a private message's voice recording or file, with Range and ETag support."""
+        private_chat = self.get_object()
+        return attachment_response(request, private_chat.private_messages.filter(id=message_id).first())
+    
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        Page backwards through a private chat's history.
+        GET ?before_id=<id>&limit=<n> → older messages, reading archived segments once the hot window runs out
+        """
+        private_chat = self.get_object()
+        before_id, limit = get_history_params(request)
+        
+        return Response(get_history_page(
+            private_chat.private_messages.select_related('sender'),
+            private_chat.archive_segments.all(),
+            lambda messages: PrivateMessageSerializer(messages, many=True).data,
+            before_id=before_id,
+            limit=limit
+        ))
+    
+    @action(detail=True, methods=['get'])
+    def search(self, request, pk=None):
+        """Search message text and attachment names in a private chat room."""
+        private_chat = self.get_object()
+        
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'detail': 'Search query (q) is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        messages, query_terms = search_private_messages(private_chat, query)
+        
+        paginator = NotificationPagination()
+        page = paginator.paginate_queryset(messages, request, view=self)
+        results = [build_search_result(message, message.sender, query_terms) for message in page]
+        return paginator.get_paginated_response(results)
     
     @action(detail=True, methods=['post'])
     def send_message(self, request, pk=None):
@@ -1798,40 +2331,21 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
         except (ValueError, TypeError):
             duration = 0
         
+        # Trust the duration read from the audio headers over the client's value
+        probe = get_upload_probe(request, 'audio')
+        try:
+            _, duration = resolve_probed_fields('voice', probe, duration=duration)
+        except UploadRejected as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Create the private voice message
         private_message = PrivateMessage.objects.create(
             private_chat=private_chat,
             sender=request.user,
-            message=f"Voice message ({duration}s)" if duration > 0 else "Voice message",
-            message_type='voice',
-            audio_file=audio_file,
-            duration=duration
+            **build_message_fields('voice', audio_file, audio_file.name, audio_file.size, duration=duration, probe=probe)
         )
         
-        # Update the private chat room timestamp
-        private_chat.updated_at = timezone.now()
-        private_chat.save()
-        
-        # Create notification for the other user
-        other_user = private_chat.get_other_user(request.user)
-        from .models import Notification
-        from django.contrib.contenttypes.models import ContentType
-        
-        Notification.objects.create(
-            recipient=other_user,
-            actor=request.user,
-            verb=f'sent you a voice message in "{private_chat.public_room.name}"',
-            content_type=ContentType.objects.get_for_model(PrivateMessage),
-            object_id=private_message.id,
-            notification_type='private_message',
-            data={
-                'private_chat_id': private_chat.id,
-                'public_room_id': private_chat.public_room.id,
-                'public_room_name': private_chat.public_room.name,
-                'message_preview': f'Voice message ({duration}s)' if duration > 0 else 'Voice message',
-                'action_type': 'private_voice_message_received'
-            }
-        )
+        notify_private_attachment(private_message, 'voice', audio_file.name, duration)
         
         serializer = PrivateMessageSerializer(private_message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -1865,42 +2379,20 @@ class PrivateChatRoomViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Classify the file by its sniffed contents rather than the client's file_type
+        probe = get_upload_probe(request, 'file')
+        file_type, _ = resolve_probed_fields('file', probe, file_type=file_type)
+        
         # Create the private file message
         private_message = PrivateMessage.objects.create(
             private_chat=private_chat,
             sender=request.user,
-            message=f"📎 {file_attachment.name}",
-            message_type='file',
-            file_attachment=file_attachment,
-            file_type=file_type,
-            file_size=file_attachment.size,
-            original_filename=file_attachment.name
+            **build_message_fields(
+                'file', file_attachment, file_attachment.name, file_attachment.size, file_type=file_type, probe=probe
+            )
         )
         
-        # Update the private chat room timestamp
-        private_chat.updated_at = timezone.now()
-        private_chat.save()
-        
-        # Create notification for the other user
-        other_user = private_chat.get_other_user(request.user)
-        from .models import Notification
-        from django.contrib.contenttypes.models import ContentType
-        
-        Notification.objects.create(
-            recipient=other_user,
-            actor=request.user,
-            verb=f'sent you a file in "{private_chat.public_room.name}"',
-            content_type=ContentType.objects.get_for_model(PrivateMessage),
-            object_id=private_message.id,
-            notification_type='private_message',
-            data={
-                'private_chat_id': private_chat.id,
-                'public_room_id': private_chat.public_room.id,
-                'public_room_name': private_chat.public_room.name,
-                'message_preview': f'📎 {file_attachment.name}',
-                'action_type': 'private_file_message_received'
-            }
-        )
+        notify_private_attachment(private_message, 'file', file_attachment.name)
         
         serializer = PrivateMessageSerializer(private_message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -274,3 +274,67 @@ def send_bulk_notification_update_realtime(user_id, update_data):
         update_data: Dictionary containing update information
     """
     return notification_websocket_service.send_bulk_notification_update(user_id, update_data)
+
+
+class ChatRoomWebSocketService:
+    """
+    Service for broadcasting small chat room events to everyone connected to a room.
+    """
+
+    def __init__(self):
+        self.channel_layer = get_channel_layer()
+
+    @staticmethod
+    def get_room_group_name(room_id):
+        """Get the channel group name for a chat room."""
+        return f'chat_room_{room_id}'
+
+    def send_room_event(self, room_id, event_type, payload):
+        """
+        Send an event to every connection subscribed to a chat room.
+        
+        Args:
+            room_id: ID of the chat room
+            event_type: Consumer handler name (e.g. 'reaction_delta')
+            payload: JSON-serializable event data
+        """
+        if not self.channel_layer:
+            return False
+
+        try:
+            async_to_sync(self.channel_layer.group_send)(
+                self.get_room_group_name(room_id),
+                {
+                    'type': event_type,
+                    'payload': payload,
+                }
+            )
+            return True
+        except Exception as e:
+            print(f"Error sending {event_type} to room {room_id}: {str(e)}")
+            return False
+
+
+# Global instance for chat room broadcasts
+chat_room_websocket_service = ChatRoomWebSocketService()
+
+
+def send_reaction_delta_realtime(room_id, message_id, emoji, user_id, action, count):
+    """
+    Convenience function to broadcast a single reaction change to a room.
+    
+    Args:
+        room_id: ID of the chat room
+        message_id: ID of the message that was reacted to
+        emoji: Emoji that was added or removed
+        user_id: ID of the user who reacted
+        action: 'added' or 'removed'
+        count: Number of reactions with this emoji after the change
+    """
+    return chat_room_websocket_service.send_room_event(room_id, 'reaction_delta', {
+        'message_id': message_id,
+        'emoji': emoji,
+        'user_id': user_id,
+        'action': action,
+        'count': count,
+    })
@@ -13,6 +13,7 @@ from django.core.files.base import ContentFile
 import os
 
 from .models import Resource
+from .counters import record_download
 
 
 class ResourceTypeFilter(admin.SimpleListFilter):
@@ -146,7 +147,7 @@ class ResourceAdmin(admin.ModelAdmin):
             'description': 'Control who can see and access this resource.'
         }),
         ('Statistics', {
-            'fields': ('download_count',),
+            'fields': ('download_count', 'views_count'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -172,7 +173,7 @@ class ResourceAdmin(admin.ModelAdmin):
     )
     
     # Fields that are read-only
-    readonly_fields = ('created_at', 'updated_at', 'download_count')
+    readonly_fields = ('created_at', 'updated_at', 'download_count', 'views_count')
     
     # Ordering
     ordering = ('-created_at',)
@@ -372,8 +373,7 @@ class ResourceAdmin(admin.ModelAdmin):
         
         if resource.resource_type == 'file' and resource.file:
             # Increment download count
-            resource.download_count += 1
-            resource.save(update_fields=['download_count'])
+            record_download(resource.id)
             
             # Return file for download
             try:
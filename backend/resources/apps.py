@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ResourcesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'resources'
+    
+    def ready(self):
+        """Import signals when the app is ready."""
+        import resources.signals
@@ -0,0 +1,146 @@
+"""
+Content-addressed storage for resource files.
+An uploaded file is stored once per distinct content, named after its SHA-256
+and fanned out over two directory levels:
+
+    resources/blobs/3f/a9/3fa9...e1.pdf
+
+Resources with identical contents point their file field at the same blob.
+ResourceBlob.ref_count tracks how many resources use a blob; when the last one
+is deleted or switches to another file the blob row and its file are removed.
+"""
+
+import os
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.thumbnails import delete_derivatives
+from .models import Resource, ResourceBlob
+
+
+BLOB_ROOT = 'resources/blobs'
+STRAY_FILE_AGE = timedelta(hours=1)
+
+
+def get_blob_storage():
+    """Get the storage resource files are written to."""
+    return Resource._meta.get_field('file').storage
+
+
+def blob_name(content_hash, extension=''):
+    """Get the fanned-out storage name for a content hash."""
+    return f'{BLOB_ROOT}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension.lower()}'
+
+
+def store_blob(file, content_hash):
+    """
+    Store a file's contents, or take another reference to an identical stored file.
+
+    Args:
+        file: Uploaded file (read from the start)
+        content_hash: SHA-256 hex digest of the file
+
+    Returns:
+        Storage name of the blob
+    """
+    storage = get_blob_storage()
+    extension = os.path.splitext(file.name or '')[1]
+    with transaction.atomic():
+        blob, created = ResourceBlob.objects.select_for_update().get_or_create(
+            content_hash=content_hash,
+            defaults={'name': blob_name(content_hash, extension), 'size': file.size}
+        )
+        if created or not storage.exists(blob.name):
+            if storage.exists(blob.name):
+                # Left behind by an interrupted write or a collection still in progress
+                storage.delete(blob.name)
+            file.seek(0)
+            saved_name = storage.save(blob.name, file)
+            if saved_name != blob.name:
+                ResourceBlob.objects.filter(pk=blob.pk).update(name=saved_name)
+                blob.name = saved_name
+        ResourceBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    return blob.name
+
+
+def retain_blob(name):
+    """
+    Take another reference to a stored blob, e.g. when a resource is duplicated.
+
+    Returns:
+        True if name is a blob (files stored before deduplication are not)
+    """
+    return ResourceBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1) == 1
+
+
+def release_blob(name):
+    """
+    Drop a reference to a stored blob, removing it once nothing refers to it.
+
+    Returns:
+        True if the blob was removed
+    """
+    with transaction.atomic():
+        if not ResourceBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1):
+            return False
+        deleted, _ = ResourceBlob.objects.filter(name=name, ref_count=0).delete()
+        if deleted:
+            transaction.on_commit(lambda: _delete_blob_file(name))
+    return bool(deleted)
+
+
+def _delete_blob_file(name):
+    """Remove a collected blob's file unless an upload has stored the same content again meanwhile."""
+    if not ResourceBlob.objects.filter(name=name).exists():
+        storage = get_blob_storage()
+        storage.delete(name)
+        delete_derivatives(storage, name)
+
+
+def collect_blobs():
+    """
+    Reset reference counts from the resources using each blob and remove unused blobs,
+    e.g. after resources were changed with queryset updates or restored from a backup.
+
+    Files under BLOB_ROOT without a blob (left by interrupted uploads) are removed
+    too, once they are older than STRAY_FILE_AGE so uploads in progress are left alone.
+
+    Returns:
+        Tuple of (blobs recounted, blobs and stray files removed)
+    """
+    recounted = ResourceBlob.objects.update(ref_count=Coalesce(Subquery(
+        Resource.objects.filter(file=OuterRef('name'))
+        .order_by().values('file').annotate(count=Count('id')).values('count')
+    ), 0))
+
+    removed = 0
+    for name in ResourceBlob.objects.filter(ref_count=0).values_list('name', flat=True):
+        with transaction.atomic():
+            if ResourceBlob.objects.filter(name=name, ref_count=0).delete()[0]:
+                transaction.on_commit(lambda name=name: _delete_blob_file(name))
+                removed += 1
+
+    storage = get_blob_storage()
+    # Thumbnails are named after their blob's hash, so both are kept while the blob exists
+    known = set(ResourceBlob.objects.values_list('content_hash', flat=True))
+    cutoff = timezone.now() - STRAY_FILE_AGE
+    for name in _list_blob_files(storage):
+        if name.rsplit('/', 1)[-1].split('.')[0] not in known and storage.get_modified_time(name) < cutoff:
+            storage.delete(name)
+            removed += 1
+    return recounted, removed
+
+
+def _list_blob_files(storage):
+    """Yield the names of every file in the fan-out directories."""
+    if not storage.exists(BLOB_ROOT):
+        return
+    for first in storage.listdir(BLOB_ROOT)[0]:
+        for second in storage.listdir(f'{BLOB_ROOT}/{first}')[0]:
+            directory = f'{BLOB_ROOT}/{first}/{second}'
+            for filename in storage.listdir(directory)[1]:
+                yield f'{directory}/{filename}'
@@ -0,0 +1,170 @@
+"""
+Resumable chunked uploads for large resource files.
+A session is opened with the resource's details and the file's name, size and
+(optionally) SHA-256; chunks are sent at the offset the server reports, and
+finalizing checks the assembled file and creates the Resource exactly as a
+single multipart upload would.
+"""
+
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.db import transaction
+
+from core.chunked_upload import UploadSessionGone, open_assembled_file, discard_upload
+from core.file_delivery import compute_content_hash
+from core.media_probe import sniff_mime_type
+from core.upload_middleware import UploadTypeNotAllowed, check_upload_type
+from .models import Resource, ResourceUploadSession
+from .serializers import ResourceCreateSerializer, ResourceUploadMetadataSerializer
+
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadIntegrityError(Exception):
+    """Raised when an assembled upload does not match what the client declared."""
+
+
+def validate_upload_request(data):
+    """
+    Validate the fields needed to open a resource upload session.
+
+    Returns:
+        Tuple of (session fields dict, errors or None)
+    """
+    metadata = ResourceUploadMetadataSerializer(data=data)
+    if not metadata.is_valid():
+        return None, metadata.errors
+
+    filename = (data.get('filename') or '').strip()
+    if not filename:
+        return None, {'filename': ['This field is required.']}
+    try:
+        for validator in Resource._meta.get_field('file').validators:
+            validator(File(None, name=filename))
+    except ValidationError as e:
+        return None, {'filename': e.messages}
+
+    try:
+        total_size = int(data.get('total_size'))
+    except (TypeError, ValueError):
+        return None, {'total_size': ['This field is required.']}
+    max_size = getattr(settings, 'MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
+    if total_size <= 0 or total_size > max_size:
+        return None, {'total_size': [f'File size must be between 1 byte and {max_size // (1024*1024)}MB.']}
+
+    sha256 = (data.get('sha256') or '').strip().lower()
+    if sha256 and not SHA256_PATTERN.match(sha256):
+        return None, {'sha256': ['Must be a hex-encoded SHA-256 digest.']}
+
+    return {
+        'filename': filename[:255],
+        'metadata': dict(metadata.validated_data),
+        'total_size': total_size,
+        'sha256': sha256,
+    }, None
+
+
+def describe_session(session):
+    """Get the API representation of an upload session."""
+    return {
+        'upload_id': str(session.id),
+        'filename': session.filename,
+        'offset': session.received_size,
+        'total_size': session.total_size,
+        'is_complete': session.is_complete,
+    }
+
+
+def reset_session(session):
+    """Throw away the received bytes so the client can send the file again from offset 0."""
+    discard_upload(session.id)
+    session.received_size = 0
+    session.save(update_fields=['received_size', 'updated_at'])
+
+
+def verify_assembled_file(session, file):
+    """
+    Check the assembled file against the session's declared size and hash.
+
+    Returns:
+        SHA-256 hex digest of the file
+
+    Raises:
+        UploadIntegrityError: If the size or hash does not match
+    """
+    if file.size != session.total_size:
+        raise UploadIntegrityError(
+            f'Assembled file is {file.size} bytes but {session.total_size} were declared.'
+        )
+    content_hash = compute_content_hash(file)
+    if session.sha256 and content_hash != session.sha256:
+        raise UploadIntegrityError('Assembled file does not match the declared SHA-256.')
+    return content_hash
+
+
+def finalize_upload(session, request):
+    """
+    Turn a complete upload session into a Resource.
+    The assembled file is verified, validated like a multipart upload and the session is removed.
+    The session row stays locked throughout, so a retried finalize waits for this one
+    and then finds the session gone instead of creating a second resource.
+
+    Returns:
+        The created Resource
+
+    Raises:
+        UploadSessionGone: If another request already finalized the session
+        UploadIntegrityError: If the file does not match what was declared (the session is reset)
+        UploadTypeNotAllowed: If the file's sniffed type is blocked (the session is removed)
+        rest_framework.exceptions.ValidationError: If the resource fails validation (the session is kept)
+    """
+    upload_id = session.id
+
+    try:
+        with transaction.atomic():
+            session = ResourceUploadSession.objects.select_for_update().filter(id=upload_id).first()
+            if session is None:
+                raise UploadSessionGone(upload_id)
+
+            file = open_assembled_file(upload_id, session.filename)
+            try:
+                file.content_hash = verify_assembled_file(session, file)
+                check_upload_type(sniff_mime_type(file))
+                serializer = ResourceCreateSerializer(
+                    data={**session.metadata, 'file': file},
+                    context={'request': request}
+                )
+                serializer.is_valid(raise_exception=True)
+                resource = serializer.save()
+                session.delete()
+            finally:
+                file.close()
+    except UploadIntegrityError:
+        # Reset after the rollback, so the cleared offset is kept
+        reset_session(session)
+        raise
+    except UploadTypeNotAllowed:
+        discard_upload(upload_id)
+        session.delete()
+        raise
+
+    discard_upload(upload_id)
+    return resource
+
+
+def expire_upload_sessions(older_than):
+    """
+    Delete upload sessions (and their working files) not touched since older_than.
+
+    Returns:
+        Number of sessions removed
+    """
+    stale = list(ResourceUploadSession.objects.filter(updated_at__lt=older_than).values_list('id', flat=True))
+    for upload_id in stale:
+        discard_upload(upload_id)
+    ResourceUploadSession.objects.filter(id__in=stale).delete()
+    return len(stale)
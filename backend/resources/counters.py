@@ -0,0 +1,183 @@
+"""
+Write-behind download and view counters for resources.
+Requests only add to an in-process buffer; the buffered increments are written
+every RESOURCE_COUNTER_FLUSH_INTERVAL seconds with F()-based UPDATEs, one
+statement per batch of resources, so concurrent downloads of a popular
+resource no longer queue on a read-modify-write of its row. Each flush also
+adds the increments to per-day ResourceDailyStat buckets.
+
+Every worker process keeps its own buffer; the increments are additive, so
+flushes from different processes never overwrite each other. Counts shown by
+the API may lag by up to one flush interval, and increments still buffered
+when a process is killed are lost (a clean exit flushes them).
+
+A flush runs when a request records an increment after the interval has
+passed, and otherwise from a daemon timer armed by the first increment to land
+in an empty buffer, so a worker that goes quiet still writes its counts. The
+buffers live in worker memory, so there is no management command to flush them
+from outside the process.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Resource, ResourceDailyStat
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+# Counter kind -> (Resource field, ResourceDailyStat field)
+COUNTER_FIELDS = {
+    'download': ('download_count', 'downloads'),
+    'view': ('views_count', 'views'),
+}
+
+
+def _increments(field, deltas, key='id'):
+    """Build field + CASE key WHEN ... THEN delta for an UPDATE over several rows."""
+    whens = [When(**{key: row_id}, then=Value(delta)) for row_id, delta in deltas.items() if delta]
+    if not whens:
+        return F(field)
+    return F(field) + Case(*whens, default=Value(0), output_field=models.PositiveIntegerField())
+
+
+def write_counts(pending):
+    """
+    Add buffered increments to the resources and their daily buckets.
+
+    Args:
+        pending: Dict of (resource_id, date) -> {'download': n, 'view': n}
+    """
+    totals = defaultdict(lambda: defaultdict(int))
+    for (resource_id, day), counts in pending.items():
+        for kind, count in counts.items():
+            totals[resource_id][kind] += count
+
+    resource_ids = list(totals)
+    with transaction.atomic():
+        for start in range(0, len(resource_ids), FLUSH_BATCH_SIZE):
+            batch = resource_ids[start:start + FLUSH_BATCH_SIZE]
+            Resource.objects.filter(id__in=batch).update(**{
+                field: _increments(field, {resource_id: totals[resource_id][kind] for resource_id in batch})
+                for kind, (field, _) in COUNTER_FIELDS.items()
+            })
+
+        # Resources deleted since the increments were buffered have nothing to count against
+        existing = set(Resource.objects.filter(id__in=resource_ids).values_list('id', flat=True))
+        by_day = defaultdict(dict)
+        for (resource_id, day), counts in pending.items():
+            if resource_id in existing:
+                by_day[day][resource_id] = counts
+
+        for day, rows in by_day.items():
+            ResourceDailyStat.objects.bulk_create(
+                [ResourceDailyStat(resource_id=resource_id, date=day) for resource_id in rows],
+                ignore_conflicts=True
+            )
+            day_ids = list(rows)
+            for start in range(0, len(day_ids), FLUSH_BATCH_SIZE):
+                batch = day_ids[start:start + FLUSH_BATCH_SIZE]
+                ResourceDailyStat.objects.filter(date=day, resource_id__in=batch).update(**{
+                    stat_field: _increments(
+                        stat_field,
+                        {resource_id: rows[resource_id].get(kind, 0) for resource_id in batch},
+                        key='resource_id'
+                    )
+                    for kind, (_, stat_field) in COUNTER_FIELDS.items()
+                })
+
+
+class CounterBuffer:
+    """Thread-safe accumulator of counter increments for one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: defaultdict(int))
+        self._last_flush = time.monotonic()
+        self._timer = None
+
+    def _arm_timer(self):
+        """Schedule a flush for increments that no later request would flush; call with the lock held."""
+        if self._timer is None and self._pending:
+            self._timer = threading.Timer(
+                getattr(settings, 'RESOURCE_COUNTER_FLUSH_INTERVAL', 10), self._flush_on_timer
+            )
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        """Flush from the timer thread and close the connection it opened."""
+        try:
+            self.flush()
+        finally:
+            connection.close()
+
+    def record(self, resource_id, kind, count=1):
+        """Buffer an increment and flush when the interval has passed or the buffer is large."""
+        day = timezone.localdate()
+        with self._lock:
+            self._pending[(resource_id, day)][kind] += count
+            self._arm_timer()
+            due = (
+                time.monotonic() - self._last_flush >= getattr(settings, 'RESOURCE_COUNTER_FLUSH_INTERVAL', 10)
+                or len(self._pending) >= getattr(settings, 'RESOURCE_COUNTER_MAX_PENDING', 1000)
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write every buffered increment to the database.
+
+        Returns:
+            Number of (resource, day) buckets written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+            self._last_flush = time.monotonic()
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        if not pending:
+            return 0
+
+        try:
+            write_counts(pending)
+        except Exception:
+            # Keep the increments for the next flush rather than dropping them
+            logger.exception('Failed to flush resource counters')
+            with self._lock:
+                for key, counts in pending.items():
+                    for kind, count in counts.items():
+                        self._pending[key][kind] += count
+                self._arm_timer()
+            return 0
+        return len(pending)
+
+
+counter_buffer = CounterBuffer()
+atexit.register(counter_buffer.flush)
+
+
+def record_download(resource_id):
+    """Count a download of a resource."""
+    counter_buffer.record(resource_id, 'download')
+
+
+def record_view(resource_id):
+    """Count a view of a resource's details."""
+    counter_buffer.record(resource_id, 'view')
+
+
+def flush_counters():
+    """Write this process's buffered counter increments to the database."""
+    return counter_buffer.flush()
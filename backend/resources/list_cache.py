@@ -0,0 +1,108 @@
+"""
+Shared response cache for the resource list and search endpoints.
+Responses are cached per visibility class rather than per user, so every
+student browsing the same subject page is served one cached copy:
+
+    'public'      students: public resources only
+    'owner:<id>'  teachers: public resources plus their own
+    'all'         staff: every resource
+
+Keys also cover the normalized query string (filters, search, ordering,
+page) and the host the absolute URLs were built for. Each key embeds a
+generation number; saving or deleting a resource bumps it (see
+resources.signals), which retires every cached page at once.
+Download and view counts in cached pages may lag by up to
+RESOURCE_LIST_CACHE_TIMEOUT seconds.
+"""
+
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.response import Response
+
+from .models import Resource
+
+
+GENERATION_KEY = 'resources:list:generation'
+
+
+def get_visibility_class(user):
+    """Get the name of the group of users who see the same resource lists as this user."""
+    if user.is_staff:
+        return 'all'
+    if user.role == 'teacher':
+        return f'owner:{user.id}'
+    return 'public'
+
+
+def visible_resources(user):
+    """Get the resources a user may list; identical for every user of a visibility class."""
+    queryset = Resource.objects.select_related('uploaded_by').all()
+    visibility = get_visibility_class(user)
+    if visibility == 'public':
+        return queryset.filter(is_public=True)
+    if visibility != 'all':
+        return queryset.filter(Q(is_public=True) | Q(uploaded_by=user))
+    return queryset
+
+
+def get_generation():
+    """Get the current list cache generation, starting one if the cache has none."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def bump_generation():
+    """Retire every cached resource list page."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Evicted or never set; any new value differs from the keys still cached
+        cache.add(GENERATION_KEY, 1, None)
+        cache.incr(GENERATION_KEY)
+
+
+def normalize_query(query_params):
+    """Get a canonical query string: sorted parameters, no blanks, page 1 folded into the default."""
+    items = []
+    for name in sorted(query_params):
+        values = sorted(value.strip() for value in query_params.getlist(name) if value.strip())
+        if name == 'page' and values == ['1']:
+            continue
+        items.extend((name, value) for value in values)
+    return urlencode(items)
+
+
+def list_cache_key(request, view_name):
+    """Get the cache key for a list request."""
+    digest = hashlib.sha256(
+        f'{request.scheme}://{request.get_host()}?{normalize_query(request.query_params)}'.encode()
+    ).hexdigest()
+    visibility = get_visibility_class(request.user)
+    return f'resources:list:{get_generation()}:{view_name}:{visibility}:{digest}'
+
+
+class ResourceListCacheMixin:
+    """
+    Serve list responses from the shared cache.
+    The view's get_queryset must start from visible_resources(), so that a
+    cached page never shows one user resources another user cannot see.
+    """
+    list_cache_name = None
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(request, self.list_cache_name or type(self).__name__)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, 'RESOURCE_LIST_CACHE_TIMEOUT', 300))
+        return response
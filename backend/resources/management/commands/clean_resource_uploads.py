@@ -0,0 +1,28 @@
+"""
+Remove abandoned resumable resource uploads and their partial files.
+Intended to run hourly from cron.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from resources.chunked_uploads import expire_upload_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete resource upload sessions that have not received a chunk recently'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=getattr(settings, 'RESOURCE_UPLOAD_SESSION_EXPIRY_HOURS', 24),
+            help='Remove sessions idle for longer than this many hours'
+        )
+
+    def handle(self, *args, **options):
+        removed = expire_upload_sessions(timezone.now() - timedelta(hours=options['hours']))
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} abandoned upload sessions.'))
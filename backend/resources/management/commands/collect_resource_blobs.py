@@ -0,0 +1,17 @@
+"""
+Recount references to content-addressed resource files and remove unused ones.
+Deleting resources already removes their files; this catches blobs left behind
+by queryset updates, interrupted uploads or restored backups.
+"""
+
+from django.core.management.base import BaseCommand
+
+from resources.blobs import collect_blobs
+
+
+class Command(BaseCommand):
+    help = 'Recount resource blob references and delete unreferenced blobs'
+
+    def handle(self, *args, **options):
+        recounted, removed = collect_blobs()
+        self.stdout.write(self.style.SUCCESS(f'Recounted {recounted} blobs, removed {removed}.'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0005_resource_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, help_text="Number of times this resource's details have been viewed"),
+        ),
+        migrations.CreateModel(
+            name='ResourceDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Day the counts belong to')),
+                ('downloads', models.PositiveIntegerField(default=0)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='resources.resource')),
+            ],
+            options={
+                'verbose_name': 'Resource Daily Stat',
+                'verbose_name_plural': 'Resource Daily Stats',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='resources_r_date_206303_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resource', 'date'), name='unique_resource_daily_stat')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0006_resource_views_count_resourcedailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 of the file contents', max_length=64, unique=True)),
+                ('name', models.CharField(help_text='Storage name of the file', max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Number of resources using this file')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Resource Blob',
+                'verbose_name_plural': 'Resource Blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='original_filename',
+            field=models.CharField(blank=True, default='', help_text='Name the file was uploaded with (stored files are named by content hash)', max_length=255),
+        ),
+    ]
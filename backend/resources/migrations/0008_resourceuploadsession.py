@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0007_resourceblob_resource_original_filename'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceUploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('metadata', models.JSONField(default=dict, help_text='Validated resource details (title, description, subject, form_level, is_public)')),
+                ('total_size', models.BigIntegerField(help_text='Declared size of the whole file in bytes')),
+                ('received_size', models.BigIntegerField(default=0, help_text='Bytes received so far (the next chunk offset)')),
+                ('sha256', models.CharField(blank=True, default='', help_text='SHA-256 the client declared for the whole file, checked on finalize', max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0008_resourceuploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, help_text='Stored thumbnail names of an image file, by size'),
+        ),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
 import os
+import uuid
+
+from core.file_delivery import get_upload_hash
+from core.thumbnails import is_image_name, schedule_thumbnails
 
 User = get_user_model()
 
@@ -111,12 +115,37 @@ class Resource(models.Model):
         help_text="Number of times this resource has been downloaded"
     )
     
+    views_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of times this resource's details have been viewed"
+    )
+    
     file_size = models.PositiveIntegerField(
         blank=True,
         null=True,
         help_text="File size in bytes"
     )
     
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 of the file contents, used as the download ETag"
+    )
+    
+    thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Stored thumbnail names of an image file, by size"
+    )
+    
+    original_filename = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Name the file was uploaded with (stored files are named by content hash)"
+    )
+    
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text="When this resource was created"
@@ -155,6 +184,11 @@ class Resource(models.Model):
         # Set resource type based on what's provided
         if self.file:
             self.resource_type = 'file'
+            # Hash newly uploaded contents before they are written to storage
+            if not self.file._committed:
+                self.content_hash = get_upload_hash(self.file)
+                self.original_filename = os.path.basename(self.file.name)[:255]
+            
             # Calculate file size
             if hasattr(self.file, 'size'):
                 self.file_size = self.file.size
@@ -167,8 +201,43 @@ class Resource(models.Model):
         elif self.url:
             self.resource_type = 'url'
             self.file_size = None
+            self.content_hash = ''
+            self.thumbnails = {}
+        
+        from .blobs import store_blob, retain_blob, release_blob
+        from .list_cache import bump_generation
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            previous_name = None
+            if not self._state.adding:
+                previous_name = Resource.objects.filter(pk=self.pk).values_list('file', flat=True).first()
+            
+            # Identical contents share one content-addressed blob
+            new_upload = bool(self.file) and not self.file._committed
+            if new_upload:
+                self.thumbnails = {}
+                self.file.name = store_blob(self.file, self.content_hash)
+                self.file._committed = True
+            elif self.file and self.file.name != previous_name:
+                retain_blob(self.file.name)
+            
+            super().save(*args, **kwargs)
+            
+            # A byte-identical re-upload took a second reference to the blob already in use
+            if previous_name and (new_upload or previous_name != self.file.name):
+                release_blob(previous_name)
+            
+            if new_upload and is_image_name(self.file.name):
+                # Thumbnails live next to the shared blob and are removed with it. They are
+                # recorded with a queryset update, so cached list pages are retired explicitly
+                schedule_thumbnails(Resource, self.pk, 'file', delete_previous=False, on_recorded=bump_generation)
+    
+    @property
+    def download_filename(self):
+        """Name to offer the file under when it is downloaded."""
+        if not self.file:
+            return None
+        return self.original_filename or os.path.basename(self.file.name)
     
     def get_file_extension(self):
         """Get file extension if it's a file upload."""
@@ -188,9 +257,9 @@ class Resource(models.Model):
         return f"{self.file_size:.1f} TB"
     
     def increment_download_count(self):
-        """Increment download count."""
-        self.download_count += 1
-        self.save(update_fields=['download_count'])
+        """Count a download (buffered and written by the next counter flush)."""
+        from .counters import record_download
+        record_download(self.id)
     
 
     def is_accessible_by(self, user):
@@ -198,3 +267,118 @@ class Resource(models.Model):
         if self.is_public:
             return True
         return self.uploaded_by == user or user.is_staff
+
+
+class ResourceBlob(models.Model):
+    """
+    A stored file shared by every resource with the same contents.
+    Managed by resources.blobs; ref_count is the number of resources using it.
+    """
+    
+    content_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="SHA-256 of the file contents"
+    )
+    
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Storage name of the file"
+    )
+    
+    size = models.PositiveBigIntegerField(default=0)
+    
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of resources using this file"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Resource Blob'
+        verbose_name_plural = 'Resource Blobs'
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+
+class ResourceDailyStat(models.Model):
+    """
+    Per-day download and view totals for a resource.
+    Rows are written by the counter flush in resources.counters.
+    """
+    
+    resource = models.ForeignKey(
+        Resource,
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    
+    date = models.DateField(
+        help_text="Day the counts belong to"
+    )
+    
+    downloads = models.PositiveIntegerField(default=0)
+    
+    views = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date']
+        verbose_name = 'Resource Daily Stat'
+        verbose_name_plural = 'Resource Daily Stats'
+        constraints = [
+            models.UniqueConstraint(fields=['resource', 'date'], name='unique_resource_daily_stat'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+    
+    def __str__(self):
+        return f"{self.resource_id} on {self.date}: {self.downloads} downloads, {self.views} views"
+
+
+class ResourceUploadSession(models.Model):
+    """
+    A resumable, chunked upload of a resource file.
+    The resource's details are validated when the session is opened; chunks are
+    appended to a working file until the upload is finalized into a Resource.
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='resource_upload_sessions'
+    )
+    
+    filename = models.CharField(max_length=255)
+    
+    metadata = models.JSONField(
+        default=dict,
+        help_text="Validated resource details (title, description, subject, form_level, is_public)"
+    )
+    
+    total_size = models.BigIntegerField(help_text="Declared size of the whole file in bytes")
+    
+    received_size = models.BigIntegerField(default=0, help_text="Bytes received so far (the next chunk offset)")
+    
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 the client declared for the whole file, checked on finalize"
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.filename} ({self.received_size}/{self.total_size})"
+    
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
+
+from core.thumbnails import preview_type, thumbnail_urls
 from .models import Resource
 
 User = get_user_model()
@@ -25,6 +27,8 @@ class ResourceSerializer(serializers.ModelSerializer):
     
     file_url = serializers.SerializerMethodField()
     is_accessible = serializers.SerializerMethodField()
+    thumbnails = serializers.SerializerMethodField()
+    preview_type = serializers.SerializerMethodField()
     
     class Meta:
         model = Resource
@@ -33,15 +37,15 @@ class ResourceSerializer(serializers.ModelSerializer):
             'uploaded_by', 'uploaded_by_id', 'uploaded_by_username', 
             'uploaded_by_email', 'uploaded_by_role',
             'subject', 'subject_display', 'form_level', 'form_level_display',
-            'is_public', 'download_count', 'file_size', 'file_size_display',
-            'file_extension', 'file_url', 'is_accessible',
+            'is_public', 'download_count', 'views_count', 'file_size', 'file_size_display',
+            'file_extension', 'file_url', 'is_accessible', 'thumbnails', 'preview_type',
             'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'uploaded_by', 'uploaded_by_id', 'uploaded_by_username',
-            'uploaded_by_email', 'uploaded_by_role', 'download_count',
+            'uploaded_by_email', 'uploaded_by_role', 'download_count', 'views_count',
             'file_size', 'file_extension', 'file_size_display', 'form_level_display',
-            'is_accessible', 'created_at', 'updated_at'
+            'is_accessible', 'thumbnails', 'preview_type', 'created_at', 'updated_at'
         ]
     
     def get_file_url(self, obj):
@@ -59,6 +63,18 @@ class ResourceSerializer(serializers.ModelSerializer):
         if request and hasattr(request, 'user'):
             return obj.is_accessible_by(request.user)
         return obj.is_public
+    
+    def get_thumbnails(self, obj):
+        """Get thumbnail URLs by size for image files ({} until they have been generated)."""
+        if not obj.file or obj.resource_type != 'file':
+            return {}
+        return thumbnail_urls(obj.file, obj.thumbnails, self.context.get('request'))
+    
+    def get_preview_type(self, obj):
+        """Get the kind of preview to show: a thumbnail for images, a placeholder otherwise."""
+        if obj.resource_type == 'url' or not obj.file:
+            return 'link'
+        return preview_type(name=obj.file.name)
 
 
 class ResourceCreateSerializer(serializers.ModelSerializer):
@@ -161,6 +177,19 @@ class ResourceCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+class ResourceUploadMetadataSerializer(ResourceCreateSerializer):
+    """
+    Validates a resource's details when a chunked upload is opened,
+    before any of the file has been sent.
+    """
+    
+    class Meta(ResourceCreateSerializer.Meta):
+        fields = ['title', 'description', 'subject', 'form_level', 'is_public']
+    
+    def validate(self, attrs):
+        return attrs
+
+
 class ResourceUpdateSerializer(serializers.ModelSerializer):
     """
     Serializer for updating existing resources.
@@ -270,14 +299,19 @@ class ResourceListSerializer(serializers.ModelSerializer):
     file_extension = serializers.CharField(source='get_file_extension', read_only=True)
     file_size_display = serializers.CharField(source='get_file_size_display', read_only=True)
     form_level_display = serializers.CharField(source='get_form_level_display', read_only=True)
+    thumbnails = serializers.SerializerMethodField()
+    preview_type = serializers.SerializerMethodField()
     
     class Meta:
         model = Resource
         fields = [
             'id', 'title', 'description', 'resource_type', 'subject', 'subject_display',
             'uploaded_by_username', 'form_level', 'form_level_display', 'is_public', 'download_count',
-            'file_extension', 'file_size_display', 'created_at'
+            'file_extension', 'file_size_display', 'thumbnails', 'preview_type', 'created_at'
         ]
+    
+    get_thumbnails = ResourceSerializer.get_thumbnails
+    get_preview_type = ResourceSerializer.get_preview_type
 
 
 class ResourceDownloadSerializer(serializers.Serializer):
@@ -0,0 +1,33 @@
+"""
+Signal handlers for resources.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Resource
+from .blobs import release_blob
+from .list_cache import bump_generation
+from .stats import invalidate_resource_stats
+
+
+@receiver(post_delete, sender=Resource)
+def release_resource_file(sender, instance, **kwargs):
+    """Drop the deleted resource's reference to its stored file (removing the file if it was the last)."""
+    if instance.file:
+        release_blob(instance.file.name)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def refresh_resource_stats(sender, **kwargs):
+    """Recompute the admin statistics once the change is committed."""
+    transaction.on_commit(invalidate_resource_stats)
+
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def refresh_resource_lists(sender, **kwargs):
+    """Retire cached list and search pages once the change is committed."""
+    transaction.on_commit(bump_generation)
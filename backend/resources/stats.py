@@ -0,0 +1,71 @@
+"""
+Catalog statistics for the admin resource stats endpoint.
+The totals come from one conditional-aggregation query and the subject
+breakdown from one GROUP BY; the result is cached and dropped whenever a
+resource is saved or deleted (see resources.signals). Download totals written
+by the counter flush (queryset updates, no signals) show up when the cache
+expires after RESOURCE_STATS_CACHE_TIMEOUT seconds.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Resource
+
+
+STATS_CACHE_KEY = 'resources:stats'
+RECENT_DAYS = 7
+TOP_RESOURCES = 5
+
+
+def compute_resource_stats():
+    """
+    Aggregate the catalog without loading resource rows.
+
+    Returns:
+        Dict of totals, the subject breakdown and the ids of the most downloaded resources
+    """
+    recent_cutoff = timezone.now() - timedelta(days=RECENT_DAYS)
+    totals = Resource.objects.aggregate(
+        total_resources=Count('id'),
+        public_resources=Count('id', filter=Q(is_public=True)),
+        file_resources=Count('id', filter=Q(resource_type='file')),
+        url_resources=Count('id', filter=Q(resource_type='url')),
+        total_downloads=Coalesce(Sum('download_count'), 0),
+        recent_resources=Count('id', filter=Q(created_at__gte=recent_cutoff)),
+    )
+    totals['private_resources'] = totals['total_resources'] - totals['public_resources']
+
+    subject_counts = dict(
+        Resource.objects.order_by().values_list('subject').annotate(count=Count('id'))
+    )
+    # Keep the order of SUBJECT_CHOICES and leave out subjects without resources
+    totals['subject_breakdown'] = {
+        subject_name: subject_counts[subject_code]
+        for subject_code, subject_name in Resource.SUBJECT_CHOICES
+        if subject_counts.get(subject_code)
+    }
+
+    totals['top_resource_ids'] = list(
+        Resource.objects.order_by('-download_count', '-id').values_list('id', flat=True)[:TOP_RESOURCES]
+    )
+    return totals
+
+
+def get_resource_stats():
+    """Get the catalog statistics, computing them only when the cache is empty."""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_resource_stats()
+        cache.set(STATS_CACHE_KEY, stats, getattr(settings, 'RESOURCE_STATS_CACHE_TIMEOUT', 60))
+    return stats
+
+
+def invalidate_resource_stats():
+    """Drop the cached statistics so the next request recomputes them."""
+    cache.delete(STATS_CACHE_KEY)
@@ -1,3 +1,786 @@
-from django.test import TestCase
+"""
+Tests for resource downloads.
+"""
 
-# Create your tests here.
+import asyncio
+import hashlib
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from asgiref.sync import async_to_sync
+from PIL import Image
+from channels.layers import get_channel_layer
+from rest_framework.test import APIClient
+
+from core.chunked_upload import ChunkError, UploadSessionGone, append_chunk, discard_staged_chunk, stage_chunk
+
+from .models import Resource, ResourceBlob, ResourceDailyStat, ResourceUploadSession
+from .blobs import collect_blobs, get_blob_storage
+from .chunked_uploads import finalize_upload
+from .counters import counter_buffer, flush_counters, record_download
+
+User = get_user_model()
+
+
+class ResourceTestMixin:
+    """Shared setup: a teacher's public PDF resource in a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        cache.clear()
+        # Write increments left buffered by a test before its transaction is rolled back
+        self.addCleanup(flush_counters)
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = self.settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.teacher = User.objects.create_user(
+            username='teacher', email='teacher@test.com', password='testpass123', role='teacher'
+        )
+        self.student = User.objects.create_user(
+            username='student', email='student@test.com', password='testpass123', role='student'
+        )
+        self.content = b'%PDF-1.4 ' + bytes(range(256)) * 8
+        self.resource = Resource.objects.create(
+            title='Algebra notes',
+            description='Chapter one',
+            subject='mathematics',
+            uploaded_by=self.teacher,
+            file=SimpleUploadedFile('algebra.pdf', self.content, content_type='application/pdf')
+        )
+        self.client.force_authenticate(self.student)
+
+    def download_url(self):
+        return f'/api/resources/{self.resource.id}/download/'
+
+
+class ResourceDeliveryTests(ResourceTestMixin, TestCase):
+    """Test cases for offloaded download delivery."""
+
+    def test_default_backend_streams_file(self):
+        """Without an offloading backend Django streams the file itself."""
+        response = self.client.get(self.download_url())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    @override_settings(FILE_DELIVERY_BACKEND='nginx', FILE_DELIVERY_INTERNAL_PREFIX='/protected-media/')
+    def test_nginx_backend_sends_internal_redirect(self):
+        """The nginx backend returns headers only and leaves the transfer to the web server."""
+        response = self.client.get(self.download_url())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.resource.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('attachment; filename="algebra.pdf"', response['Content-Disposition'])
+
+    @override_settings(FILE_DELIVERY_BACKEND='sendfile')
+    def test_sendfile_backend_sends_path(self):
+        """The sendfile backend names the file's absolute path."""
+        response = self.client.get(self.download_url())
+
+        self.assertEqual(response['X-Sendfile'], self.resource.file.path)
+
+    @override_settings(FILE_DELIVERY_BACKEND='nginx')
+    def test_offloaded_ranges_count_once(self):
+        """The web server applies Range, so only requests starting at byte 0 count as downloads."""
+        flush_counters()
+        self.client.get(self.download_url())
+        self.client.get(self.download_url(), HTTP_RANGE='bytes=0-99')
+        self.client.get(self.download_url(), HTTP_RANGE='bytes=100-')
+        self.client.get(self.download_url(), HTTP_RANGE='bytes=-100')
+
+        flush_counters()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 2)
+
+    @override_settings(FILE_DELIVERY_BACKEND='nginx')
+    def test_private_resource_is_not_offloaded(self):
+        """The permission check runs before any delivery header is set."""
+        Resource.objects.filter(id=self.resource.id).update(is_public=False)
+
+        response = self.client.get(self.download_url())
+
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('X-Accel-Redirect', response)
+
+
+class ResourceConditionalRangeTests(ResourceTestMixin, TestCase):
+    """Test cases for ETag revalidation and byte-range downloads."""
+
+    def test_etag_is_content_hash_and_revalidates(self):
+        """The strong ETag comes from the stored hash; a matching If-None-Match gets 304."""
+        response = self.client.get(self.download_url())
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{self.resource.content_hash}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        revalidated = self.client.get(self.download_url(), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(revalidated.status_code, 304)
+        flush_counters()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 1)
+
+    def test_echoed_last_modified_matches(self):
+        """The Last-Modified value sent back revalidates with 304 and passes If-Unmodified-Since."""
+        last_modified = self.client.get(self.download_url())['Last-Modified']
+
+        revalidated = self.client.get(self.download_url(), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(revalidated.status_code, 304)
+
+        response = self.client.get(self.download_url(), HTTP_IF_UNMODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_single_range(self):
+        """A single range is answered with 206 and only the requested bytes."""
+        response = self.client.get(self.download_url(), HTTP_RANGE='bytes=100-199')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+    def test_multiple_ranges(self):
+        """Several ranges come back as multipart/byteranges parts."""
+        response = self.client.get(self.download_url(), HTTP_RANGE='bytes=0-9,-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        body = b''.join(response.streaming_content)
+        self.assertEqual(len(body), int(response['Content-Length']))
+        self.assertIn(self.content[:10], body)
+        self.assertIn(f'Content-Range: bytes {len(self.content) - 5}-{len(self.content) - 1}'.encode(), body)
+
+    def test_unsatisfiable_range_and_stale_if_range(self):
+        """Ranges past the end get 416; a stale If-Range gets the whole file."""
+        response = self.client.get(self.download_url(), HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        response = self.client.get(self.download_url(), HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_later_ranges_do_not_count_as_downloads(self):
+        """Only the range starting at byte 0 increments the download count."""
+        self.client.get(self.download_url(), HTTP_RANGE='bytes=0-99')
+        self.client.get(self.download_url(), HTTP_RANGE='bytes=100-199')
+
+        flush_counters()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 1)
+
+
+@override_settings(RESOURCE_COUNTER_FLUSH_INTERVAL=3600)
+class ResourceCounterTests(ResourceTestMixin, TestCase):
+    """Test cases for the write-behind download and view counters."""
+
+    def test_downloads_are_buffered_until_flush(self):
+        """Downloads do not touch the row until the buffer is flushed in one statement per table."""
+        flush_counters()
+        for _ in range(3):
+            self.client.get(self.download_url())
+
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 0)
+
+        flush_counters()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 3)
+
+    def test_detail_view_counts_views(self):
+        """Retrieving a resource increments views_count."""
+        response = self.client.get(f'/api/resources/{self.resource.id}/')
+        self.assertEqual(response.status_code, 200)
+
+        flush_counters()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.resource.views_count, 1)
+        self.assertEqual(self.resource.download_count, 0)
+
+    def test_flush_batches_resources_and_records_daily_buckets(self):
+        """One flush updates every resource with its own increment and adds to today's bucket."""
+        other = Resource.objects.create(
+            title='Geometry notes',
+            subject='mathematics',
+            uploaded_by=self.teacher,
+            url='https://example.com/geometry'
+        )
+        flush_counters()
+        for _ in range(2):
+            record_download(self.resource.id)
+        record_download(other.id)
+
+        with self.assertNumQueries(6):
+            # Savepoint, resource UPDATE, existence check, bucket insert, bucket UPDATE, release
+            self.assertEqual(flush_counters(), 2)
+
+        record_download(other.id)
+        flush_counters()
+
+        self.resource.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.resource.download_count, 2)
+        self.assertEqual(other.download_count, 2)
+        self.assertEqual(ResourceDailyStat.objects.get(resource=other).downloads, 2)
+        self.assertEqual(ResourceDailyStat.objects.get(resource=self.resource).downloads, 2)
+
+    def test_increments_for_deleted_resources_are_dropped(self):
+        """A resource deleted before the flush does not break it."""
+        flush_counters()
+        record_download(self.resource.id)
+        Resource.objects.filter(id=self.resource.id).delete()
+
+        flush_counters()
+
+        self.assertFalse(ResourceDailyStat.objects.exists())
+        self.assertEqual(counter_buffer.flush(), 0)
+
+    def test_first_increment_arms_a_flush_timer(self):
+        """An idle worker's increments are flushed by a timer; a flush disarms it."""
+        flush_counters()
+        with self.settings(RESOURCE_COUNTER_FLUSH_INTERVAL=30):
+            record_download(self.resource.id)
+            timer = counter_buffer._timer
+            record_download(self.resource.id)
+
+        self.assertTrue(timer.is_alive())
+        self.assertEqual(timer.interval, 30)
+        self.assertIs(counter_buffer._timer, timer)
+
+        self.assertEqual(flush_counters(), 1)
+        timer.join(1)
+        self.assertFalse(timer.is_alive())
+        self.assertIsNone(counter_buffer._timer)
+
+
+class ResourceBlobTests(ResourceTestMixin, TestCase):
+    """Test cases for content-addressed, deduplicated resource files."""
+
+    def upload_copy(self, filename='past-paper.pdf'):
+        return Resource.objects.create(
+            title='Same notes',
+            subject='mathematics',
+            uploaded_by=self.teacher,
+            file=SimpleUploadedFile(filename, self.content, content_type='application/pdf')
+        )
+
+    def test_file_is_named_by_content_hash(self):
+        """The stored name fans out by hash; the upload name is kept for downloads."""
+        digest = self.resource.content_hash
+        self.assertEqual(self.resource.file.name, f'resources/blobs/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+        self.assertEqual(self.resource.original_filename, 'algebra.pdf')
+
+        response = self.client.get(self.download_url())
+        self.assertIn('filename="algebra.pdf"', response['Content-Disposition'])
+
+    def test_identical_uploads_share_one_blob(self):
+        """A second upload of the same bytes reuses the stored file."""
+        copy = self.upload_copy()
+
+        self.assertEqual(copy.file.name, self.resource.file.name)
+        self.assertEqual(copy.download_filename, 'past-paper.pdf')
+        blob = ResourceBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(len(get_blob_storage().listdir(self.resource.file.name.rsplit('/', 1)[0])[1]), 1)
+
+    def test_blob_is_removed_with_its_last_resource(self):
+        """Deleting resources drops references; the file goes with the last one."""
+        copy = self.upload_copy()
+        storage = get_blob_storage()
+        name = copy.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource.delete()
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(ResourceBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            copy.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ResourceBlob.objects.exists())
+
+    def test_replacing_file_releases_previous_blob(self):
+        """Saving a resource with new contents releases the blob it used before."""
+        old_name = self.resource.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource.file = SimpleUploadedFile('revised.pdf', b'%PDF-1.4 revised', content_type='application/pdf')
+            self.resource.save()
+
+        self.assertFalse(get_blob_storage().exists(old_name))
+        self.assertEqual(ResourceBlob.objects.get().name, self.resource.file.name)
+
+    def test_reuploading_same_contents_keeps_one_reference(self):
+        """Uploading the bytes a resource already holds leaves the blob count unchanged."""
+        name = self.resource.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource.file = SimpleUploadedFile('algebra-v2.pdf', self.content, content_type='application/pdf')
+            self.resource.save()
+
+        self.assertEqual(self.resource.file.name, name)
+        self.assertEqual(ResourceBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource.delete()
+        self.assertFalse(get_blob_storage().exists(name))
+        self.assertFalse(ResourceBlob.objects.exists())
+
+    def test_collect_blobs_recounts_references(self):
+        """Collection fixes counts that drifted and removes blobs nothing uses."""
+        ResourceBlob.objects.update(ref_count=5)
+        copy = self.upload_copy()
+        Resource.objects.filter(id=copy.id).update(url='https://example.com', file=None, resource_type='url')
+
+        self.assertEqual(collect_blobs(), (1, 0))
+        self.assertEqual(ResourceBlob.objects.get().ref_count, 1)
+
+
+class ResourceChunkedUploadTests(ResourceTestMixin, TestCase):
+    """Test cases for resumable chunked resource uploads."""
+
+    def setUp(self):
+        super().setUp()
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir, ignore_errors=True)
+        settings_override = self.settings(CHUNKED_UPLOAD_DIR=self.upload_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client.force_authenticate(self.teacher)
+        self.data = b'%PDF-1.4 ' + b'past paper ' * 100
+
+    def start_upload(self, **extra):
+        return self.client.post('/api/resources/uploads/', {
+            'title': 'Past paper 2024',
+            'description': 'Mathematics paper one',
+            'subject': 'mathematics',
+            'form_level': 'Form 4',
+            'filename': 'paper.pdf',
+            'total_size': len(self.data),
+            **extra
+        }, format='json')
+
+    def put_chunk(self, upload_id, data, offset):
+        return self.client.put(
+            f'/api/resources/uploads/{upload_id}/', data=data,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunks_resume_and_finalize_into_resource(self):
+        """Chunks must arrive at the acknowledged offset; finalize creates the resource."""
+        start = self.start_upload(sha256=hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(start.status_code, 201)
+        upload_id = start.data['upload_id']
+
+        self.assertEqual(self.put_chunk(upload_id, self.data[:500], 0).data['offset'], 500)
+        retry = self.put_chunk(upload_id, self.data[:500], 0)
+        self.assertEqual(retry.status_code, 409)
+        self.assertEqual(retry.data['offset'], 500)
+        self.assertEqual(self.client.get(f'/api/resources/uploads/{upload_id}/')['Upload-Offset'], '500')
+
+        early = self.client.post(f'/api/resources/uploads/{upload_id}/finalize/')
+        self.assertEqual(early.status_code, 409)
+
+        self.put_chunk(upload_id, self.data[500:], 500)
+        response = self.client.post(f'/api/resources/uploads/{upload_id}/finalize/')
+
+        self.assertEqual(response.status_code, 201)
+        resource = Resource.objects.get(id=response.data['id'])
+        self.assertEqual(resource.title, 'Past paper 2024')
+        self.assertEqual(resource.uploaded_by, self.teacher)
+        self.assertEqual(resource.original_filename, 'paper.pdf')
+        self.assertEqual(resource.content_hash, hashlib.sha256(self.data).hexdigest())
+        self.assertEqual(resource.file.read(), self.data)
+        self.assertFalse(ResourceUploadSession.objects.exists())
+
+    def test_hash_mismatch_resets_upload(self):
+        """A file that does not match the declared SHA-256 is discarded and must be resent."""
+        upload_id = self.start_upload(sha256='0' * 64).data['upload_id']
+        self.put_chunk(upload_id, self.data, 0)
+
+        response = self.client.post(f'/api/resources/uploads/{upload_id}/finalize/')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(ResourceUploadSession.objects.get().received_size, 0)
+        self.assertEqual(Resource.objects.count(), 1)
+
+    def test_finalize_retry_does_not_create_a_second_resource(self):
+        """A finalize that loses the race finds the session gone instead of creating a duplicate."""
+        upload_id = self.start_upload().data['upload_id']
+        self.put_chunk(upload_id, self.data, 0)
+        stale_session = ResourceUploadSession.objects.get(id=upload_id)
+
+        self.assertEqual(self.client.post(f'/api/resources/uploads/{upload_id}/finalize/').status_code, 201)
+        with self.assertRaises(UploadSessionGone):
+            finalize_upload(stale_session, None)
+        self.assertEqual(Resource.objects.filter(title='Past paper 2024').count(), 1)
+        self.assertEqual(self.client.post(f'/api/resources/uploads/{upload_id}/finalize/').status_code, 404)
+
+    def test_empty_chunk_is_rejected(self):
+        """A PUT without a body is a bad request, not a server error."""
+        upload_id = self.start_upload().data['upload_id']
+
+        self.assertEqual(self.put_chunk(upload_id, b'', 0).status_code, 400)
+        self.assertEqual(self.client.get(f'/api/resources/uploads/{upload_id}/')['Upload-Offset'], '0')
+
+    def test_chunk_is_staged_before_the_offset_is_claimed(self):
+        """Two requests for the same offset both stream; only the first to take the lock is appended."""
+        upload_id = self.start_upload().data['upload_id']
+        first = stage_chunk(upload_id, 0, 0, len(self.data), io.BytesIO(self.data[:500]))
+        second = stage_chunk(upload_id, 0, 0, len(self.data), io.BytesIO(self.data[:500]))
+        self.addCleanup(discard_staged_chunk, first)
+        self.addCleanup(discard_staged_chunk, second)
+
+        self.assertEqual(append_chunk(upload_id, 0, 0, first), 500)
+        with self.assertRaises(ChunkError) as error:
+            append_chunk(upload_id, 0, 500, second)
+        self.assertEqual(error.exception.offset, 500)
+
+    def test_blocked_type_is_refused_when_finalized(self):
+        """Chunked uploads get the same magic-byte check as multipart ones."""
+        self.data = b'MZ\x90\x00\x03\x00\x00\x00' + bytes(1024)
+        upload_id = self.start_upload().data['upload_id']
+        self.put_chunk(upload_id, self.data, 0)
+
+        response = self.client.post(f'/api/resources/uploads/{upload_id}/finalize/')
+
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(response.json()['code'], 'FILE_TYPE_NOT_ALLOWED')
+        self.assertFalse(ResourceUploadSession.objects.exists())
+        self.assertEqual(Resource.objects.count(), 1)
+
+    def test_details_are_validated_before_upload(self):
+        """Invalid details or disallowed extensions are rejected when the session is opened."""
+        self.assertEqual(self.start_upload(title='ab').status_code, 400)
+        self.assertEqual(self.start_upload(filename='tool.exe').status_code, 400)
+        self.assertEqual(self.start_upload(total_size=60 * 1024 * 1024).status_code, 400)
+        self.assertFalse(ResourceUploadSession.objects.exists())
+
+    def test_sessions_belong_to_their_teacher(self):
+        """Other users cannot see or append to a session; students cannot open one."""
+        upload_id = self.start_upload().data['upload_id']
+        other = User.objects.create_user(
+            username='teacher2', email='teacher2@test.com', password='testpass123', role='teacher'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.put_chunk(upload_id, self.data, 0).status_code, 404)
+
+        self.client.force_authenticate(self.student)
+        self.assertEqual(self.start_upload().status_code, 403)
+
+
+@override_settings(UPLOAD_PROGRESS_MIN_INTERVAL=3600)
+class UploadProgressTests(ResourceTestMixin, TestCase):
+    """Test cases for live upload progress."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.teacher)
+        self.channel_layer = get_channel_layer()
+        self.channel_name = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(f'notifications_{self.teacher.id}', self.channel_name)
+        self.addCleanup(
+            async_to_sync(self.channel_layer.group_discard), f'notifications_{self.teacher.id}', self.channel_name
+        )
+
+    def received_states(self):
+        async def drain():
+            states = []
+            while True:
+                try:
+                    event = await asyncio.wait_for(self.channel_layer.receive(self.channel_name), timeout=0.5)
+                except asyncio.TimeoutError:
+                    return states
+                states.append(event['progress']['state'])
+        return async_to_sync(drain)()
+
+    def test_multipart_upload_publishes_progress(self):
+        """An upload with X-Upload-ID is pollable and pushed to the uploader's notification group."""
+        response = self.client.post('/api/resources/', {
+            'title': 'Past paper 2024',
+            'description': 'Mathematics paper one',
+            'subject': 'mathematics',
+            'form_level': 'Form 4',
+            'file': SimpleUploadedFile('paper.pdf', self.content, content_type='application/pdf'),
+        }, format='multipart', HTTP_X_UPLOAD_ID='paper-upload-1')
+        self.assertEqual(response.status_code, 201)
+
+        progress = self.client.get('/api/resources/uploads/progress/paper-upload-1/')
+        self.assertEqual(progress.status_code, 200)
+        self.assertEqual(progress.data['state'], 'complete')
+        self.assertEqual(progress.data['percent'], 100)
+        self.assertEqual(progress.data['resource_id'], response.data['id'])
+
+        # Throttled chunk updates are dropped; state changes are always sent
+        self.assertEqual(self.received_states(), ['uploading', 'received', 'complete'])
+
+    def test_chunked_session_progress(self):
+        """Chunked sessions report progress under their session id."""
+        upload_id = self.client.post('/api/resources/uploads/', {
+            'title': 'Past paper 2024',
+            'description': 'Mathematics paper one',
+            'subject': 'mathematics',
+            'form_level': 'Form 4',
+            'filename': 'paper.pdf',
+            'total_size': 10,
+        }, format='json').data['upload_id']
+        self.client.put(
+            f'/api/resources/uploads/{upload_id}/', data=b'%PDF-',
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET='0'
+        )
+
+        progress = self.client.get(f'/api/resources/uploads/progress/{upload_id}/')
+
+        self.assertEqual(progress.data['state'], 'uploading')
+        self.assertEqual(progress.data['percent'], 50)
+
+    def test_progress_is_private_to_the_uploader(self):
+        """Another user cannot poll someone else's upload."""
+        cache.set('upload_progress:someone-else', {'user_id': self.student.id, 'state': 'uploading'})
+
+        response = self.client.get('/api/resources/uploads/progress/someone-else/')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class StreamingUploadHandlerTests(ResourceTestMixin, TestCase):
+    """Test cases for the single-pass upload handler."""
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.teacher)
+
+    def post_file(self, name, content, **extra):
+        return self.client.post('/api/resources/', {
+            'title': 'Past paper 2024',
+            'description': 'Mathematics paper one',
+            'subject': 'mathematics',
+            'form_level': 'Form 4',
+            'file': SimpleUploadedFile(name, content, content_type='application/pdf'),
+        }, format='multipart', **extra)
+
+    def test_hash_is_recorded_while_streaming(self):
+        """The stored hash comes from the handler; the file is not read again to hash it."""
+        with mock.patch('core.file_delivery.compute_content_hash') as compute:
+            response = self.post_file('paper.pdf', self.content)
+
+        self.assertEqual(response.status_code, 201)
+        compute.assert_not_called()
+        resource = Resource.objects.get(id=response.data['id'])
+        self.assertEqual(resource.content_hash, hashlib.sha256(self.content).hexdigest())
+
+    @override_settings(MAX_UPLOAD_SIZE=1024)
+    def test_oversized_upload_is_refused_with_413(self):
+        """A file over MAX_UPLOAD_SIZE is refused while streaming."""
+        response = self.post_file('paper.pdf', self.content)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()['code'], 'FILE_TOO_LARGE')
+        self.assertEqual(Resource.objects.count(), 1)
+
+    @override_settings(MAX_UPLOAD_SIZE=1024)
+    def test_large_request_is_refused_before_reading(self):
+        """A request body far beyond the limit is refused from its Content-Length alone."""
+        with mock.patch('resources.upload_handlers.MediaProbe') as probe:
+            response = self.post_file('paper.pdf', b'%PDF-1.4 ' + b'0' * (2 * 1024 * 1024))
+
+        self.assertEqual(response.status_code, 413)
+        probe.assert_not_called()
+
+    def test_executable_is_refused_by_magic_bytes(self):
+        """A Windows executable renamed to .pdf is refused with 415."""
+        executable = b'MZ\x90\x00\x03\x00\x00\x00' + bytes(1024)
+
+        response = self.post_file('notes.pdf', executable)
+
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(response.json()['code'], 'FILE_TYPE_NOT_ALLOWED')
+
+
+@override_settings(THUMBNAILS_ASYNC=False, THUMBNAIL_WORKERS=0)
+class ResourceThumbnailTests(ResourceTestMixin, TestCase):
+    """Test cases for image thumbnails rendered after upload."""
+
+    def upload_image(self, filename='diagram.png', size=(1200, 800)):
+        output = io.BytesIO()
+        Image.new('RGB', size, (30, 120, 200)).save(output, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            resource = Resource.objects.create(
+                title='Cell diagram',
+                subject='biology',
+                uploaded_by=self.teacher,
+                file=SimpleUploadedFile(filename, output.getvalue(), content_type='image/png')
+            )
+        resource.refresh_from_db()
+        return resource
+
+    def test_image_upload_gets_thumbnails(self):
+        """Every configured size is stored as WebP within its bounding box and listed by URL."""
+        resource = self.upload_image()
+        storage = get_blob_storage()
+
+        self.assertEqual(set(resource.thumbnails), {'small', 'medium'})
+        with storage.open(resource.thumbnails['small']) as file, Image.open(file) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (160, 107))
+
+        response = self.client.get('/api/resources/')
+        listed = next(item for item in response.data['results'] if item['id'] == resource.id)
+        self.assertEqual(listed['preview_type'], 'image')
+        self.assertTrue(listed['thumbnails']['small'].endswith('.webp'))
+
+    def test_documents_get_a_placeholder_type(self):
+        """Files Pillow cannot read get no thumbnails, only a preview type."""
+        response = self.client.get(f'/api/resources/{self.resource.id}/')
+
+        self.assertEqual(response.data['thumbnails'], {})
+        self.assertEqual(response.data['preview_type'], 'pdf')
+
+    def test_thumbnails_are_removed_with_the_blob(self):
+        """Shared thumbnails live as long as the image they were rendered from."""
+        resource = self.upload_image()
+        storage = get_blob_storage()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resource.delete()
+        for name in resource.thumbnails.values():
+            self.assertFalse(storage.exists(name))
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_thumbnails_render_in_a_worker_process(self):
+        """With workers configured the image is resized outside the request process."""
+        resource = self.upload_image(size=(300, 300))
+
+        self.assertEqual(set(resource.thumbnails), {'small', 'medium'})
+
+
+class ResourceStatsTests(ResourceTestMixin, TestCase):
+    """Test cases for the cached admin resource statistics."""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@test.com', password='testpass123', is_staff=True
+        )
+        self.client.force_authenticate(self.admin)
+        for index, subject in enumerate(['mathematics', 'science', 'science']):
+            Resource.objects.create(
+                title=f'Link {index}', subject=subject, uploaded_by=self.teacher,
+                url=f'https://example.com/{index}', is_public=index != 2, download_count=index + 1
+            )
+
+    def test_stats_are_aggregated_in_the_database(self):
+        """Totals and the subject breakdown take a fixed number of queries, whatever the catalog size."""
+        with self.assertNumQueries(4):
+            # Aggregate, GROUP BY subject, top resource ids, top resource rows
+            response = self.client.get('/api/resources/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_resources'], 4)
+        self.assertEqual(response.data['private_resources'], 1)
+        self.assertEqual(response.data['url_resources'], 3)
+        self.assertEqual(response.data['total_downloads'], 6)
+        self.assertEqual(response.data['subject_breakdown'], {'Mathematics': 2, 'Science': 2})
+        self.assertEqual([item['title'] for item in response.data['top_resources'][:2]], ['Link 2', 'Link 1'])
+
+    def test_stats_are_cached_until_the_catalog_changes(self):
+        """Repeated requests use the cache; saving a resource refreshes it."""
+        self.client.get('/api/resources/stats/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/resources/stats/')
+        self.assertEqual(response.data['total_resources'], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Resource.objects.create(
+                title='Reading list', subject='english', uploaded_by=self.teacher, url='https://example.com/books'
+            )
+        response = self.client.get('/api/resources/stats/')
+        self.assertEqual(response.data['total_resources'], 5)
+        self.assertEqual(response.data['subject_breakdown']['English'], 1)
+
+
+class ResourceListCacheTests(ResourceTestMixin, TestCase):
+    """Test cases for the shared resource list response cache."""
+
+    def setUp(self):
+        super().setUp()
+        self.other_student = User.objects.create_user(
+            username='student2', email='student2@test.com', password='testpass123', role='student'
+        )
+        self.private = Resource.objects.create(
+            title='Marking scheme', subject='mathematics', uploaded_by=self.teacher,
+            url='https://example.com/marking', is_public=False
+        )
+
+    def list_titles(self, user, query=''):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'/api/resources/{query}')
+        self.assertEqual(response.status_code, 200)
+        return [item['title'] for item in response.data['results']]
+
+    def test_students_share_one_cached_page(self):
+        """A second student asking for the same filters, in any order, is served from the cache."""
+        self.list_titles(self.student, '?subject=mathematics&ordering=title')
+
+        self.client.force_authenticate(self.other_student)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/resources/?ordering=title&subject=mathematics&page=1')
+        self.assertEqual([item['title'] for item in response.data['results']], ['Algebra notes'])
+
+    def test_cached_pages_follow_visibility(self):
+        """Teachers see their private resources; a student's cached page never shows them."""
+        self.assertEqual(self.list_titles(self.teacher), ['Marking scheme', 'Algebra notes'])
+        self.assertEqual(self.list_titles(self.student), ['Algebra notes'])
+
+        colleague = User.objects.create_user(username='colleague', password='testpass123', role='teacher')
+        self.assertEqual(self.list_titles(colleague), ['Algebra notes'])
+
+    @override_settings(THUMBNAILS_ASYNC=False, THUMBNAIL_WORKERS=0)
+    def test_recorded_thumbnails_retire_cached_pages(self):
+        """Thumbnails recorded after the upload show up in lists cached before they existed."""
+        output = io.BytesIO()
+        Image.new('RGB', (320, 240)).save(output, 'PNG')
+        with self.captureOnCommitCallbacks() as callbacks:
+            image = Resource.objects.create(
+                title='Cell diagram', subject='biology', uploaded_by=self.teacher,
+                file=SimpleUploadedFile('cell.png', output.getvalue(), content_type='image/png')
+            )
+        render = next(callback for callback in callbacks if callback.__module__ == 'core.thumbnails')
+        for callback in callbacks:
+            if callback is not render:
+                callback()
+        # A list is cached before the thumbnails have been rendered
+        listed = self.client.get('/api/resources/').data['results']
+        self.assertEqual(next(item for item in listed if item['id'] == image.id)['thumbnails'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            render()
+
+        listed = self.client.get('/api/resources/').data['results']
+        self.assertEqual(set(next(item for item in listed if item['id'] == image.id)['thumbnails']), {'small', 'medium'})
+
+    def test_saving_a_resource_retires_cached_pages(self):
+        """A new or deleted resource shows in the next list and search responses."""
+        self.assertEqual(self.list_titles(self.student), ['Algebra notes'])
+        self.assertEqual(self.list_titles(self.student, 'search/?query=chapter&is_public=true'), ['Algebra notes'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Resource.objects.create(
+                title='Geometry chapter', description='Chapter two', subject='mathematics',
+                uploaded_by=self.teacher, url='https://example.com/geometry'
+            )
+        self.assertEqual(self.list_titles(self.student), ['Geometry chapter', 'Algebra notes'])
+        self.assertEqual(self.list_titles(self.student, 'search/?query=chapter&is_public=true'), ['Geometry chapter', 'Algebra notes'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.resource.delete()
+        self.assertEqual(self.list_titles(self.student), ['Geometry chapter'])
@@ -1,81 +1,139 @@
 """
 Custom file upload handlers for optimized resource uploads.
 """
+import hashlib
 import os
-import tempfile
-from django.core.files.uploadhandler import TemporaryFileUploadHandler
-from django.core.files.uploadedfile import TemporaryUploadedFile
+from io import BytesIO
+
 from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+
+from core.media_probe import MediaProbe
+from core.upload_middleware import UploadTooLarge, UploadTypeNotAllowed, check_upload_type
+from core.upload_progress import track_request_upload
+
+
+MULTIPART_OVERHEAD = 1024 * 1024  # room for form fields and part headers around one file
+SNIFF_SIZE = 512  # bytes needed to recognise a type from its magic bytes
+
+
+def get_max_upload_size():
+    return getattr(settings, 'MAX_UPLOAD_SIZE', 50 * 1024 * 1024)
 
 
-class OptimizedFileUploadHandler(TemporaryFileUploadHandler):
+class StreamingUploadHandler(FileUploadHandler):
     """
-    Optimized file upload handler for large file uploads.
-    Uses temporary files and streaming for better memory efficiency.
+    Single-pass upload handler: each chunk is read exactly once and
+    - counted against MAX_UPLOAD_SIZE, refusing the upload (413) as soon as it is exceeded;
+    - sniffed from its magic bytes on the first chunk, refusing UPLOAD_BLOCKED_MIME_TYPES (415);
+    - fed to the SHA-256 digest and the media probe;
+    - written to memory (small requests) or a temporary file;
+    - reported as upload progress for requests with an X-Upload-ID (see core.upload_progress).
+
+    The returned upload carries content_hash, content_type_sniffed and media_probe,
+    so models and views never read the file again to learn them.
     """
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.file = None
-        self.file_size = 0
-        
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        content_length = content_length or 0
+        if content_length > get_max_upload_size() + MULTIPART_OVERHEAD:
+            raise UploadTooLarge(get_max_upload_size())
+        self.in_memory = content_length <= settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        self.bytes_received = 0
+        self.progress = track_request_upload(self.request, content_length)
+        if self.progress is not None:
+            self.request.upload_progress = self.progress
+            self.progress.update(0)
+        return None
+
     def new_file(self, *args, **kwargs):
-        """
-        Create a new temporary file for the upload.
-        """
         super().new_file(*args, **kwargs)
-        
-        # Set maximum file size (50MB)
-        self.content_length = int(self.content_length or 0)
-        max_size = getattr(settings, 'MAX_UPLOAD_SIZE', 50 * 1024 * 1024)  # 50MB
-        
-        if self.content_length > max_size:
-            raise Exception(f"File too large. Maximum size is {max_size // (1024*1024)}MB")
-    
+        if self.content_length and self.content_length > get_max_upload_size():
+            self.abort('rejected')
+            raise UploadTooLarge(get_max_upload_size())
+
+        self.size = 0
+        self.sniffed = False
+        self.digest = hashlib.sha256()
+        self.probe = MediaProbe()
+        if self.in_memory:
+            self.file = BytesIO()
+        else:
+            self.file = TemporaryUploadedFile(
+                self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+            )
+
     def receive_data_chunk(self, raw_data, start):
-        """
-        Process data chunks as they arrive.
-        """
+        self.size += len(raw_data)
+        if self.size > get_max_upload_size():
+            self.abort('rejected')
+            raise UploadTooLarge(get_max_upload_size())
+
+        self.probe.feed(raw_data)
+        if not self.sniffed and len(self.probe.head) >= SNIFF_SIZE:
+            self.check_type()
+        self.digest.update(raw_data)
         self.file.write(raw_data)
-        self.file_size += len(raw_data)
-        
-        # Optional: Add progress tracking here if needed
+
+        if self.progress is not None:
+            self.bytes_received += len(raw_data)
+            self.progress.update(self.bytes_received)
         return None
-    
+
+    def check_type(self):
+        """Refuse blocked types as soon as enough of the file has arrived to recognise them."""
+        self.sniffed = True
+        try:
+            check_upload_type(self.probe.result()['mime_type'])
+        except UploadTypeNotAllowed:
+            self.abort('rejected')
+            raise
+
     def file_complete(self, file_size):
-        """
-        Called when file upload is complete.
-        """
+        if not self.sniffed:
+            self.check_type()
+        probe = self.probe.result()
         self.file.seek(0)
-        return TemporaryUploadedFile(
-            name=self.file_name,
-            content_type=self.content_type,
-            size=file_size,
-            charset=self.charset,
-            file=self.file
-        )
 
+        if self.in_memory:
+            upload = InMemoryUploadedFile(
+                file=self.file,
+                field_name=self.field_name,
+                name=self.file_name,
+                content_type=self.content_type,
+                size=file_size,
+                charset=self.charset,
+                content_type_extra=self.content_type_extra
+            )
+        else:
+            self.file.size = file_size
+            upload = self.file
 
-class ProgressTrackingUploadHandler(TemporaryFileUploadHandler):
-    """
-    Upload handler that can track upload progress.
-    """
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.bytes_received = 0
-        
-    def receive_data_chunk(self, raw_data, start):
-        """
-        Track progress as chunks are received.
-        """
-        self.bytes_received += len(raw_data)
-        
-        # Calculate progress percentage
-        if self.content_length:
-            progress = (self.bytes_received / self.content_length) * 100
-            
-            # Store progress in cache or session if needed
-            # This could be used for real-time progress updates
-            
-        return super().receive_data_chunk(raw_data, start)
\ No newline at end of file
+        upload.content_hash = self.digest.hexdigest()
+        upload.content_type_sniffed = probe['mime_type']
+        upload.media_probe = probe
+        return upload
+
+    def abort(self, state):
+        """Drop the partial file and report the upload as ended."""
+        if hasattr(self, 'file'):
+            # Closing a TemporaryUploadedFile also deletes it
+            self.file.close()
+        if self.progress is not None:
+            self.progress.finish(state)
+
+    def upload_complete(self):
+        if self.progress is not None:
+            self.progress.update(self.progress.total_bytes or self.bytes_received, state='received')
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file') and not self.in_memory:
+            temp_location = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
+        if self.progress is not None:
+            self.progress.finish('failed')
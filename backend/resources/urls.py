@@ -5,6 +5,7 @@ from . import views
 # Create router for ViewSets
 router = DefaultRouter()
 router.register(r'manage', views.ResourceManagementViewSet, basename='resource-management')
+router.register(r'uploads', views.ResourceUploadSessionViewSet, basename='resource-upload')
 
 urlpatterns = [
     # Main API routes as specified
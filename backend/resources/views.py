@@ -2,15 +2,25 @@ from rest_framework import generics, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import ModelViewSet, ViewSet
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
-from django.http import Http404, FileResponse
-from django.utils import timezone
-from datetime import timedelta
+from django.http import Http404
 
-from .models import Resource
+from core.chunked_upload import (
+    ChunkError, UploadSessionGone, append_chunk, discard_staged_chunk, discard_upload, get_max_chunk_size,
+    get_offset_from_request, stage_chunk
+)
+from core.file_delivery import counts_as_download, deliver_file
+from core.upload_progress import UploadProgress, complete_request_upload, get_progress
+
+from .models import Resource, ResourceUploadSession
+from .chunked_uploads import UploadIntegrityError, describe_session, finalize_upload, validate_upload_request
+from .counters import record_download, record_view
+from .list_cache import ResourceListCacheMixin, visible_resources
+from .stats import get_resource_stats
 from .serializers import (
     ResourceSerializer, ResourceCreateSerializer, ResourceUpdateSerializer,
     ResourceListSerializer, ResourceDownloadSerializer, ResourceSearchSerializer
@@ -19,7 +29,7 @@ from .permissions import IsOwnerOrAdmin, IsOwnerOrAdminOrTeacher, IsTeacher, IsO
 from users.permissions import IsTeacher as UserIsTeacher
 
 
-class ResourceListCreateView(generics.ListCreateAPIView):
+class ResourceListCreateView(ResourceListCacheMixin, generics.ListCreateAPIView):
     """
     Combined view for listing and creating resources.
     GET /resources/ → list all resources
@@ -33,16 +43,8 @@ class ResourceListCreateView(generics.ListCreateAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Filter resources based on user permissions."""
-        queryset = Resource.objects.select_related('uploaded_by').all()
-        
-        # If user is not staff, only show public resources or their own
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(
-                Q(is_public=True) | Q(uploaded_by=self.request.user)
-            )
-        
-        return queryset
+        """Filter resources based on user permissions (shared per visibility class for caching)."""
+        return visible_resources(self.request.user)
     
     def get_serializer_class(self):
         """Return appropriate serializer based on request method."""
@@ -60,6 +62,7 @@ class ResourceListCreateView(generics.ListCreateAPIView):
         serializer.is_valid(raise_exception=True)
         
         resource = serializer.save()
+        complete_request_upload(request, resource_id=resource.id)
         
         # Return full resource details
         response_serializer = ResourceSerializer(resource, context={'request': request})
@@ -97,9 +100,8 @@ class ResourceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         """Retrieve resource and increment view count if accessed."""
         instance = self.get_object()
         
-        # Increment view count (not download count)
-        instance.views_count = getattr(instance, 'views_count', 0) + 1
-        instance.save(update_fields=['views_count'])
+        # Buffered; written by the next counter flush
+        record_view(instance.id)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -131,7 +133,7 @@ class ResourceRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
         )
 
 
-class ResourceListView(generics.ListAPIView):
+class ResourceListView(ResourceListCacheMixin, generics.ListAPIView):
     """
     List all resources with pagination and filtering.
     Supports search by title, description, subject, and form level.
@@ -145,16 +147,8 @@ class ResourceListView(generics.ListAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        """Filter resources based on user permissions."""
-        queryset = Resource.objects.select_related('uploaded_by').all()
-        
-        # If user is not staff, only show public resources or their own
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(
-                Q(is_public=True) | Q(uploaded_by=self.request.user)
-            )
-        
-        return queryset
+        """Filter resources based on user permissions (shared per visibility class for caching)."""
+        return visible_resources(self.request.user)
 
 
 class ResourceDetailView(generics.RetrieveAPIView):
@@ -181,9 +175,8 @@ class ResourceDetailView(generics.RetrieveAPIView):
         """Retrieve resource and increment download count if accessed."""
         instance = self.get_object()
         
-        # Increment view count (not download count)
-        instance.views_count = getattr(instance, 'views_count', 0) + 1
-        instance.save(update_fields=['views_count'])
+        # Buffered; written by the next counter flush
+        record_view(instance.id)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -207,12 +200,148 @@ class ResourceUploadView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         
         resource = serializer.save()
+        complete_request_upload(request, resource_id=resource.id)
         
         # Return full resource details
         response_serializer = ResourceSerializer(resource, context={'request': request})
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
+class ResourceUploadSessionViewSet(ViewSet):
+    """
+    Resumable chunked uploads of large resource files (teachers only).
+    POST /resources/uploads/ → open a session with the resource details and filename, total_size, sha256 (optional)
+    GET /resources/uploads/<id>/ → current offset
+    PUT /resources/uploads/<id>/ → append the raw request body as the chunk at Upload-Offset
+    POST /resources/uploads/<id>/finalize/ → verify the file and create the resource
+    DELETE /resources/uploads/<id>/ → abandon the upload
+    GET /resources/uploads/progress/<upload id>/ → live progress (also for multipart uploads with X-Upload-ID)
+    """
+    permission_classes = [IsAuthenticated, UserIsTeacher]
+    lookup_value_regex = '[0-9a-f-]+'
+    
+    def get_session(self, pk):
+        return ResourceUploadSession.objects.filter(id=pk, user=self.request.user).first()
+    
+    def session_response(self, session, status_code=status.HTTP_200_OK):
+        response = Response(describe_session(session), status=status_code)
+        response['Upload-Offset'] = str(session.received_size)
+        return response
+    
+    def session_progress(self, session):
+        """Progress tracker for a chunked session; its upload id is the session id."""
+        return UploadProgress(str(session.id), session.user_id, session.total_size)
+    
+    def not_found(self):
+        return Response({'error': 'Upload session not found.'}, status=status.HTTP_404_NOT_FOUND)
+    
+    def create(self, request):
+        """Open an upload session after validating the resource details."""
+        fields, errors = validate_upload_request(request.data)
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        session = ResourceUploadSession.objects.create(user=request.user, **fields)
+        response = self.session_response(session, status.HTTP_201_CREATED)
+        response['Upload-Chunk-Size'] = str(get_max_chunk_size())
+        return response
+    
+    def retrieve(self, request, pk=None):
+        """Report how much of the file the server holds, so a client can resume."""
+        session = self.get_session(pk)
+        if session is None:
+            return self.not_found()
+        return self.session_response(session)
+    
+    def update(self, request, pk=None):
+        """Append one chunk; it must start at the offset the server last reported."""
+        session = self.get_session(pk)
+        if session is None:
+            return self.not_found()
+        
+        offset = get_offset_from_request(request)
+        if offset is None:
+            return Response(
+                {'error': 'Upload-Offset header (or offset parameter) is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # DRF gives no stream for an empty body (e.g. Content-Length: 0)
+        if request.stream is None:
+            return Response({'error': 'Chunk body is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # Read the body before locking; only the offset check and append hold the lock
+            staged_path = stage_chunk(session.id, offset, session.received_size, session.total_size, request.stream)
+        except ChunkError as e:
+            return Response({'error': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            with transaction.atomic():
+                session = ResourceUploadSession.objects.select_for_update().filter(id=session.id).first()
+                if session is None:
+                    return self.not_found()
+                session.received_size = append_chunk(session.id, offset, session.received_size, staged_path)
+                session.save(update_fields=['received_size', 'updated_at'])
+        except ChunkError as e:
+            return Response({'error': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+        finally:
+            discard_staged_chunk(staged_path)
+        
+        self.session_progress(session).update(
+            session.received_size, state='received' if session.is_complete else 'uploading'
+        )
+        return self.session_response(session)
+    
+    def destroy(self, request, pk=None):
+        """Abandon an upload and remove its partial file."""
+        session = self.get_session(pk)
+        if session is None:
+            return self.not_found()
+        discard_upload(session.id)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """Check the assembled file against the declared size and SHA-256 and create the resource."""
+        session = self.get_session(pk)
+        if session is None:
+            return self.not_found()
+        
+        if not session.is_complete:
+            return Response(
+                {'error': 'Upload is not complete.', 'offset': session.received_size},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        try:
+            resource = finalize_upload(session, request)
+        except UploadSessionGone:
+            return self.not_found()
+        except UploadIntegrityError as e:
+            # The received bytes were discarded; the client starts again from offset 0
+            return Response({'error': str(e), 'offset': 0}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        
+        progress = self.session_progress(session)
+        progress.received_bytes = session.total_size
+        progress.finish('complete', resource_id=resource.id)
+        
+        serializer = ResourceSerializer(resource, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'], url_path='progress/(?P<upload_id>[A-Za-z0-9-]+)')
+    def progress(self, request, upload_id=None):
+        """
+        Poll an upload's progress: a multipart upload sent with X-Upload-ID, or a chunked session id.
+        The same updates are pushed to the user's notification websocket as 'upload_progress' events.
+        """
+        progress = get_progress(upload_id, request.user.id)
+        if progress is None:
+            return Response({'error': 'No progress for this upload.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
+
+
 class ResourceUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     """
     Update and delete resources (owner, admin, or teacher).
@@ -264,7 +393,7 @@ class ResourceUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
         )
 
 
-class ResourceSearchView(generics.ListAPIView):
+class ResourceSearchView(ResourceListCacheMixin, generics.ListAPIView):
     """
     Advanced search for resources with multiple filters.
     Supports text search, subject filtering, date ranges, and more.
@@ -279,13 +408,8 @@ class ResourceSearchView(generics.ListAPIView):
     
     def get_queryset(self):
         """Filter resources based on search parameters and user permissions."""
-        queryset = Resource.objects.select_related('uploaded_by').all()
-        
-        # Apply user permission filtering
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(
-                Q(is_public=True) | Q(uploaded_by=self.request.user)
-            )
+        # Apply user permission filtering (shared per visibility class for caching)
+        queryset = visible_resources(self.request.user)
         
         # Get search parameters
         search_serializer = ResourceSearchSerializer(data=self.request.query_params)
@@ -376,14 +500,10 @@ class ResourceDownloadView(generics.RetrieveAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Increment download count
-        resource.download_count += 1
-        resource.save(update_fields=['download_count'])
-        
         # Return file for download
         try:
             # Get the original filename
-            filename = resource.file.name.split('/')[-1]
+            filename = resource.download_filename
             
             # Detect MIME type based on file extension
             import mimetypes
@@ -420,16 +540,16 @@ class ResourceDownloadView(generics.RetrieveAPIView):
                 if not mime_type:
                     mime_type = 'application/octet-stream'
             
-            # Create file response with proper headers
-            response = FileResponse(
-                resource.file,
-                as_attachment=True,
-                filename=filename
+            # Revalidation, Range requests and web-server offloading (FILE_DELIVERY_BACKEND)
+            response = deliver_file(
+                request, resource.file, filename, mime_type,
+                content_hash=resource.content_hash,
+                last_modified=resource.updated_at
             )
             
-            # Set proper headers for better download experience
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            response['Content-Type'] = mime_type
+            # Count full downloads and the first part of ranged ones, not 304s or later ranges
+            if counts_as_download(request, response):
+                record_download(resource.id)
             
             return response
         except FileNotFoundError:
@@ -451,45 +571,16 @@ class ResourceStatsView(generics.ListAPIView):
         return Resource.objects.select_related('uploaded_by').all()
     
     def list(self, request, *args, **kwargs):
-        """Return resource statistics."""
-        queryset = self.get_queryset()
-        
-        # Calculate statistics
-        total_resources = queryset.count()
-        public_resources = queryset.filter(is_public=True).count()
-        private_resources = total_resources - public_resources
-        
-        file_resources = queryset.filter(resource_type='file').count()
-        url_resources = queryset.filter(resource_type='url').count()
-        
-        total_downloads = sum(resource.download_count for resource in queryset)
-        
-        # Recent resources (last 7 days)
-        recent_cutoff = timezone.now() - timedelta(days=7)
-        recent_resources = queryset.filter(created_at__gte=recent_cutoff).count()
-        
-        # Subject breakdown
-        subject_stats = {}
-        for subject_code, subject_name in Resource.SUBJECT_CHOICES:
-            count = queryset.filter(subject=subject_code).count()
-            if count > 0:
-                subject_stats[subject_name] = count
+        """Return resource statistics (cached; see resources.stats)."""
+        stats = dict(get_resource_stats())
         
         # Top resources by downloads
-        top_resources = queryset.order_by('-download_count')[:5]
-        top_resources_data = ResourceListSerializer(top_resources, many=True, context={'request': request}).data
-        
-        stats = {
-            'total_resources': total_resources,
-            'public_resources': public_resources,
-            'private_resources': private_resources,
-            'file_resources': file_resources,
-            'url_resources': url_resources,
-            'total_downloads': total_downloads,
-            'recent_resources': recent_resources,
-            'subject_breakdown': subject_stats,
-            'top_resources': top_resources_data
-        }
+        top_ids = stats.pop('top_resource_ids')
+        top_resources = sorted(
+            self.get_queryset().filter(id__in=top_ids),
+            key=lambda resource: top_ids.index(resource.id)
+        )
+        stats['top_resources'] = ResourceListSerializer(top_resources, many=True, context={'request': request}).data
         
         return Response(stats)
 
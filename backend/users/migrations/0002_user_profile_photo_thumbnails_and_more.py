@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_photo_thumbnails',
+            field=models.JSONField(blank=True, default=dict, help_text='Stored thumbnail names of the profile photo, by size'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='profile_photo',
+            field=models.ImageField(blank=True, help_text='Profile photo', max_length=255, null=True, upload_to='profile_photos/'),
+        ),
+    ]
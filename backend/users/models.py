@@ -40,12 +40,18 @@ class User(AbstractUser):
         help_text='Secondary department (for teachers only)'
     )
     
-    # Temporarily using CharField instead of ImageField until Pillow is installed
-    profile_photo = models.CharField(
+    profile_photo = models.ImageField(
+        upload_to='profile_photos/',
         max_length=255,
         blank=True,
         null=True,
-        help_text='Profile photo path (temporary workaround)'
+        help_text='Profile photo'
+    )
+    
+    profile_photo_thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Stored thumbnail names of the profile photo, by size'
     )
     
     def __str__(self):
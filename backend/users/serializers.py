@@ -2,6 +2,8 @@ from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+
+from core.thumbnails import thumbnail_urls
 from .models import User, StudentProfile
 
 
@@ -119,13 +121,14 @@ class UserDetailSerializer(serializers.ModelSerializer):
     role_display = serializers.CharField(source='get_role_display', read_only=True)
     full_name = serializers.SerializerMethodField()
     profile_photo_url = serializers.SerializerMethodField()
+    profile_photo_thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = (
             'id', 'username', 'email', 'first_name', 'last_name', 
             'full_name', 'role', 'role_display', 'profile_photo', 
-            'profile_photo_url', 'date_joined', 'last_login', 'is_active'
+            'profile_photo_url', 'profile_photo_thumbnails', 'date_joined', 'last_login', 'is_active'
         )
         read_only_fields = ('id', 'username', 'date_joined', 'last_login')
     
@@ -141,6 +144,12 @@ class UserDetailSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.profile_photo.url)
             return obj.profile_photo.url
         return None
+    
+    def get_profile_photo_thumbnails(self, obj):
+        """Return thumbnail URLs by size ({} until they have been generated)."""
+        if not obj.profile_photo:
+            return {}
+        return thumbnail_urls(obj.profile_photo, obj.profile_photo_thumbnails, self.context.get('request'))
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
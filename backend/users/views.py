@@ -14,6 +14,8 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import check_password
 from django.utils import timezone
+
+from core.thumbnails import delete_thumbnails, schedule_thumbnails
 from .models import User, StudentProfile
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserDetailSerializer,
@@ -199,8 +201,8 @@ class ProfilePhotoView(generics.GenericAPIView):
         
         photo = request.FILES['photo']
         
-        # Validate file type
-        if not photo.content_type.startswith('image/'):
+        # Validate file type (from the bytes the upload handler sniffed, not the client's claim)
+        if not (getattr(photo, 'content_type_sniffed', None) or photo.content_type).startswith('image/'):
             return Response(
                 {'error': 'File must be an image'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -213,10 +215,18 @@ class ProfilePhotoView(generics.GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Update user profile photo
+        # Update user profile photo; thumbnails are rendered in the background
         user = request.user
+        previous_photo = user.profile_photo.name if user.profile_photo else None
+        previous_thumbnails = user.profile_photo_thumbnails
         user.profile_photo = photo
+        # The old thumbnails belong to the old photo; serve none until the new ones are recorded
+        user.profile_photo_thumbnails = {}
         user.save()
+        if previous_photo:
+            user.profile_photo.storage.delete(previous_photo)
+            delete_thumbnails(user.profile_photo.storage, previous_thumbnails)
+        schedule_thumbnails(User, user.pk, 'profile_photo', 'profile_photo_thumbnails')
         
         # Return updated user data
         serializer = UserDetailSerializer(user, context={'request': request})
@@ -226,8 +236,10 @@ class ProfilePhotoView(generics.GenericAPIView):
         """Delete profile photo."""
         user = request.user
         if user.profile_photo:
-            user.profile_photo.delete()
+            delete_thumbnails(user.profile_photo.storage, user.profile_photo_thumbnails)
+            user.profile_photo.delete(save=False)
             user.profile_photo = None
+            user.profile_photo_thumbnails = {}
             user.save()
         
         # Return updated user data
@@ -59,9 +59,19 @@ const ResourceCard = ({
       <Card.Body>
         <div className="d-flex justify-content-between align-items-start mb-2">
           <div className="d-flex align-items-center">
-            <span className="text-primary me-2 fs-4">
-              {getFileIcon(resource)}
-            </span>
+            {resource.thumbnails?.small ? (
+              <img
+                src={resource.thumbnails.small}
+                alt=""
+                loading="lazy"
+                className="me-2 rounded"
+                style={{ width: 40, height: 40, objectFit: 'cover' }}
+              />
+            ) : (
+              <span className="text-primary me-2 fs-4">
+                {getFileIcon(resource)}
+              </span>
+            )}
             <Badge bg="secondary" className="me-2">
               {resource.subject}
             </Badge>